@@ -0,0 +1,110 @@
+"""initial schema
+
+Tables as created by create_tables.py / Base.metadata.create_all before
+migrations were introduced. Databases created that way can be adopted with
+`alembic stamp 0001`.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("username", sa.String(50), unique=True),
+        sa.Column("email", sa.String(100), unique=True),
+        sa.Column("password", sa.String(255)),
+        sa.Column("first_name", sa.String(50)),
+        sa.Column("last_name", sa.String(50)),
+        sa.Column("phone_number", sa.String(15)),
+        sa.Column("dark_mode", sa.Boolean()),
+        sa.Column("font_size", sa.String(20)),
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+    op.create_index("ix_users_username", "users", ["username"], unique=True)
+
+    for lookup_table in ("budget_categories", "report_types", "transaction_categories", "notification_types"):
+        op.create_table(
+            lookup_table,
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("name", sa.String(255)),
+            sa.Column("description", sa.String(255)),
+        )
+        op.create_index(f"ix_{lookup_table}_id", lookup_table, ["id"])
+
+    op.create_table(
+        "budgets",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("budget_category_id", sa.Integer(), sa.ForeignKey("budget_categories.id")),
+        sa.Column("amount", sa.DECIMAL(10, 2)),
+        sa.Column("start_date", sa.Date()),
+        sa.Column("end_date", sa.Date()),
+    )
+    op.create_index("ix_budgets_id", "budgets", ["id"])
+
+    op.create_table(
+        "goals",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("name", sa.String(100)),
+        sa.Column("target_amount", sa.DECIMAL(10, 2)),
+        sa.Column("current_amount", sa.DECIMAL(10, 2)),
+        sa.Column("deadline", sa.Date()),
+        sa.Column("description", sa.String(255)),
+    )
+    op.create_index("ix_goals_id", "goals", ["id"])
+
+    op.create_table(
+        "reports",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("report_type_id", sa.Integer(), sa.ForeignKey("report_types.id")),
+        sa.Column("generated_at", sa.Date()),
+        sa.Column("data", sa.JSON()),
+    )
+    op.create_index("ix_reports_id", "reports", ["id"])
+
+    op.create_table(
+        "transactions",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("amount", sa.DECIMAL(10, 2)),
+        sa.Column("transaction_category_id", sa.Integer(), sa.ForeignKey("transaction_categories.id")),
+        sa.Column("date", sa.Date()),
+        sa.Column("description", sa.String(255)),
+    )
+    op.create_index("ix_transactions_id", "transactions", ["id"])
+
+    op.create_table(
+        "notifications",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("message", sa.String(255)),
+        sa.Column("notification_type_id", sa.Integer(), sa.ForeignKey("notification_types.id")),
+        sa.Column("is_read", sa.Boolean()),
+        sa.Column("created_at", sa.Date()),
+    )
+    op.create_index("ix_notifications_id", "notifications", ["id"])
+
+
+def downgrade() -> None:
+    for table in ("notifications", "transactions", "reports", "goals", "budgets",
+                  "notification_types", "transaction_categories", "report_types",
+                  "budget_categories", "users"):
+        op.drop_table(table)
@@ -0,0 +1,38 @@
+"""token version and revoked tokens
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("users", sa.Column("token_version", sa.Integer(), nullable=False, server_default="0"))
+
+    op.create_table(
+        "revoked_tokens",
+        sa.Column("jti", sa.String(36), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("expires_at", sa.DateTime()),
+        sa.Column("revoked_at", sa.DateTime()),
+    )
+    op.create_index("ix_revoked_tokens_user_id", "revoked_tokens", ["user_id"])
+    op.create_index("ix_revoked_tokens_expires_at", "revoked_tokens", ["expires_at"])
+    op.create_index("ix_revoked_tokens_revoked_at", "revoked_tokens", ["revoked_at"])
+
+
+def downgrade() -> None:
+    op.drop_table("revoked_tokens")
+    op.drop_column("users", "token_version")
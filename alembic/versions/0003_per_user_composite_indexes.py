@@ -0,0 +1,40 @@
+"""composite indexes for the per-user hot queries
+
+Every list endpoint and report helper filters on user_id and orders or
+ranges on a date column. MySQL only has the implicit foreign key index on
+user_id, so these queries read every row of the user and sort them.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Keep in sync with __table_args__ in models.py
+INDEXES = [
+    ("ix_transactions_user_date_id", "transactions", ["user_id", "date", "id"]),
+    ("ix_budgets_user_start_date", "budgets", ["user_id", "start_date"]),
+    ("ix_goals_user_deadline", "goals", ["user_id", "deadline"]),
+    ("ix_notifications_user_read_created", "notifications", ["user_id", "is_read", "created_at"]),
+    ("ix_reports_user_generated", "reports", ["user_id", "generated_at"]),
+]
+
+
+def upgrade() -> None:
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns)
+
+
+def downgrade() -> None:
+    for name, table, columns in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,72 @@
+"""partition transactions by month on date
+
+Partitioning is MySQL only. Every report, list and export filters
+transactions by user_id and a date range, so RANGE COLUMNS partitions on
+date let those queries skip the months they do not touch. Other databases
+only get date NOT NULL, so the schema matches models.Transaction everywhere
+(SQLite through a batch table copy).
+
+MySQL requires the partitioning column in every unique key and does not
+allow foreign keys on partitioned InnoDB tables, so the primary key becomes
+(id, date), date becomes NOT NULL and the two foreign keys are dropped.
+Partitions are created from the oldest month with data through
+PARTITION_MONTHS_AHEAD months from today; `python partitioning.py ensure`
+keeps them ahead from then on. Needs a live connection (no --sql mode).
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+import partitioning
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _require_dates(bind) -> None:
+    undated = bind.execute(sa.text("SELECT COUNT(*) FROM transactions WHERE date IS NULL")).scalar()
+    if undated:
+        raise RuntimeError(f"{undated} transactions have no date; set one before making it NOT NULL")
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != "mysql":
+        if not context.is_offline_mode():
+            _require_dates(bind)
+        with op.batch_alter_table("transactions") as batch:
+            batch.alter_column("date", existing_type=sa.Date(), nullable=False)
+        return
+    if context.is_offline_mode():
+        raise RuntimeError("0004 reads the data to plan partitions and cannot run in --sql mode")
+
+    _require_dates(bind)
+
+    for foreign_key in sa.inspect(bind).get_foreign_keys("transactions"):
+        op.drop_constraint(foreign_key["name"], "transactions", type_="foreignkey")
+    # ix_transactions_id keeps id indexed for AUTO_INCREMENT while the key is swapped
+    op.execute("ALTER TABLE transactions MODIFY `date` DATE NOT NULL, DROP PRIMARY KEY, ADD PRIMARY KEY (id, `date`)")
+    op.execute(partitioning.partition_by_ddl(partitioning.initial_months(bind)))
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != "mysql":
+        with op.batch_alter_table("transactions") as batch:
+            batch.alter_column("date", existing_type=sa.Date(), nullable=True)
+        return
+
+    op.execute("ALTER TABLE transactions REMOVE PARTITIONING")
+    op.execute("ALTER TABLE transactions DROP PRIMARY KEY, ADD PRIMARY KEY (id), MODIFY `date` DATE NULL")
+    op.create_foreign_key(None, "transactions", "users", ["user_id"], ["id"])
+    op.create_foreign_key(None, "transactions", "transaction_categories", ["transaction_category_id"], ["id"])
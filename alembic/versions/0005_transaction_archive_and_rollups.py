@@ -0,0 +1,54 @@
+"""transaction archive and monthly rollups
+
+transactions_archive takes the rows archive.py moves out of the hot table
+(compressed row format on MySQL). transaction_monthly_rollups holds their
+per user, month and category totals, which summaries and reports read
+instead of the archived rows.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "transactions_archive",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("amount", sa.DECIMAL(10, 2)),
+        sa.Column("transaction_category_id", sa.Integer()),
+        sa.Column("date", sa.Date(), nullable=False),
+        sa.Column("description", sa.String(255)),
+        sa.Column("archived_at", sa.DateTime()),
+        mysql_row_format="COMPRESSED",
+    )
+    op.create_index("ix_transactions_archive_user_date_id", "transactions_archive", ["user_id", "date", "id"])
+
+    op.create_table(
+        "transaction_monthly_rollups",
+        sa.Column("user_id", sa.Integer(), primary_key=True, autoincrement=False),
+        sa.Column("year_month", sa.String(7), primary_key=True),
+        sa.Column("transaction_category_id", sa.Integer(), primary_key=True, autoincrement=False),
+        sa.Column("total", sa.DECIMAL(14, 2), nullable=False),
+        sa.Column("count", sa.Integer(), nullable=False),
+        sa.Column("min_amount", sa.DECIMAL(10, 2)),
+        sa.Column("max_amount", sa.DECIMAL(10, 2)),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("transaction_monthly_rollups")
+    op.drop_table("transactions_archive")
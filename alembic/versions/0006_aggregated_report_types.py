@@ -0,0 +1,56 @@
+"""aggregated report types
+
+Report types 5 and 6 are computed in SQL (reports.py). Types 3 and 4 now
+carry aggregates too, with the raw rows served as a paginated appendix.
+
+The aggregates group a user's transactions by month and category, so
+ix_transactions_user_date_id gains transaction_category_id and amount and
+answers them from the index alone.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: Union[str, None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+REPORT_TYPES = [
+    (5, "Monthly Breakdown", "Spending per month and category"),
+    (6, "Category Statistics", "Totals, counts and ranges per category"),
+]
+
+report_types = sa.table(
+    "report_types",
+    sa.column("id", sa.Integer()),
+    sa.column("name", sa.String()),
+    sa.column("description", sa.String()),
+)
+
+
+def upgrade() -> None:
+    op.drop_index("ix_transactions_user_date_id", table_name="transactions")
+    op.create_index("ix_transactions_user_date_id", "transactions",
+                    ["user_id", "date", "id", "transaction_category_id", "amount"])
+
+    existing = {row[0] for row in op.get_bind().execute(sa.select(report_types.c.id))}
+    op.bulk_insert(report_types, [
+        {"id": id, "name": name, "description": description}
+        for id, name, description in REPORT_TYPES if id not in existing
+    ])
+
+
+def downgrade() -> None:
+    op.execute(report_types.delete().where(report_types.c.id.in_([id for id, _, _ in REPORT_TYPES])))
+
+    op.drop_index("ix_transactions_user_date_id", table_name="transactions")
+    op.create_index("ix_transactions_user_date_id", "transactions", ["user_id", "date", "id"])
@@ -0,0 +1,40 @@
+"""rollups cover all transactions
+
+transaction_monthly_rollups held the totals of archived transactions only.
+It now covers every transaction, hot or archived, and the application keeps
+it current on each write (rollups.py), so it is rebuilt from both tables
+here. Writes should be stopped while this runs; `python rollups.py verify`
+afterwards confirms nothing slipped in between.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from models import TransactionArchive
+import rollups
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0007"
+down_revision: Union[str, None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ROLLUPS = sa.table("transaction_monthly_rollups", *(sa.column(name) for name in rollups.ROLLUP_COLUMNS))
+
+
+def upgrade() -> None:
+    op.execute(ROLLUPS.delete())
+    op.execute(ROLLUPS.insert().from_select(list(rollups.ROLLUP_COLUMNS), rollups.source_totals()))
+
+
+def downgrade() -> None:
+    # Back to the archived months only
+    op.execute(ROLLUPS.delete())
+    op.execute(ROLLUPS.insert().from_select(list(rollups.ROLLUP_COLUMNS), rollups.aggregate(TransactionArchive)))
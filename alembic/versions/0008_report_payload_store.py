@@ -0,0 +1,62 @@
+"""report payload store
+
+Report contents move out of reports.data into report_payloads: zlib
+compressed, keyed by the SHA-256 of their canonical JSON so identical
+reports share one row (report_store.py). Existing reports keep their inline
+JSON until `python report_store.py migrate` moves it.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18
+
+"""
+import json
+import zlib
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0008"
+down_revision: Union[str, None] = "0007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+reports = sa.table("reports", sa.column("id", sa.Integer()), sa.column("data", sa.JSON()),
+                   sa.column("payload_hash", sa.String()))
+payloads = sa.table("report_payloads", sa.column("hash", sa.String()), sa.column("body", sa.LargeBinary()))
+
+
+def upgrade() -> None:
+    op.create_table(
+        "report_payloads",
+        sa.Column("hash", sa.String(64), primary_key=True),
+        sa.Column("codec", sa.String(8), nullable=False),
+        sa.Column("size", sa.Integer(), nullable=False),
+        sa.Column("body", sa.LargeBinary().with_variant(mysql.LONGBLOB(), "mysql"), nullable=False),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("last_used_at", sa.DateTime()),
+    )
+    with op.batch_alter_table("reports") as batch:
+        batch.add_column(sa.Column("payload_hash", sa.String(64)))
+        batch.add_column(sa.Column("payload_size", sa.Integer()))
+        batch.create_foreign_key("fk_reports_payload_hash", "report_payloads", ["payload_hash"], ["hash"])
+
+
+def downgrade() -> None:
+    # Payloads go back inline first
+    bind = op.get_bind()
+    rows = bind.execute(sa.select(reports.c.id, payloads.c.body)
+                        .join(payloads, payloads.c.hash == reports.c.payload_hash)).all()
+    for report_id, body in rows:
+        bind.execute(reports.update().where(reports.c.id == report_id)
+                     .values(data=json.loads(zlib.decompress(body))))
+
+    with op.batch_alter_table("reports") as batch:
+        batch.drop_constraint("fk_reports_payload_hash", type_="foreignkey")
+        batch.drop_column("payload_size")
+        batch.drop_column("payload_hash")
+    op.drop_table("report_payloads")
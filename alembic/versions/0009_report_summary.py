@@ -0,0 +1,32 @@
+"""report summary
+
+reports.summary keeps a report's headline numbers (reports.summarise) so
+GET /reports/metadata lists reports without reading their payloads.
+Reports moved by `python report_store.py migrate` get theirs filled in;
+older ones list with a null summary.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0009"
+down_revision: Union[str, None] = "0008"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("reports", sa.Column("summary", sa.JSON()))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("reports") as batch:
+        batch.drop_column("summary")
@@ -0,0 +1,35 @@
+"""per-user data versions
+
+users.data_version is bumped by every transaction, budget and goal write.
+reports.data_version records the version a report was built from, so an
+unchanged report is reused instead of rebuilt (jobs.py). Existing reports
+have none and are rebuilt once.
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0010"
+down_revision: Union[str, None] = "0009"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("users", sa.Column("data_version", sa.Integer(), nullable=False, server_default="0"))
+    op.add_column("reports", sa.Column("data_version", sa.Integer()))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("reports") as batch:
+        batch.drop_column("data_version")
+    with op.batch_alter_table("users") as batch:
+        batch.drop_column("data_version")
@@ -0,0 +1,32 @@
+"""token version revocations
+
+A logout from all devices writes a revoked_tokens row carrying the user's
+new token version, so every worker's revocation sync learns about it
+(revocation.py) instead of only the worker that served the logout.
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0011"
+down_revision: Union[str, None] = "0010"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("revoked_tokens", sa.Column("token_version", sa.Integer()))
+
+
+def downgrade() -> None:
+    op.execute(sa.text("DELETE FROM revoked_tokens WHERE token_version IS NOT NULL"))
+    with op.batch_alter_table("revoked_tokens") as batch:
+        batch.drop_column("token_version")
@@ -8,10 +8,15 @@ import api.data_class.GoalsRead
 import api.data_class.NotificationCreate
 import api.data_class.NotificationRead
 import api.data_class.NotificationType
+import api.data_class.RefreshTokenRequest
 import api.data_class.ReportCreate
+import api.data_class.ReportJob
+import api.data_class.ReportJobCreate
+import api.data_class.ReportMetadata
 import api.data_class.ReportRead
 import api.data_class.ReportType
 import api.data_class.TokenResponse
+import api.data_class.TransactionBulkResult
 import api.data_class.TransactionCategory
 import api.data_class.TransactionCreate
 import api.data_class.TransactionRead
@@ -70,6 +75,9 @@ interface ApiService {
         @Field("client_secret") clientSecret: String? = null,
     ): Call<TokenResponse>
 
+    @POST("token/refresh/")
+    fun refreshToken(@Body refreshRequest: RefreshTokenRequest): Call<TokenResponse>
+
     // Budget endpoints
     @POST("budgets/")
     fun createBudget(
@@ -143,6 +151,18 @@ interface ApiService {
         @Header("Authorization") token: String,
     ): Call<ReportRead>
 
+    @POST("reports/jobs/")
+    fun createReportJob(
+        @Body report: ReportJobCreate,
+        @Header("Authorization") token: String,
+    ): Call<ReportJob>
+
+    @GET("reports/jobs/{job_id}")
+    fun getReportJob(
+        @Path("job_id") jobId: String,
+        @Header("Authorization") token: String,
+    ): Call<ReportJob>
+
     @GET("reports/")
     fun getReports(
         @Query("skip") skip: Int,
@@ -150,6 +170,13 @@ interface ApiService {
         @Header("Authorization") token: String,
     ): Call<List<ReportRead>>
 
+    @GET("reports/metadata")
+    fun getReportsMetadata(
+        @Query("limit") limit: Int,
+        @Query("cursor") cursor: String?,
+        @Header("Authorization") token: String,
+    ): Call<List<ReportMetadata>>
+
     @GET("report/{report_id}")
     fun getReport(
         @Path("report_id") reportId: Int,
@@ -172,6 +199,12 @@ interface ApiService {
         @Header("Authorization") token: String,
     ): Call<TransactionRead>
 
+    @POST("transactions/bulk")
+    fun createTransactionsBulk(
+        @Body transactions: List<TransactionCreate>,
+        @Header("Authorization") token: String,
+    ): Call<TransactionBulkResult>
+
     @GET("transactions/")
     fun getTransactions(
         @Query("skip") skip: Int,
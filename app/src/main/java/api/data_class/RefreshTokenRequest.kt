@@ -0,0 +1,5 @@
+package api.data_class
+
+data class RefreshTokenRequest(
+    val refresh_token: String,
+)
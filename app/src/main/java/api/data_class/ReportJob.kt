@@ -0,0 +1,17 @@
+package api.data_class
+
+data class ReportJobCreate(
+    val report_type_id: Int,
+)
+
+data class ReportJob(
+    val job_id: String,
+    val status: String,
+    val report_type_id: Int,
+    val stage: String?,
+    val progress: Double,
+    val report_id: Int?,
+    val error: String?,
+    val queued: Double,
+    val elapsed: Double,
+)
@@ -0,0 +1,10 @@
+package api.data_class
+
+data class ReportMetadata(
+    val id: Int,
+    val user_id: Int,
+    val report_type_id: Int,
+    val generated_at: String,
+    val size: Int?,
+    val summary: Map<String, Any>?,
+)
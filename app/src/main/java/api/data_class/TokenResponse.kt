@@ -3,4 +3,5 @@ package api.data_class
 data class TokenResponse(
     val access_token: String,
     val token_type: String,
+    val refresh_token: String? = null,
 )
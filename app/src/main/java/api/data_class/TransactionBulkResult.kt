@@ -0,0 +1,15 @@
+package api.data_class
+
+data class TransactionBulkRowResult(
+    val index: Int,
+    val status: String,
+    val id: Int?,
+    val error: String?,
+)
+
+data class TransactionBulkResult(
+    val created: Int,
+    val invalid: Int,
+    val failed: Int,
+    val results: List<TransactionBulkRowResult>,
+)
@@ -0,0 +1,90 @@
+# Cold storage for old transactions. Rows dated before the cutoff (the first
+# of the month ARCHIVE_AFTER_MONTHS ago) move to transactions_archive. Their
+# per user, month and category totals stay in the rollup table (rollups.py),
+# which counts hot and archived rows alike, so reports and summaries never
+# read them row by row.
+#   python archive.py [--months N] [--dry-run]
+# Each batch of users is one transaction: copy and delete commit together,
+# so readers see a row either hot or archived, never both or neither.
+# Archived transactions are updated and deleted in place (crud.py).
+import argparse
+import logging
+import sys
+import time
+from datetime import date
+
+from sqlalchemy import delete, func, insert, select, union_all
+
+import metrics
+from config import ARCHIVE_AFTER_MONTHS, ARCHIVE_USER_BATCH
+from models import Transaction, TransactionArchive, User
+from partitioning import add_months, month_start
+
+logger = logging.getLogger(__name__)
+
+ARCHIVED_COLUMNS = ("id", "user_id", "amount", "transaction_category_id", "date", "description")
+
+def hot_and_cold(build):
+    # build(model) returns a select over one transactions table; the result
+    # runs it over the hot and the archive table alike
+    return union_all(build(Transaction), build(TransactionArchive))
+
+def archive_cutoff(today: date = None, months: int = ARCHIVE_AFTER_MONTHS) -> date:
+    return add_months(month_start(today or date.today()), -months)
+
+def _archive_batch(connection, first_user: int, last_user: int, cutoff: date, max_id: int) -> int:
+    # Rows inserted after the run started (higher ids) stay for the next run
+    criteria = [
+        Transaction.user_id.between(first_user, last_user),
+        Transaction.date < cutoff,
+        Transaction.id <= max_id,
+    ]
+    columns = [getattr(Transaction, name) for name in ARCHIVED_COLUMNS]
+    copied = connection.execute(
+        insert(TransactionArchive).from_select(list(ARCHIVED_COLUMNS), select(*columns).where(*criteria))
+    ).rowcount
+    moved = connection.execute(delete(Transaction).where(*criteria)).rowcount
+    if moved != copied:
+        # Raising rolls the whole batch back
+        raise RuntimeError(f"Archive batch {first_user}-{last_user}: deleted {moved} rows, copied {copied}")
+    return moved
+
+def archive_transactions(bind, cutoff: date, user_batch: int = ARCHIVE_USER_BATCH) -> int:
+    started = time.perf_counter()
+    with bind.connect() as connection:
+        max_id = connection.execute(select(func.max(Transaction.id))).scalar()
+        max_user = connection.execute(select(func.max(User.id))).scalar()
+    if max_id is None or max_user is None:
+        return 0
+
+    moved = 0
+    for first_user in range(0, max_user + 1, user_batch):
+        with bind.begin() as connection:
+            moved += _archive_batch(connection, first_user, first_user + user_batch - 1, cutoff, max_id)
+    metrics.incr("archive.rows", moved)
+    metrics.observe("archive.seconds", time.perf_counter() - started)
+    logger.info(f"Archived {moved} transactions dated before {cutoff} in {time.perf_counter() - started:.1f}s")
+    return moved
+
+def main() -> int:
+    from database import engine
+
+    parser = argparse.ArgumentParser(description="Move old transactions to the archive table")
+    parser.add_argument("--months", type=int, default=ARCHIVE_AFTER_MONTHS, help="archive rows older than this many months")
+    parser.add_argument("--batch-users", type=int, default=ARCHIVE_USER_BATCH)
+    parser.add_argument("--dry-run", action="store_true", help="count the rows that would move")
+    args = parser.parse_args()
+
+    cutoff = archive_cutoff(months=args.months)
+    if args.dry_run:
+        with engine.connect() as connection:
+            count = connection.execute(select(func.count()).where(Transaction.date < cutoff)).scalar()
+        print(f"{count} transactions dated before {cutoff} would be archived")
+        return 0
+    moved = archive_transactions(engine, cutoff, args.batch_users)
+    print(f"archived {moved} transactions dated before {cutoff}")
+    return 0
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
@@ -0,0 +1,196 @@
+import hashlib
+import hmac
+import logging
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+
+from fastapi import Depends, Header, HTTPException, Request, status
+from fastapi.security import OAuth2PasswordBearer
+from jose import JWTError, jwt
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from auth_cache import Principal, principal_cache, token_cache
+from config import AUTH_PRINCIPAL_MODE, METRICS_TOKEN, REFRESH_TOKEN_EXPIRE_DAYS
+from database import get_db, get_async_db, read_session
+from models import User
+from revocation import revocation_store
+from schemas import TokenResponse
+
+logger = logging.getLogger(__name__)
+
+# JWT Token settings
+SECRET_KEY = "Test"
+ALGORITHM = "HS256"
+ACCESS_TOKEN_EXPIRE_MINUTES = 30
+
+# OAuth2 token scheme definition
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
+
+def create_access_token(data: dict, expires_delta: timedelta = None) -> str:
+    to_encode = data.copy()
+    
+    # Set expiration time
+    expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
+    to_encode.update({"exp": expire})
+    
+    if 'id' in data:
+        to_encode["id"] = data['id']
+    else:
+        raise ValueError("User ID must be provided in the token payload")
+
+    # Unique id so a single token can be revoked
+    to_encode.setdefault("jti", uuid.uuid4().hex)
+    to_encode.setdefault("type", "access")
+
+    # Encode the JWT
+    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    return encoded_jwt
+
+def create_refresh_token(data: dict) -> str:
+    return create_access_token(
+        {**data, "type": "refresh"},
+        expires_delta=timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    )
+
+def issue_tokens(user: User) -> TokenResponse:
+    claims = {"sub": user.username, "id": user.id, "email": user.email, "ver": user.token_version or 0}
+    access_token = create_access_token(
+        data=claims,
+        expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+    refresh_token = create_refresh_token(claims)
+
+    return TokenResponse(
+        access_token=access_token,
+        refresh_token=refresh_token,
+        token_type="bearer",
+        id=user.id,
+        username=user.username,
+        email=user.email
+    )
+
+def decode_access_token(token: str) -> dict:
+    # Verified payloads are cached by token digest until the token's exp
+    return token_cache.decode(token, lambda: jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]))
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    
+    try:
+        logger.info(f"Decoding token: {token}")
+        # Decode the JWT token
+        payload = decode_access_token(token)
+        logger.debug(f"Token payload: {payload}")
+        
+        user_id: int = payload.get("id")
+        if not user_id:
+            logger.error("User ID not found in token payload.")
+            raise credentials_exception
+        token_version = payload.get("ver", 0)
+
+        # Lets the session's after_commit hook keep this user's reads on the primary
+        db.info["user_id"] = user_id
+
+        # Refresh tokens are only accepted by /token/refresh/
+        if payload.get("type", "access") != "access":
+            logger.error("Refresh token used as an access token.")
+            raise credentials_exception
+
+        # In-memory revocation check, the store only reaches the database on its sync interval
+        if revocation_store.sync_due():
+            revocation_store.sync(db)
+        if revocation_store.is_revoked(payload.get("jti")):
+            logger.error(f"Revoked token used for user ID: {user_id}")
+            raise credentials_exception
+
+        if AUTH_PRINCIPAL_MODE == "claims":
+            # The signed claims are enough, no database work at all
+            if token_version < principal_cache.known_version(user_id):
+                logger.error(f"Token version {token_version} revoked for user ID: {user_id}")
+                raise credentials_exception
+            return Principal.from_claims(payload)
+
+        principal = principal_cache.get(user_id) if AUTH_PRINCIPAL_MODE == "cache" else None
+        if principal is None:
+            # Fetch the user from the database using the user_id
+            user = db.query(User).filter(User.id == user_id).first()
+            if user is None:
+                logger.error(f"No user found for ID: {user_id}")
+                raise credentials_exception
+            principal = Principal.from_user(user)
+            if AUTH_PRINCIPAL_MODE == "cache":
+                principal_cache.put(principal)
+
+        if token_version < principal.token_version:
+            logger.error(f"Token version {token_version} revoked for user ID: {user_id}")
+            raise credentials_exception
+        
+    except JWTError as e:
+        logger.error(f"JWT error: {e}")
+        raise credentials_exception
+    except Exception as e:
+        logger.error(f"Unexpected error: {e}")
+        raise credentials_exception
+
+    logger.info(f"Authenticated user: {principal}")
+    return principal
+
+def bump_token_version(db: Session, user_id: int) -> int:
+    # Invalidate every token issued so far for this user. This worker's cache
+    # learns the new version now, other workers on their next revocation sync.
+    db.query(User).filter(User.id == user_id).update(
+        {User.token_version: User.token_version + 1}, synchronize_session=False
+    )
+    new_version = db.query(User.token_version).filter(User.id == user_id).scalar()
+    revocation_store.revoke_versions_below(db, user_id, new_version)
+    db.commit()
+    principal_cache.note_version(user_id, new_version)
+    return new_version
+
+def require_metrics_token(x_metrics_token: Optional[str] = Header(None)):
+    # Metrics expose pool, replica and revocation state and captured query
+    # plans, so they are for operators only. Unconfigured they do not exist.
+    if not METRICS_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if x_metrics_token is None or not hmac.compare_digest(x_metrics_token.encode(), METRICS_TOKEN.encode()):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not allowed")
+
+# Read-your-writes across worker processes (database.WriteTracker): a request
+# that commits for its user answers with this marker, as a cookie and as a
+# header for clients without a cookie jar to send back. It names the user and
+# when the window ends, signed so a client cannot keep its reads on the
+# primary longer than the server allowed.
+READ_PRIMARY_COOKIE = "read_primary_until"
+READ_PRIMARY_HEADER = "X-Read-Primary-Until"
+
+def read_primary_marker(user_id: int, until: float) -> str:
+    payload = f"{user_id}.{int(until) + 1}"
+    signature = hmac.new(SECRET_KEY.encode(), payload.encode(), hashlib.sha256).hexdigest()
+    return f"{payload}.{signature}"
+
+def reads_primary(request: Request, current_user: Principal = Depends(get_current_user)) -> bool:
+    # Whether the client carries a live marker of the caller's own write
+    marker = request.headers.get(READ_PRIMARY_HEADER) or request.cookies.get(READ_PRIMARY_COOKIE)
+    try:
+        user_id, until, signature = marker.split(".")
+        expected = hmac.new(SECRET_KEY.encode(), f"{user_id}.{until}".encode(), hashlib.sha256).hexdigest()
+        return (hmac.compare_digest(signature, expected) and int(user_id) == current_user.id
+                and int(until) > time.time())
+    except (AttributeError, ValueError):
+        return False
+
+def get_user_read_db(current_user: Principal = Depends(get_current_user), sticky: bool = Depends(reads_primary)):
+    # Replica-routed session for the caller's own read-only endpoints
+    yield from read_session(current_user.id, sticky)
+
+async def get_current_user_async(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    # Same checks as get_current_user; any database work (cache miss, revocation
+    # sync) runs through the async connection instead of a worker thread
+    return await db.run_sync(lambda session: get_current_user(token, session))
@@ -0,0 +1,155 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+import metrics
+from config import AUTH_PRINCIPAL_CACHE_SIZE, AUTH_PRINCIPAL_CACHE_TTL, JWT_DECODE_CACHE_SIZE
+
+# The authenticated user as seen by the endpoints. Handlers only need the id
+# (and occasionally username/email), so there is no need to hold on to a
+# session-bound User row between requests.
+@dataclass(frozen=True)
+class Principal:
+    id: int
+    username: Optional[str] = None
+    email: Optional[str] = None
+    token_version: int = 0
+
+    @classmethod
+    def from_user(cls, user) -> "Principal":
+        return cls(
+            id=user.id,
+            username=user.username,
+            email=user.email,
+            token_version=user.token_version or 0,
+        )
+
+    @classmethod
+    def from_claims(cls, payload: dict) -> "Principal":
+        return cls(
+            id=payload["id"],
+            username=payload.get("sub"),
+            email=payload.get("email"),
+            token_version=payload.get("ver", 0),
+        )
+
+class PrincipalCache:
+    def __init__(self, maxsize: int = AUTH_PRINCIPAL_CACHE_SIZE, ttl: int = AUTH_PRINCIPAL_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # user_id -> (expires_at, principal)
+        # Latest token version seen per user. Kept outside the LRU so an eviction
+        # never lets a token from before a logout become valid again.
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> Optional[Principal]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                metrics.incr("auth.principal_cache.miss")
+                return None
+            expires_at, principal = entry
+            if expires_at <= now:
+                del self._entries[user_id]
+                metrics.incr("auth.principal_cache.expired")
+                return None
+            self._entries.move_to_end(user_id)
+        metrics.incr("auth.principal_cache.hit")
+        return principal
+
+    def put(self, principal: Principal):
+        with self._lock:
+            # Never cache a principal older than a version we already know about
+            if principal.token_version < self._versions.get(principal.id, 0):
+                return
+            self._versions[principal.id] = principal.token_version
+            self._entries[principal.id] = (time.monotonic() + self.ttl, principal)
+            self._entries.move_to_end(principal.id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                metrics.incr("auth.principal_cache.evicted")
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def note_version(self, user_id: int, token_version: int):
+        # Record a token version bump (logout) and drop the stale principal
+        with self._lock:
+            if token_version > self._versions.get(user_id, 0):
+                self._versions[user_id] = token_version
+            self._entries.pop(user_id, None)
+
+    def known_version(self, user_id: int) -> int:
+        with self._lock:
+            return self._versions.get(user_id, 0)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": len(self._entries), "maxsize": self.maxsize, "ttl": self.ttl}
+
+# Verified token payloads. The mobile client sends the same bearer token on
+# many calls, so signature verification and claim parsing only need to happen
+# once per token. Entries expire exactly at the token's own exp claim.
+class TokenDecodeCache:
+    def __init__(self, maxsize: int = JWT_DECODE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()  # sha256(token) -> (exp, payload)
+        self._lock = threading.Lock()
+
+    def decode(self, token: str, decoder) -> dict:
+        # decoder() verifies the token and returns its payload, raising on failure
+        if self.maxsize <= 0:
+            return decoder()
+
+        key = hashlib.sha256(token.encode()).digest()
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                exp, payload = entry
+                if exp > now:
+                    self._entries.move_to_end(key)
+                    metrics.incr("auth.jwt_cache.hit")
+                    return payload
+                del self._entries[key]
+                metrics.incr("auth.jwt_cache.expired")
+
+        metrics.incr("auth.jwt_cache.miss")
+        payload = decoder()
+        exp = payload.get("exp")
+        if exp is None:
+            # Never cache a token that does not expire
+            return payload
+
+        with self._lock:
+            self._entries[key] = (exp, payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                metrics.incr("auth.jwt_cache.evicted")
+        return payload
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": len(self._entries), "maxsize": self.maxsize}
+
+principal_cache = PrincipalCache()
+metrics.register_collector("auth_principal_cache", principal_cache.stats)
+
+token_cache = TokenDecodeCache()
+metrics.register_collector("auth_jwt_cache", token_cache.stats)
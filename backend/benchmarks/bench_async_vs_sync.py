@@ -0,0 +1,66 @@
+# Compare the sync (threadpool) and async (AsyncSession) endpoints under
+# concurrent load. Runs in-process through httpx's ASGI transport.
+#   python benchmarks/bench_async_vs_sync.py [requests] [concurrency]
+# DATABASE_URL selects the database; a throwaway SQLite file is the default.
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db"))
+
+import httpx
+
+import main
+from database import SessionLocal
+from models import User, Transaction
+from utils import hash_password
+
+def seed(transactions: int = 500) -> None:
+    db = SessionLocal()
+    if db.query(User).filter(User.username == "bench").first() is None:
+        user = User(username="bench", email="bench@example.com", password=hash_password("bench"),
+                    first_name="Bench", last_name="User", phone_number="0")
+        db.add(user)
+        db.flush()
+        start = date(2024, 1, 1)
+        db.add_all([
+            Transaction(user_id=user.id, amount=i % 100, transaction_category_id=1,
+                        date=start + timedelta(days=i % 365), description=f"bench {i}")
+            for i in range(transactions)
+        ])
+        db.commit()
+    db.close()
+
+async def run(client, path: str, headers: dict, requests: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            response = await client.get(path, headers=headers)
+            response.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return time.perf_counter() - start
+
+async def bench(requests: int, concurrency: int):
+    seed()
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        login = await client.post("/login/", json={"username": "bench", "password": "bench"})
+        headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+        for label, path in (("sync ", "/transactions/?limit=50"), ("async", "/async/transactions/?limit=50")):
+            await run(client, path, headers, concurrency, concurrency)  # warm up
+            elapsed = await run(client, path, headers, requests, concurrency)
+            print(f"{label} {path:32s} {requests / elapsed:8.1f} req/s  {elapsed / requests * 1000:6.2f} ms/req")
+
+if __name__ == "__main__":
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    print(f"{requests} requests, concurrency {concurrency}, {os.environ['DATABASE_URL']}")
+    asyncio.run(bench(requests, concurrency))
@@ -0,0 +1,76 @@
+# Latency of listing reports: GET /reports/ (payloads decompressed and
+# serialised for every report on the page) against GET /reports/metadata
+# (payload columns never loaded). Runs in-process through httpx's ASGI
+# transport against a seeded user with a mix of report types.
+#   python benchmarks/bench_report_list.py [requests] [reports] [transactions]
+# DATABASE_URL selects the database; a throwaway SQLite file is the default.
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db"))
+
+import httpx
+
+import main
+import seed_data
+from crud import create_report
+from database import SessionLocal
+from models import Report, User
+from reports import build_report_data
+from schemas import ReportCreate
+
+REPORT_TYPES = (4, 5, 3, 6)
+
+def seed(reports: int, transactions: int) -> str:
+    db = SessionLocal()
+    try:
+        user = db.query(User).order_by(User.id).first()
+        if user is None:
+            seed_data.seed(users=1, transactions=transactions)
+            user = db.query(User).order_by(User.id).first()
+        existing = db.query(Report).filter(Report.user_id == user.id).count()
+        for n in range(existing, reports):
+            report_type_id = REPORT_TYPES[n % len(REPORT_TYPES)]
+            data = build_report_data(db, user.id, report_type_id)
+            create_report(db, ReportCreate(user_id=user.id, report_type_id=report_type_id,
+                                           generated_at=date.today(), data=data), user.id)
+        return user.username
+    finally:
+        db.close()
+
+async def measure(client, path: str, headers: dict, requests: int):
+    timings, size = [], 0
+    for _ in range(requests):
+        start = time.perf_counter()
+        response = await client.get(path, headers=headers)
+        timings.append(time.perf_counter() - start)
+        response.raise_for_status()
+        size = len(response.content)
+    return timings, size
+
+async def bench(requests: int, reports: int, transactions: int):
+    username = seed(reports, transactions)
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        login = await client.post("/login/", json={"username": username, "password": "password"})
+        headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+        for path in ("/reports/?limit=10", "/reports/metadata?limit=10", "/reports/?limit=50", "/reports/metadata?limit=50"):
+            await measure(client, path, headers, 5)  # warm up
+            timings, size = await measure(client, path, headers, requests)
+            timings.sort()
+            p95 = timings[int(len(timings) * 0.95) - 1]
+            print(f"{path:30s} p50 {statistics.median(timings) * 1000:7.2f} ms  p95 {p95 * 1000:7.2f} ms  {size:9d} bytes")
+
+if __name__ == "__main__":
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    reports = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    transactions = int(sys.argv[3]) if len(sys.argv) > 3 else 20000
+    print(f"{requests} requests, {reports} reports, {transactions} transactions, {os.environ['DATABASE_URL']}")
+    asyncio.run(bench(requests, reports, transactions))
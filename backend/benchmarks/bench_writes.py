@@ -0,0 +1,108 @@
+# Write throughput for transactions, budgets and goals: the old pattern
+# (add/commit/refresh for creates, SELECT/commit/refresh for updates) against
+# the single-statement write path in crud.py. Both paths do the same work
+# besides: every write bumps the user's data_version, and transaction writes
+# maintain the monthly rollup (rollups.py).
+#   python benchmarks/bench_writes.py [writes]
+# DATABASE_URL selects the database; a throwaway SQLite file is the default.
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db"))
+
+import crud
+import query_counter
+from database import engine, SessionLocal
+from models import Base, User, Budget, Goal, Transaction
+from rollups import add_transactions, remove_transactions, rollup_key
+from schemas import BudgetCreate, GoalsCreate, TransactionCreate
+
+START = date(2024, 1, 1)
+
+def transaction_payload(i: int, user_id: int) -> TransactionCreate:
+    return TransactionCreate(user_id=user_id, amount=i % 100, date=START + timedelta(days=i % 365),
+                             description=f"bench {i}", transaction_category_id=1)
+
+def budget_payload(i: int, user_id: int) -> BudgetCreate:
+    return BudgetCreate(user_id=user_id, amount=100 + i % 50, start_date=START, end_date=START + timedelta(days=30),
+                        budget_category_id=1)
+
+def goal_payload(i: int, user_id: int) -> GoalsCreate:
+    return GoalsCreate(user_id=user_id, name=f"goal {i}", target_amount=1000, current_amount=i % 1000,
+                       deadline=START + timedelta(days=365), description="bench")
+
+def rollup_row(obj) -> dict:
+    return {"user_id": obj.user_id, "amount": obj.amount, "transaction_category_id": obj.transaction_category_id,
+            "date": obj.date}
+
+# Before: the ORM round trips the handlers used to make, with the same
+# data_version and rollup statements as crud.py
+def legacy_create(db, model, payload, user_id: int):
+    obj = model(**{**payload.model_dump(), "user_id": user_id})
+    db.execute(crud.bump_data_version(user_id))
+    if model is Transaction:
+        add_transactions(db.connection(), [rollup_row(obj)])
+    db.add(obj)
+    db.commit()
+    db.refresh(obj)
+    return obj
+
+def legacy_update(db, model, object_id: int, payload, user_id: int):
+    obj = db.query(model).filter(model.id == object_id).first()
+    old = rollup_row(obj) if model is Transaction else None
+    for key, value in payload.model_dump(exclude={"user_id"}).items():
+        setattr(obj, key, value)
+    db.execute(crud.bump_data_version(user_id))
+    if old is not None:
+        new = rollup_row(obj)
+        connection = db.connection()
+        add_transactions(connection, [new])
+        remove_transactions(connection, [old], refilled=[rollup_key(new)])
+    db.commit()
+    db.refresh(obj)
+    return obj
+
+CASES = [
+    ("transactions", Transaction, transaction_payload, crud.create_transaction, crud.update_transaction),
+    ("budgets", Budget, budget_payload, crud.create_budget, crud.update_budget),
+    ("goals", Goal, goal_payload, crud.create_goal, crud.update_goal),
+]
+
+def timed(label: str, writes: int, write) -> None:
+    queries, token = query_counter.start()
+    start = time.perf_counter()
+    try:
+        for i in range(writes):
+            write(i)
+    finally:
+        query_counter.stop(token)
+    elapsed = time.perf_counter() - start
+    print(f"  {label:16s} {writes / elapsed:9.1f} writes/s  {queries.count / writes:4.1f} statements/write")
+
+def main(writes: int):
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    user = User(username="bench_writes", email="bench_writes@example.com", password="x",
+                first_name="Bench", last_name="Writes", phone_number="0", token_version=0)
+    db.add(user)
+    db.commit()
+    user_id = user.id
+
+    for name, model, payload, create, update in CASES:
+        print(name)
+        created = []
+        timed("create before", writes, lambda i: created.append(legacy_create(db, model, payload(i, user_id), user_id).id))
+        timed("create after", writes, lambda i: created.append(create(db, payload(i, user_id), user_id=user_id).id))
+        db.expunge_all()  # the old update path read rows it had not seen yet
+        timed("update before", writes, lambda i: legacy_update(db, model, created[i], payload(i + 1, user_id), user_id))
+        timed("update after", writes, lambda i: update(db, created[writes + i], payload(i + 1, user_id), user_id=user_id))
+    db.close()
+
+if __name__ == "__main__":
+    writes = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    print(f"{writes} writes per case, {os.environ['DATABASE_URL']}")
+    main(writes)
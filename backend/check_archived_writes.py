@@ -0,0 +1,62 @@
+# Checks that archived transactions (archive.py), which the listing and GET
+# /transaction/{id} show beside the hot ones, can be edited and deleted
+# through the API, sync and async, and that the monthly rollup still matches
+# the rows afterwards. Exits non-zero on any failed check, so it can gate CI.
+#   python check_archived_writes.py
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("DB_PROFILE", "sqlite-memory")
+
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+import archive
+import main
+import rollups
+import seed_data
+from database import SessionLocal, engine
+from models import TransactionArchive
+
+def run_checks(client: TestClient) -> list:
+    failures = []
+
+    def expect(name: str, ok: bool, detail=""):
+        print(f"{'ok  ' if ok else 'FAIL'} {name} {detail}")
+        if not ok:
+            failures.append(name)
+
+    token = client.post("/login/", json={"username": "user000001", "password": "password"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    moved = archive.archive_transactions(engine, archive.archive_cutoff())
+    with SessionLocal() as db:
+        archived = db.scalars(select(TransactionArchive.id).where(TransactionArchive.user_id == 1)
+                              .order_by(TransactionArchive.id).limit(2)).all()
+    expect("transactions were archived", len(archived) == 2, f"({moved} moved)")
+
+    for prefix, transaction_id in zip(("", "/async"), archived):
+        listed = {row["id"] for row in client.get("/transactions/?limit=250", headers=headers).json()}
+        expect(f"{prefix or 'sync'}: archived row is listed", transaction_id in listed)
+        changed = {"user_id": 1, "amount": 42.5, "date": "2020-02-10", "description": "archived edit",
+                   "transaction_category_id": 2}
+        response = client.put(f"{prefix}/transactions/{transaction_id}", headers=headers, json=changed)
+        expect(f"{prefix or 'sync'}: edit answers 200", response.status_code == 200, response.status_code)
+        row = client.get(f"/transaction/{transaction_id}").json()
+        expect(f"{prefix or 'sync'}: edit is read back",
+               (row.get("amount"), row.get("date"), row.get("transaction_category_id")) == (42.5, "2020-02-10", 2),
+               row)
+        with engine.connect() as connection:
+            expect(f"{prefix or 'sync'}: rollup matches after the edit", not rollups.drifted_users(connection, 1, 1))
+
+        response = client.delete(f"{prefix}/transaction/{transaction_id}", headers=headers)
+        expect(f"{prefix or 'sync'}: delete answers 200", response.status_code == 200, response.status_code)
+        expect(f"{prefix or 'sync'}: deleted row is gone", client.get(f"/transaction/{transaction_id}").status_code == 404)
+        with engine.connect() as connection:
+            expect(f"{prefix or 'sync'}: rollup matches after the delete", not rollups.drifted_users(connection, 1, 1))
+    return failures
+
+if __name__ == "__main__":
+    seed_data.seed(users=1, transactions=200)
+    failures = run_checks(TestClient(main.app))
+    sys.exit(1 if failures else 0)
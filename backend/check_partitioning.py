@@ -0,0 +1,119 @@
+# Exercises the partition planning in partitioning.py without a MySQL server:
+# a stand-in connection answers the information_schema query from a list of
+# partitions and applies the REORGANIZE statements ensure_partitions issues.
+# Exits non-zero on the first failed check, so it can gate CI.
+#   python check_partitioning.py
+import os
+import re
+import sys
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import partitioning
+from partitioning import (CATCH_ALL, add_months, ensure_partitions, headroom, parse_bound, partition_by_ddl,
+                          partition_name, plan_months)
+
+class StandInResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def fetchall(self):
+        return self.rows
+
+    def scalar(self):
+        return self.rows[0][0] if self.rows else None
+
+class StandInMySQL:
+    # Just enough of a MySQL connection for partitioning.py
+    class dialect:
+        name = "mysql"
+
+    def __init__(self, partitions=None, oldest=None):
+        self.partitions = partitions or []  # [(name, quoted bound or "MAXVALUE")]
+        self.oldest = oldest
+        self.statements = []
+
+    def execute(self, statement, parameters=None):
+        sql = str(statement)
+        self.statements.append(sql)
+        if "information_schema.PARTITIONS" in sql:
+            return StandInResult([(name, bound, 0) for name, bound in self.partitions])
+        if sql.startswith("SELECT MIN"):
+            return StandInResult([(self.oldest,)])
+        definitions = re.findall(r"PARTITION (\w+) VALUES LESS THAN \(([^)]*)\)", sql)
+        if "PARTITION BY RANGE COLUMNS" in sql:
+            self.partitions = definitions
+        elif f"REORGANIZE PARTITION {CATCH_ALL} INTO" in sql:
+            assert self.partitions[-1][0] == CATCH_ALL, "reorganized a table without pmax"
+            self.partitions = self.partitions[:-1] + definitions
+        else:
+            raise AssertionError(f"unexpected statement {sql}")
+        return StandInResult([])
+
+def check(description: str, condition: bool) -> None:
+    print(f"{'ok  ' if condition else 'FAIL'} {description}")
+    if not condition:
+        sys.exit(1)
+
+def bounds(connection):
+    return [parse_bound(bound) for _, bound in connection.partitions]
+
+def contiguous(connection) -> bool:
+    # Each monthly partition holds exactly the month after its predecessor, pmax last
+    monthly = bounds(connection)[:-1]
+    return (bounds(connection)[-1] is None
+            and all(add_months(a, 1) == b for a, b in zip(monthly, monthly[1:]))
+            and all(name == partition_name(add_months(bound, -1)) for (name, _), bound in zip(connection.partitions, monthly)))
+
+def main() -> None:
+    check("add_months crosses years both ways",
+          add_months(date(2024, 11, 30), 3) == date(2025, 2, 1) and add_months(date(2024, 1, 5), -1) == date(2023, 12, 1))
+    check("plan from scratch covers first through until month",
+          plan_months(None, date(2023, 11, 15), date(2024, 2, 3))
+          == [date(2023, 11, 1), date(2023, 12, 1), date(2024, 1, 1), date(2024, 2, 1)])
+    check("plan continues from the last bound", plan_months(date(2024, 2, 1), date(2024, 1, 20), date(2024, 3, 1))
+          == [date(2024, 2, 1), date(2024, 3, 1)])
+    check("plan is empty when already covered", plan_months(date(2024, 5, 1), date(2024, 1, 1), date(2024, 4, 30)) == [])
+    check("bounds parse", parse_bound("'2024-02-01'") == date(2024, 2, 1) and parse_bound("MAXVALUE") is None)
+    ddl = partition_by_ddl([date(2023, 11, 1)])
+    check("partition DDL bounds each month by the next one's first day",
+          "PARTITION p202311 VALUES LESS THAN ('2023-12-01')" in ddl and ddl.rstrip(")\n").endswith("(MAXVALUE"))
+
+    # Migration 0004 on a table whose oldest row is from August
+    today = date(2026, 10, 18)
+    connection = StandInMySQL(oldest=date(2026, 8, 9))
+    connection.execute(partition_by_ddl(partitioning.initial_months(connection, months_ahead=3, today=today)))
+    check("migration partitions run from the oldest month to 3 months ahead",
+          connection.partitions[0][0] == "p202608" and connection.partitions[-2][0] == "p202701" and contiguous(connection))
+    check("headroom counts the months after the current one", headroom(partitioning.existing_partitions(connection), today) == 3)
+
+    # The daily ensure run
+    check("ensure is a no-op while the horizon is covered", ensure_partitions(connection, 3, today) == [])
+    later = date(2026, 12, 5)
+    added = ensure_partitions(connection, 3, later)
+    check("ensure adds the months that came into the horizon", added == [date(2027, 2, 1), date(2027, 3, 1)])
+    check("partitions stay contiguous with pmax last", contiguous(connection))
+    check("ensure is idempotent", ensure_partitions(connection, 3, later) == [])
+
+    # Cron stopped for a year
+    much_later = date(2028, 1, 2)
+    added = ensure_partitions(connection, 3, much_later)
+    check("ensure fills a long gap without holes", added[0] == date(2027, 4, 1) and added[-1] == date(2028, 4, 1)
+          and contiguous(connection))
+    statements = len(connection.statements)
+    check("dry run issues no DDL", ensure_partitions(connection, 6, much_later, dry_run=True)
+          and not any("REORGANIZE" in sql for sql in connection.statements[statements:]))
+
+    class StandInSQLite:
+        class dialect:
+            name = "sqlite"
+    check("other databases are left alone", ensure_partitions(StandInSQLite()) == [])
+    try:
+        ensure_partitions(StandInMySQL())
+        check("an unpartitioned table is reported", False)
+    except RuntimeError:
+        check("an unpartitioned table is reported", True)
+
+if __name__ == "__main__":
+    main()
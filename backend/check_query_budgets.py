@@ -0,0 +1,166 @@
+# Runs the main endpoints, reads and writes, against a seeded in-memory SQLite
+# database and checks the statement count of every request against its
+# route's budget and the N+1 detector (query_counter.py). Every request runs
+# on cold caches (no cached principal, a revocation sync due), the most
+# statements a route ever issues, so budgets can be exact: one statement more,
+# like a refresh after a commit, fails the check. Report and import jobs are
+# counted under their own routes ("JOB ..."). Exits non-zero on any
+# violation, so it can gate CI.
+#   python check_query_budgets.py
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("DB_PROFILE", "sqlite-memory")
+os.environ["SQL_BUDGET_STRICT"] = "true"
+
+from fastapi.testclient import TestClient
+
+import archive
+import main
+import metrics
+import seed_data
+from database import engine
+from auth_cache import principal_cache
+from revocation import revocation_store
+
+JOB_ROUTES = ("JOB /reports/jobs/", "JOB /transactions/import")
+
+def cold():
+    principal_cache.clear()
+    revocation_store._next_sync_at = 0.0
+
+def statement_csv(rows: int) -> bytes:
+    lines = ["Date,Description,Amount"]
+    lines += [f"2024-{1 + n % 12:02d}-{1 + n % 28:02d},Budget check {n},-{1 + n % 50}.25" for n in range(rows)]
+    return ("\n".join(lines) + "\n").encode()
+
+def wait_for_job(client: TestClient, url: str, headers: dict) -> dict:
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        job = client.get(url, headers=headers).json()
+        if job["status"] not in ("queued", "running"):
+            return job
+        time.sleep(0.05)
+    raise RuntimeError(f"{url} did not finish")
+
+def run_checks(client: TestClient) -> list:
+    failures = []
+
+    def check(method: str, url: str, headers: dict = None, **kwargs):
+        cold()
+        response = client.request(method, url, headers=headers or {}, **kwargs)
+        count = response.headers.get("X-SQL-Queries")
+        print(f"{method} {url}: {response.status_code}, {count} statements, {response.headers.get('X-SQL-Time-Ms')} ms")
+        if response.status_code == 500 and "violations" in response.json():
+            failures.append((method, url, response.json()["violations"]))
+        return response
+
+    tokens = check("POST", "/login/", json={"username": "user000001", "password": "password"}).json()
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+
+    for url, request_headers in [
+        ("/users/", {}),
+        ("/user/1", {}),
+        ("/users/email/user000001@example.com", {}),
+        ("/user/username/user000001", {}),
+        ("/budgets/", headers),
+        ("/budgets/1", {}),
+        ("/budget/categories/", {}),
+        ("/goals/", headers),
+        ("/goal/1", {}),
+        ("/transactions/", headers),
+        ("/transactions/?limit=100", headers),
+        ("/transaction/1", {}),
+        ("/transaction/categories/", {}),
+        ("/transactions/summary", headers),
+        ("/notifications/", headers),
+        ("/notification/1", {}),
+        ("/reports/", headers),
+        ("/reports/metadata", headers),
+        ("/report/types/", {}),
+        ("/async/transactions/", headers),
+        ("/async/goals/", headers),
+    ]:
+        check("GET", url, request_headers)
+
+    # Writes, sync and async. Transactions are dated in months the seed leaves
+    # empty, so each update and delete empties a rollup row, the costliest case.
+    transaction = {"user_id": 1, "amount": 12.5, "date": "2031-06-01", "description": "Budget check",
+                   "transaction_category_id": 1}
+    budget = {"amount": 250.0, "start_date": "2024-06-01", "end_date": "2024-06-30", "user_id": 1, "budget_category_id": 1}
+    goal = {"name": "Budget check", "target_amount": 500.0, "current_amount": 0.0, "deadline": "2025-06-01", "user_id": 1}
+    # A request over budget answers 500 without its body, so the requests that
+    # need an id from it are skipped (the violation is already recorded)
+    for prefix in ("", "/async"):
+        for path, delete_path, body, changed in (
+            ("/transactions/", "/transaction/", transaction, {"amount": 20.0, "date": "2031-07-01"}),
+            ("/budgets/", "/budgets/", budget, {"amount": 300.0}),
+            ("/goals/", "/goals/", goal, {"current_amount": 50.0}),
+        ):
+            created = check("POST", f"{prefix}{path}", headers, json=body).json()
+            if "id" in created:
+                check("PUT", f"{prefix}{path}{created['id']}", headers, json={**body, **changed})
+                check("DELETE", f"{prefix}{delete_path}{created['id']}", headers)
+        check("POST", f"{prefix}/notifications/", headers,
+              json={"user_id": 1, "message": "Budget check", "notification_type_id": 1})
+
+    # Archived transactions are changed in place, after a miss on the hot table
+    old = [client.post("/transactions/", headers=headers, json={**transaction, "date": day}).json()["id"]
+           for day in ("2019-01-15", "2019-02-15")]
+    archive.archive_transactions(engine, archive.archive_cutoff())
+    for prefix, transaction_id in zip(("", "/async"), old):
+        check("PUT", f"{prefix}/transactions/{transaction_id}", headers,
+              json={**transaction, "date": "2018-06-15", "amount": 30.0})
+        check("DELETE", f"{prefix}/transaction/{transaction_id}", headers)
+
+    check("POST", "/users/", json={"username": "budgetcheck", "email": "budget.check@example.com",
+                                   "password": "password", "first_name": "Budget", "last_name": "Check",
+                                   "phone_number": "0"})
+    check("PUT", "/user/1", headers, json={"first_name": "Budget", "last_name": "Check", "phone_number": "1",
+                                           "email": "user000001@example.com"})
+    check("POST", "/transactions/bulk", headers, json=[{**transaction, "description": f"Bulk {n}"} for n in range(2500)])
+
+    # Jobs: the requests are counted here, the jobs' own statements under JOB routes
+    job = check("POST", "/transactions/import?default_category_id=1", headers,
+                files={"file": ("statement.csv", statement_csv(4500), "text/csv")}).json()
+    if "job_id" in job:
+        wait_for_job(client, f"/transactions/import/{job['job_id']}", headers)
+    job = check("POST", "/reports/jobs/", headers, json={"report_type_id": 4}).json()
+    if "job_id" in job:
+        wait_for_job(client, f"/reports/jobs/{job['job_id']}", headers)
+    report = {"user_id": 1, "report_type_id": 5, "generated_at": "2024-12-31", "data": {}}
+    created = check("POST", "/reports/", headers, json=report).json()
+    check("POST", "/reports/", headers, json=report)  # reuses the report just built
+    # Listed again now that there are reports, so their payloads are loaded too
+    check("GET", "/reports/", headers)
+    check("GET", "/reports/metadata", headers)
+    if "id" in created:
+        check("DELETE", f"/reports/{created['id']}", headers)
+
+    counters, timings = metrics.snapshot()["counters"], metrics.snapshot()["timings"]
+    for route in JOB_ROUTES:
+        queries = timings.get(f"sql.queries.{route}", {})
+        print(f"{route}: {queries.get('count', 0)} jobs, at most {queries.get('max', 0):.0f} statements")
+        if counters.get(f"sql.violations.{route}"):
+            failures.append(tuple(route.split(" ", 1)) + (["see the log above"],))
+
+    # Token lifecycle last, logging out ends the session used above
+    refreshed = check("POST", "/token/refresh/", json={"refresh_token": tokens["refresh_token"]}).json()
+    if "access_token" in refreshed:
+        tokens = refreshed
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    check("POST", "/logout/", headers, json={"refresh_token": tokens["refresh_token"]})
+    tokens = check("POST", "/login/", json={"username": "user000001", "password": "password"}).json()
+    check("POST", "/logout/?all_devices=true", {"Authorization": f"Bearer {tokens['access_token']}"})
+    return failures
+
+if __name__ == "__main__":
+    seed_data.seed(users=2, transactions=300)
+    failures = run_checks(TestClient(main.app))
+    for method, url, problems in failures:
+        print(f"FAIL {method} {url}")
+        for problem in problems:
+            print(f"  {problem}")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,145 @@
+# Exercises replica routing against two local databases: a primary SQLite
+# file and a copy of it standing in for a read replica. The copy is never
+# written to again, so it behaves like a replica stuck behind the primary,
+# and a read served from it is told apart by the rows it lacks. Replica lag
+# and an unreachable replica are simulated by swapping database.replica_lag;
+# another worker process, which never saw the write, by clearing this one's
+# write tracker.
+# Exits non-zero on any failed check, so it can gate CI.
+#   python check_replicas.py
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+_directory = tempfile.mkdtemp()
+PRIMARY = os.path.join(_directory, "primary.db")
+REPLICA = os.path.join(_directory, "replica.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{PRIMARY}"
+os.environ["DATABASE_REPLICA_URLS"] = f"sqlite:///{REPLICA}"
+os.environ["DB_REPLICA_CHECK_INTERVAL"] = "0.2"
+os.environ["DB_REPLICA_MAX_LAG"] = "5"
+
+from fastapi.testclient import TestClient
+
+import auth
+import database
+import metrics
+import main
+import seed_data
+
+PROBE_WAIT = 3.0  # seconds to wait for the probe thread to settle a replica's state
+SLOW_PROBE = 1.5  # seconds a stand-in replica takes to fail its check
+
+def copy_primary():
+    # The replica starts out as a consistent copy of the primary
+    source, target = sqlite3.connect(PRIMARY), sqlite3.connect(REPLICA)
+    with target:
+        source.backup(target)
+    source.close()
+    target.close()
+
+def wait_for(condition) -> bool:
+    deadline = time.monotonic() + PROBE_WAIT
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+def route_counts() -> dict:
+    counters = metrics.snapshot()["counters"]
+    return {name: counters.get(f"db.route.{name}", 0) for name in ("replica", "primary_sticky", "primary_fallback")}
+
+def run_checks(client: TestClient) -> list:
+    failures = []
+    replica = database.replica_set.replicas[0]
+
+    def expect(name: str, ok: bool, detail=""):
+        print(f"{'ok  ' if ok else 'FAIL'} {name} {detail}")
+        if not ok:
+            failures.append(name)
+
+    def login(username: str) -> dict:
+        token = client.post("/login/", json={"username": username, "password": "password"}).json()["access_token"]
+        return {"Authorization": f"Bearer {token}"}
+
+    def transaction_ids(headers: dict) -> set:
+        return {row["id"] for row in client.get("/transactions/?limit=250", headers=headers).json()}
+
+    def add_transaction(path: str, user_id: int, headers: dict) -> tuple:
+        # The new id and the read-your-writes marker the response carries
+        response = client.post(path, headers=headers, json={
+            "user_id": user_id, "amount": 12.5, "date": "2024-12-30",
+            "description": "replica check", "transaction_category_id": 1,
+        })
+        return response.json()["id"], response.headers.get(auth.READ_PRIMARY_HEADER)
+
+    # Unchecked replicas are not used; the first read starts the probe thread
+    started = time.perf_counter()
+    expect("first pick reads the primary", database.replica_set.pick() is None)
+    expect("first pick does not wait for a check", time.perf_counter() - started < 0.05)
+    expect("replica becomes healthy", wait_for(lambda: replica.healthy), replica.error or "")
+
+    first, second = login("user000001"), login("user000002")
+    before = route_counts()
+    transaction_ids(second)
+    expect("reads go to the replica", route_counts()["replica"] == before["replica"] + 1)
+
+    # Read-your-writes, sync and async writes alike. The new rows never reach
+    # the replica, so seeing them means the read went to the primary.
+    for path, user_id, headers in (("/transactions/", 1, first), ("/async/transactions/", 2, second)):
+        new_id, marker = add_transaction(path, user_id, headers)
+        expect(f"{path} write answers with a marker", marker is not None)
+        expect(f"read after {path} write sees it", new_id in transaction_ids(headers))
+        # As another worker: only the marker, first as the cookie, then as the header
+        database.write_tracker._sticky_until.pop(user_id, None)
+        expect(f"read on another worker after {path} write sees it (cookie)", new_id in transaction_ids(headers))
+        client.cookies.clear()
+        expect(f"read on another worker after {path} write sees it (header)",
+               new_id in transaction_ids({**headers, auth.READ_PRIMARY_HEADER: marker or ""}))
+        other = second if headers is first else first
+        before = route_counts()
+        transaction_ids({**other, auth.READ_PRIMARY_HEADER: marker or ""})
+        expect(f"{path} marker does not move another user's reads", route_counts()["replica"] == before["replica"] + 1)
+        expect(f"read after the {path} window ends goes to the replica", new_id not in transaction_ids(headers))
+
+    # A replica that hangs on connect: requests keep their latency while the
+    # probe thread waits, and reads fall back to the primary once it gives up
+    def hanging(connection):
+        time.sleep(SLOW_PROBE)
+        raise RuntimeError("replica unreachable")
+
+    real_lag = database.replica_lag
+    database.replica_lag = hanging
+    try:
+        replica.next_check_at = 0.0
+        time.sleep(0.3)  # the probe thread is now inside the slow check
+        slowest = 0.0
+        for _ in range(20):
+            started = time.perf_counter()
+            transaction_ids(second)
+            slowest = max(slowest, time.perf_counter() - started)
+        expect("requests do not wait for a hanging replica", slowest < SLOW_PROBE / 3, f"({slowest * 1000:.0f} ms)")
+        expect("hanging replica is marked unhealthy", wait_for(lambda: not replica.healthy), replica.error or "")
+        before = route_counts()
+        transaction_ids(second)
+        expect("reads fall back to the primary", route_counts()["primary_fallback"] == before["primary_fallback"] + 1)
+
+        database.replica_lag = lambda connection: 60.0
+        expect("lagging replica stays unhealthy", wait_for(lambda: replica.error == "lag 60.0s"), replica.error or "")
+    finally:
+        database.replica_lag = real_lag
+    expect("replica recovers", wait_for(lambda: replica.healthy), replica.error or "")
+    return failures
+
+if __name__ == "__main__":
+    seed_data.seed(users=2, transactions=40)
+    copy_primary()
+    try:
+        failures = run_checks(TestClient(main.app))
+    finally:
+        database.replica_set.stop()
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,88 @@
+# Checks that a logout seen by one worker process reaches another: a second
+# process, sharing a SQLite file with this one, must reject a token after it
+# was logged out here, both for a single token and for a logout from all
+# devices, in each principal mode. Exits non-zero on any failed check, so it
+# can gate CI.
+#   python check_revocation_sync.py
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+if "--worker" not in sys.argv:
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "revocation.db")
+os.environ["REVOCATION_SYNC_INTERVAL"] = "1"
+
+from fastapi.testclient import TestClient
+
+import main
+import seed_data
+
+SYNC_WAIT = 2.5  # seconds, comfortably past the worker's next sync
+
+def worker():
+    # Answers each bearer token on stdin with the status of GET /goals/
+    client = TestClient(main.app)
+    for line in sys.stdin:
+        response = client.get("/goals/", headers={"Authorization": f"Bearer {line.strip()}"})
+        print(response.status_code, flush=True)
+
+class OtherWorker:
+    def __init__(self, mode: str):
+        env = dict(os.environ, AUTH_PRINCIPAL_MODE=mode)
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--worker"], env=env, text=True,
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+        )
+
+    def status(self, token: str) -> int:
+        self.process.stdin.write(token + "\n")
+        self.process.stdin.flush()
+        return int(self.process.stdout.readline())
+
+    def close(self):
+        self.process.stdin.close()
+        self.process.wait()
+
+def login(client: TestClient) -> dict:
+    return client.post("/login/", json={"username": "user000001", "password": "password"}).json()
+
+def run_checks(client: TestClient) -> list:
+    failures = []
+
+    def expect(name: str, status: int, expected: int):
+        print(f"{name}: {status}")
+        if status != expected:
+            failures.append(f"{name}: expected {expected}, got {status}")
+
+    for mode in ("cache", "claims"):
+        other = OtherWorker(mode)
+        try:
+            for all_devices in (False, True):
+                name = f"{mode}, {'all devices' if all_devices else 'one token'}"
+                tokens = login(client)
+                headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+                # The other worker has verified (and cached) the token before the logout
+                expect(f"{name}, before logout", other.status(tokens["access_token"]), 200)
+                client.post(f"/logout/?all_devices={str(all_devices).lower()}", headers=headers,
+                            json={"refresh_token": tokens["refresh_token"]})
+                expect(f"{name}, this worker", client.get("/goals/", headers=headers).status_code, 401)
+                time.sleep(SYNC_WAIT)
+                expect(f"{name}, other worker", other.status(tokens["access_token"]), 401)
+                refreshed = client.post("/token/refresh/", json={"refresh_token": tokens["refresh_token"]})
+                expect(f"{name}, refresh", refreshed.status_code, 401)
+        finally:
+            other.close()
+    return failures
+
+if __name__ == "__main__":
+    if "--worker" in sys.argv:
+        worker()
+        sys.exit(0)
+    seed_data.seed(users=1, transactions=10)
+    failures = run_checks(TestClient(main.app))
+    for failure in failures:
+        print(f"FAIL {failure}")
+    sys.exit(1 if failures else 0)
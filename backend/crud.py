@@ -1,21 +1,99 @@
-from sqlalchemy.orm import Session
-from models import User, Budget, Goal, Report, Transaction, Notification
-from schemas import UserCreate, BudgetCreate, GoalsCreate, ReportCreate, TransactionCreate, TransactionRead, NotificationCreate, NotificationRead, UserResponse, GoalsRead, BudgetRead, ReportRead, UserPreferencesUpdate
+from sqlalchemy import select, update, delete, insert
+from sqlalchemy.orm import Session, joinedload, load_only, selectinload
+from models import User, Budget, Goal, Report, ReportPayload, Transaction, TransactionArchive, TransactionCategory, Notification
+from schemas import UserCreate, BudgetCreate, GoalsCreate, ReportCreate, TransactionCreate, TransactionRead, NotificationCreate, NotificationRead, UserResponse, GoalsRead, BudgetRead, ReportRead, ReportMetadata, UserPreferencesUpdate, TransactionBulkResult, TransactionBulkRowResult
+from typing import Optional
+from pydantic import ValidationError
+from config import BULK_CHUNK_SIZE
+import metrics
+import query_counter
 from passlib.context import CryptContext
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 import datetime
 from utils import hash_password
 from fastapi import HTTPException
+from pagination import Keyset, Page, PageParams
+from rollups import add_transactions, remove_transactions, rollup_key
+from report_store import store_payload
+from reports import summarise
+from decimal import Decimal
 import logging
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 logger = logging.getLogger("uvicorn.error")
 
+# Sort order of each list endpoint, matching the composite indexes in models.py
+USER_KEYSET = Keyset("users", User.id, User.id)
+BUDGET_KEYSET = Keyset("budgets", Budget.start_date, Budget.id)
+GOAL_KEYSET = Keyset("goals", Goal.deadline, Goal.id)
+REPORT_KEYSET = Keyset("reports", Report.generated_at, Report.id, descending=True)
+TRANSACTION_KEYSET = Keyset("transactions", Transaction.date, Transaction.id, descending=True)
+# Archived transactions (archive.py) continue the same listing and accept its cursors
+ARCHIVED_TRANSACTION_KEYSET = Keyset("transactions", TransactionArchive.date, TransactionArchive.id, descending=True)
+NOTIFICATION_KEYSET = Keyset("notifications", Notification.created_at, Notification.id, descending=True)
+
+def _page(db: Session, keyset: Keyset, base, params: PageParams, scope) -> Page:
+    rows = db.execute(keyset.statement(base, params, scope)).scalars().all()
+    return keyset.page(rows, params, scope)
+
+# Write path: one statement per create, update or delete.
+def _insert(db: Session, obj, read_schema):
+    # The ORM gets the new id from the INSERT itself (RETURNING, or the driver's
+    # lastrowid on MySQL) and every other column is set client-side, so the
+    # response is built before the commit instead of re-reading the row after it
+    db.add(obj)
+    db.flush()
+    result = read_schema.model_validate(obj, from_attributes=True)
+    db.commit()
+    return result
+
+def owned_update(model, object_id: int, user_id: int, values: dict, owner_column: str = "user_id"):
+    # UPDATE ... WHERE id AND owner, no SELECT first; another user's row simply doesn't match
+    table = model.__table__
+    return update(table).where(table.c.id == object_id, table.c[owner_column] == user_id).values(**values)
+
+def updated_row(model, object_id: int, user_id: int, values: dict, owner_column: str = "user_id") -> Optional[dict]:
+    # Row after an UPDATE without RETURNING, when the values cover every column
+    row = {"id": object_id, owner_column: user_id, **values}
+    return row if set(row) == set(model.__table__.c.keys()) else None
+
+def _update_owned(db: Session, model, object_id: int, user_id: int, values: dict, owner_column: str = "user_id") -> Optional[dict]:
+    # The updated row comes back with RETURNING where the dialect has it.
+    # Otherwise it is rebuilt from the values, and only partial updates read it back.
+    table = model.__table__
+    statement = owned_update(model, object_id, user_id, values, owner_column)
+    if db.get_bind().dialect.update_returning:
+        row = db.execute(statement.returning(*table.c)).mappings().first()
+        db.commit()
+        return dict(row) if row is not None else None
+
+    result = db.execute(statement)
+    db.commit()
+    if result.rowcount == 0:
+        return None
+    return updated_row(model, object_id, user_id, values, owner_column) or dict(
+        db.execute(select(table).where(table.c.id == object_id)).mappings().one()
+    )
+
+def _delete_owned(db: Session, model, object_id: int, user_id: int) -> bool:
+    result = db.execute(delete(model).where(model.id == object_id, model.user_id == user_id))
+    db.commit()
+    return result.rowcount > 0
+
+def bump_data_version(user_id: int):
+    # Run in the transaction of each transaction, budget and goal write, so a
+    # stored report's data_version tells whether its inputs have changed since
+    users = User.__table__
+    return update(users).where(users.c.id == user_id).values(data_version=users.c.data_version + 1)
+
+def get_data_version(db: Session, user_id: int) -> Optional[int]:
+    return db.execute(select(User.data_version).where(User.id == user_id)).scalar()
+
 def get_user(db: Session, user_id: int):
     return db.query(User).filter(User.id == user_id).first()
 
-def get_users(db: Session, skip: int = 0, limit: int = 250):
-    return db.query(User).offset(skip).limit(limit).all()
+def get_users(db: Session, params: PageParams) -> Page:
+    return _page(db, USER_KEYSET, select(User), params, None)
 
 def create_user(db: Session, user: UserCreate) -> UserResponse:
     try:
@@ -29,14 +107,13 @@ def create_user(db: Session, user: UserCreate) -> UserResponse:
             password=hashed_password,
             first_name=user.first_name,
             last_name=user.last_name,
-            phone_number=user.phone_number
+            phone_number=user.phone_number,
+            token_version=0
         )
-        db.add(db_user)
-        db.commit()
+        created = _insert(db, db_user, UserResponse)
         logger.info("User created successfully, committing to database.")
-        db.refresh(db_user)
 
-        return UserResponse(id=db_user.id, username=db_user.username, email=db_user.email)
+        return created
 
     except IntegrityError as e:
         logger.error(f"Integrity error occurred: {e}")
@@ -56,33 +133,38 @@ def get_user_by_username(db: Session, username: str):
 def get_budget(db: Session, budget_id: int):
     return db.query(Budget).filter(Budget.id == budget_id).first()
 
-def get_budgets(db: Session, user_id: int, skip: int = 0, limit: int = 10):
-    return db.query(Budget).filter(Budget.user_id == user_id).offset(skip).limit(limit).all()
+def get_budgets(db: Session, user_id: int, params: PageParams) -> Page:
+    return _page(db, BUDGET_KEYSET, select(Budget).where(Budget.user_id == user_id), params, user_id)
 
-def create_budget(db: Session, budget: BudgetCreate):
+def create_budget(db: Session, budget: BudgetCreate, user_id: int) -> BudgetRead:
     db_budget = Budget(
-        user_id=budget.user_id,
+        user_id=user_id,
         budget_category_id=budget.budget_category_id,
         amount=budget.amount,
         start_date=budget.start_date,
         end_date=budget.end_date
     )
-    db.add(db_budget)
-    db.commit()
-    db.refresh(db_budget)
-    
-    return BudgetRead(
-        id=db_budget.id,
-        amount=db_budget.amount,
-        start_date=db_budget.start_date,
-        end_date=db_budget.end_date
-    )
+    db.execute(bump_data_version(user_id))
+    return _insert(db, db_budget, BudgetRead)
+
+def update_budget(db: Session, budget_id: int, budget: BudgetCreate, user_id: int) -> Optional[dict]:
+    db.execute(bump_data_version(user_id))
+    return _update_owned(db, Budget, budget_id, user_id, {
+        "budget_category_id": budget.budget_category_id,
+        "amount": budget.amount,
+        "start_date": budget.start_date,
+        "end_date": budget.end_date,
+    })
+
+def delete_budget(db: Session, budget_id: int, user_id: int) -> bool:
+    db.execute(bump_data_version(user_id))
+    return _delete_owned(db, Budget, budget_id, user_id)
 
 def get_goal(db: Session, goal_id: int):
     return db.query(Goal).filter(Goal.id == goal_id).first()
 
-def get_goals(db: Session, user_id: int, skip: int = 0, limit: int = 10):
-    return db.query(Goal).filter(Goal.user_id == user_id).offset(skip).limit(limit).all()
+def get_goals(db: Session, user_id: int, params: PageParams) -> Page:
+    return _page(db, GOAL_KEYSET, select(Goal).where(Goal.user_id == user_id), params, user_id)
 
 def create_goal(db: Session, goal: GoalsCreate, user_id: int) -> GoalsRead:
     db_goal = Goal(
@@ -93,105 +175,326 @@ def create_goal(db: Session, goal: GoalsCreate, user_id: int) -> GoalsRead:
         deadline=goal.deadline,
         description=goal.description
     )
-    db.add(db_goal)
-    db.commit()
-    db.refresh(db_goal)
-
-    return GoalsRead(
-        id=db_goal.id,
-        name=db_goal.name,
-        target_amount=db_goal.target_amount,
-        current_amount=db_goal.current_amount,
-        deadline=db_goal.deadline,
-        description=db_goal.description
-    )
-    
+    db.execute(bump_data_version(user_id))
+    return _insert(db, db_goal, GoalsRead)
+
+def update_goal(db: Session, goal_id: int, goal: GoalsCreate, user_id: int) -> Optional[dict]:
+    db.execute(bump_data_version(user_id))
+    return _update_owned(db, Goal, goal_id, user_id, {
+        "name": goal.name,
+        "target_amount": goal.target_amount,
+        "current_amount": goal.current_amount,
+        "deadline": goal.deadline,
+        "description": goal.description,
+    })
+
+def delete_goal(db: Session, goal_id: int, user_id: int) -> bool:
+    db.execute(bump_data_version(user_id))
+    return _delete_owned(db, Goal, goal_id, user_id)
+
+
+# Report payloads live in report_payloads (report_store.py) and are loaded
+# with the reports that are read, one statement for a report and one more for
+# a page of them
 def get_report(db: Session, report_id: int):
-    return db.query(Report).filter(Report.id == report_id).first()
+    return db.query(Report).options(joinedload(Report.payload)).filter(Report.id == report_id).first()
+
+def get_reports(db: Session, user_id: int, params: PageParams) -> Page:
+    base = select(Report).options(selectinload(Report.payload)).where(Report.user_id == user_id)
+    return _page(db, REPORT_KEYSET, base, params, user_id)
+
+# Listings leave the payload columns unloaded; touching one raises instead of
+# quietly loading it per report
+REPORT_METADATA = load_only(Report.id, Report.user_id, Report.report_type_id, Report.generated_at,
+                            Report.payload_size, Report.summary, raiseload=True)
+
+def get_reports_metadata(db: Session, user_id: int, params: PageParams) -> Page:
+    base = select(Report).options(REPORT_METADATA).where(Report.user_id == user_id)
+    page = _page(db, REPORT_KEYSET, base, params, user_id)
+    page.items = [report_metadata(report) for report in page.items]
+    return page
+
+def get_report_metadata(db: Session, report_id: int) -> Optional[Report]:
+    return db.query(Report).options(REPORT_METADATA).filter(Report.id == report_id).first()
+
+def report_metadata(report: Report) -> ReportMetadata:
+    return ReportMetadata(id=report.id, user_id=report.user_id, report_type_id=report.report_type_id,
+                          generated_at=report.generated_at, size=report.payload_size, summary=report.summary)
+
+def get_report_payload(db: Session, report_id: int):
+    # (user_id, inline_data, codec, body) of one report, without decompressing it
+    return db.execute(
+        select(Report.user_id, Report.inline_data.label("inline_data"), ReportPayload.codec, ReportPayload.body)
+        .outerjoin(ReportPayload, ReportPayload.hash == Report.payload_hash)
+        .where(Report.id == report_id)
+    ).first()
 
-def get_reports(db: Session, user_id: int,  skip: int = 0, limit: int = 10):
-    return db.query(Report).filter(Report.user_id == user_id).offset(skip).limit(limit).all()
+def get_latest_report(db: Session, user_id: int, report_type_id: int) -> Optional[Report]:
+    # The payload is left to load on access, only a reused report needs it
+    return db.execute(
+        select(Report)
+        .where(Report.user_id == user_id, Report.report_type_id == report_type_id)
+        .order_by(Report.generated_at.desc(), Report.id.desc())
+        .limit(1)
+    ).scalars().first()
 
-def create_report(db: Session, report: ReportCreate, user_id: int) -> ReportRead:
+def clone_report(db: Session, report: Report, data: dict, generated_at: datetime.date) -> ReportRead:
+    # A new report row sharing an unchanged report's payload
     db_report = Report(
         user_id = report.user_id,
         report_type_id = report.report_type_id,
-        generated_at = report.generated_at,
-        data = report.data
+        generated_at = generated_at,
+        payload_hash = report.payload_hash,
+        payload_size = report.payload_size,
+        summary = report.summary,
+        data_version = report.data_version,
     )
     db.add(db_report)
+    db.flush()
+    result = ReportRead(id=db_report.id, user_id=db_report.user_id, report_type_id=db_report.report_type_id,
+                        generated_at=generated_at, data=data)
     db.commit()
-    db.refresh(db_report)
+    return result
 
-    return ReportRead(
-        id=db_report.id,
-        report_type_id = db_report.report_type_id,
-        generated_at = db_report.generated_at,
-        data = db_report.data,
+def create_report(db: Session, report: ReportCreate, user_id: int, data_version: Optional[int] = None) -> ReportRead:
+    payload_hash, payload_size = store_payload(db.connection(), report.data)
+    db_report = Report(
+        user_id = user_id,
+        report_type_id = report.report_type_id,
+        generated_at = report.generated_at,
+        payload_hash = payload_hash,
+        payload_size = payload_size,
+        summary = summarise(report.data),
+        data_version = data_version,
     )
+    db.add(db_report)
+    db.flush()
+    # Built from the data in hand rather than by decompressing the payload again
+    result = ReportRead(id=db_report.id, user_id=user_id, report_type_id=report.report_type_id,
+                        generated_at=report.generated_at, data=report.data)
+    db.commit()
+    return result
+
+def delete_report(db: Session, report_id: int, user_id: int) -> bool:
+    return _delete_owned(db, Report, report_id, user_id)
 
 def get_transaction(db: Session, transaction_id: int):
-    return db.query(Transaction).filter(Transaction.id == transaction_id).first()
+    # Archived transactions stay readable by id
+    return (db.query(Transaction).filter(Transaction.id == transaction_id).first()
+            or db.get(TransactionArchive, transaction_id))
+
+def transaction_page_statements(user_id: int, params: PageParams, max_id: Optional[int] = None):
+    # The hot and the archive table each answer the page with their own index
+    # range scan; max_id limits the listing to rows that existed at some point
+    branch, offset = TRANSACTION_KEYSET.branch(params, user_id)
+    statements = []
+    for keyset, model in ((TRANSACTION_KEYSET, Transaction), (ARCHIVED_TRANSACTION_KEYSET, TransactionArchive)):
+        base = select(model).where(model.user_id == user_id)
+        if max_id is not None:
+            base = base.where(model.id <= max_id)
+        statements.append(keyset.statement(base, branch, user_id))
+    hot, cold = statements
+    return hot, cold, offset
 
-def get_transactions(db: Session, user_id: int, skip: int = 0, limit: int = 10):
-    return db.query(Transaction).filter(Transaction.user_id == user_id).offset(skip).limit(limit).all()
+def get_transactions(db: Session, user_id: int, params: PageParams, max_id: Optional[int] = None) -> Page:
+    hot, cold, offset = transaction_page_statements(user_id, params, max_id)
+    runs = [db.execute(hot).scalars().all(), db.execute(cold).scalars().all()]
+    return TRANSACTION_KEYSET.merge(runs, params, user_id, offset)
+
+# Every transaction write also updates the monthly rollup (rollups.py) in the
+# same database transaction
+def transaction_values(transaction: TransactionCreate, user_id: int) -> dict:
+    return {
+        "user_id": user_id,
+        "amount": transaction.amount,
+        "transaction_category_id": transaction.transaction_category_id,
+        "date": transaction.date,
+        "description": transaction.description,
+    }
 
 def create_transaction(db: Session, transaction: TransactionCreate, user_id: int) -> TransactionRead:
-    db_transaction = Transaction(
-        user_id = user_id,
-        amount = transaction.amount,
-        transaction_category_id = transaction.transaction_category_id,
-        date = transaction.date,
-        description = transaction.description
-    )
-    db.add(db_transaction)
+    values = transaction_values(transaction, user_id)
+    db.execute(bump_data_version(user_id))
+    add_transactions(db.connection(), [values])
+    return _insert(db, Transaction(**values), TransactionRead)
+
+def _locked_transaction(db: Session, transaction_id: int, user_id: int, model=Transaction) -> Optional[dict]:
+    # The row as it is before a change, locked until the commit (MySQL, PostgreSQL)
+    table = model.__table__
+    return db.execute(
+        select(table).where(table.c.id == transaction_id, table.c.user_id == user_id).with_for_update()
+    ).mappings().first()
+
+def _moves_rollup(old: dict, new: dict) -> bool:
+    return (Decimal(str(old["amount"])) != Decimal(str(new["amount"]))
+            or old["date"] != new["date"]
+            or old["transaction_category_id"] != new["transaction_category_id"])
+
+# Archived transactions are listed and read with the hot ones, so they can be
+# changed the same way: in place, in whichever table holds them. An archived
+# row keeps living in the archive even if its new date is recent; listings
+# merge both tables, and the rollup covers both alike.
+def change_transaction(db: Session, transaction_id: int, user_id: int, values: dict) -> Optional[dict]:
+    # UPDATE and rollup change, left uncommitted so crud_async can run it too.
+    # The rollup needs the old amount, date and category, so the row is read first.
+    for model in (Transaction, TransactionArchive):
+        old = _locked_transaction(db, transaction_id, user_id, model)
+        if old is not None:
+            break
+    else:
+        return None
+    db.execute(owned_update(model, transaction_id, user_id, values))
+    db.execute(bump_data_version(user_id))
+    new = {**old, **values}
+    if _moves_rollup(old, new):
+        connection = db.connection()
+        add_transactions(connection, [new])
+        remove_transactions(connection, [old], refilled=[rollup_key(new)])
+    return new
+
+def _delete_transaction(db: Session, model, transaction_id: int, user_id: int) -> Optional[dict]:
+    # The deleted row, back with RETURNING where the dialect has it
+    table = model.__table__
+    statement = delete(table).where(table.c.id == transaction_id, table.c.user_id == user_id)
+    if db.get_bind().dialect.delete_returning:
+        return db.execute(statement.returning(*table.c)).mappings().first()
+    old = _locked_transaction(db, transaction_id, user_id, model)
+    if old is not None:
+        db.execute(statement)
+    return old
+
+def remove_transaction(db: Session, transaction_id: int, user_id: int) -> bool:
+    # DELETE and rollup change, uncommitted
+    old = (_delete_transaction(db, Transaction, transaction_id, user_id)
+           or _delete_transaction(db, TransactionArchive, transaction_id, user_id))
+    if old is None:
+        return False
+    db.execute(bump_data_version(user_id))
+    remove_transactions(db.connection(), [old])
+    return True
+
+def _bulk_row_error(row: TransactionCreate, category_ids: set) -> Optional[str]:
+    # Checks the database would otherwise fail a whole batch on
+    if row.transaction_category_id not in category_ids:
+        return f"Unknown transaction_category_id {row.transaction_category_id}"
+    if abs(row.amount) >= 10 ** 8:
+        return "amount out of range"
+    if len(row.description) > 255:
+        return "description longer than 255 characters"
+    return None
+
+def create_transactions_bulk(db: Session, rows: list, user_id: int, chunk_size: int = BULK_CHUNK_SIZE) -> TransactionBulkResult:
+    # All rows are validated up front, against one lookup of the category ids,
+    # then inserted with executemany in chunks of chunk_size, one transaction per
+    # chunk. A failing chunk is rolled back and reported without stopping the rest.
+    category_ids = set(db.scalars(select(TransactionCategory.id)).all())
+    results = [None] * len(rows)
+    valid = []
+    for index, raw in enumerate(rows):
+        try:
+            row = TransactionCreate.model_validate(raw)
+        except ValidationError as e:
+            first = e.errors()[0]
+            field = ".".join(str(part) for part in first["loc"])
+            error = f"{field}: {first['msg']}" if field else first["msg"]
+            results[index] = TransactionBulkRowResult(index=index, status="invalid", error=error)
+            continue
+        error = _bulk_row_error(row, category_ids)
+        if error:
+            results[index] = TransactionBulkRowResult(index=index, status="invalid", error=error)
+            continue
+        valid.append((index, {
+            "user_id": user_id,
+            "amount": row.amount,
+            "transaction_category_id": row.transaction_category_id,
+            "date": row.date,
+            "description": row.description,
+        }))
+
+    # New ids come back with the batch on PostgreSQL. SQLite would have to fall
+    # back to one INSERT per row to keep RETURNING in parameter order and MySQL
+    # has no RETURNING, so there the rows are reported without their ids.
+    returning = db.get_bind().dialect.name == "postgresql"
+    statement = insert(Transaction)
+    if returning:
+        statement = statement.returning(Transaction.id, sort_by_parameter_order=True)
+
+    for start in range(0, len(valid), chunk_size):
+        chunk = valid[start:start + chunk_size]
+        query_counter.note_batch()
+        try:
+            db.execute(bump_data_version(user_id))
+            add_transactions(db.connection(), [values for _, values in chunk])
+            result = db.execute(statement, [values for _, values in chunk])
+            ids = result.scalars().all() if returning else [None] * len(chunk)
+            db.commit()
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.error(f"Bulk insert of {len(chunk)} transactions for user {user_id} failed: {e}")
+            for index, _ in chunk:
+                results[index] = TransactionBulkRowResult(index=index, status="failed", error="Database error")
+            continue
+        for (index, _), new_id in zip(chunk, ids):
+            results[index] = TransactionBulkRowResult(index=index, status="created", id=new_id)
+
+    counts = {status: sum(1 for result in results if result.status == status) for status in ("created", "invalid", "failed")}
+    metrics.incr("transactions.bulk.requests")
+    metrics.incr("transactions.bulk.created", counts["created"])
+    metrics.observe("transactions.bulk.rows", len(rows))
+    return TransactionBulkResult(results=results, **counts)
+
+def update_transaction(db: Session, transaction_id: int, transaction: TransactionCreate, user_id: int) -> Optional[dict]:
+    values = transaction_values(transaction, user_id)
+    del values["user_id"]
+    row = change_transaction(db, transaction_id, user_id, values)
     db.commit()
-    db.refresh(db_transaction)
-    
-    return TransactionRead(
-        id = db_transaction.id,
-        amount = db_transaction.amount,
-        date = db_transaction.date,
-        description = db_transaction.description,
-        transaction_category_id = db_transaction.transaction_category_id,
-    )
+    return row
+
+def delete_transaction(db: Session, transaction_id: int, user_id: int) -> bool:
+    deleted = remove_transaction(db, transaction_id, user_id)
+    db.commit()
+    return deleted
 
 def get_notification(db: Session, notification_id: int):
     return db.query(Notification).filter(Notification.id == notification_id).first()
 
-def get_notifications(db: Session, skip: int = 0, limit: int = 10):
-    return db.query(Notification).offset(skip).limit(limit).all()
+def get_notifications(db: Session, user_id: int, params: PageParams, is_read: bool = None) -> Page:
+    base = select(Notification).where(Notification.user_id == user_id)
+    if is_read is not None:
+        base = base.where(Notification.is_read == is_read)
+    return _page(db, NOTIFICATION_KEYSET, base, params, (user_id, is_read))
 
 def create_notification(db: Session, notification: NotificationCreate):
     db_notification = Notification(
-        user_id=notification.userId,
+        user_id=notification.user_id,
         message=notification.message,
-        created_at=notification.date or datetime.datetime.utcnow()
+        notification_type_id=notification.notification_type_id,
+        is_read=notification.isRead or False,
+        created_at=notification.created_at or datetime.datetime.utcnow()
     )
     db.add(db_notification)
-    db.commit()
-    db.refresh(db_notification)
-    
-    return NotificationRead(
+    db.flush()
+    result = NotificationRead(
         id = db_notification.id,
+        user_id = db_notification.user_id,
         message = db_notification.message,
         isRead = db_notification.is_read,
-        date = db_notification.date,
+        created_at = db_notification.created_at,
         notification_type_id = db_notification.notification_type_id
-    ) 
+    )
+    db.commit()
+    return result
 
 
-def update_user_preferences(db: Session, user_id: int, preferences: UserPreferencesUpdate):
-    db_user = db.query(User).filter(User.id == user_id).first()
-    if not db_user:
-        return None
-    if preferences.dark_mode is not None:
-        db_user.dark_mode = preferences.dark_mode
-    if preferences.font_size is not None:
-        db_user.font_size = preferences.font_size
-    db.commit()
-    db.refresh(db_user)
-    return db_user
+def update_user_preferences(db: Session, user_id: int, preferences: UserPreferencesUpdate) -> Optional[dict]:
+    values = preferences.model_dump(exclude_none=True)
+    if not values:
+        db_user = get_user_preferences(db, user_id)
+        return {"id": db_user.id, "dark_mode": db_user.dark_mode, "font_size": db_user.font_size} if db_user else None
+    return _update_owned(db, User, user_id, user_id, values, owner_column="id")
+
+def update_user(db: Session, user_id: int, values: dict) -> Optional[dict]:
+    return _update_owned(db, User, user_id, user_id, values, owner_column="id")
 
 def get_user_preferences(db: Session, user_id: int):
     return db.query(User).filter(User.id == user_id).first()
\ No newline at end of file
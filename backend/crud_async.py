@@ -0,0 +1,226 @@
+from sqlalchemy import select, update, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy.exc import IntegrityError
+from fastapi import HTTPException
+from models import User, Budget, Goal, Report, Transaction, TransactionArchive, Notification
+from schemas import UserCreate, BudgetCreate, GoalsCreate, TransactionCreate, NotificationCreate
+from pagination import Keyset, Page, PageParams
+from crud import (
+    USER_KEYSET, BUDGET_KEYSET, GOAL_KEYSET, REPORT_KEYSET,
+    TRANSACTION_KEYSET, NOTIFICATION_KEYSET, owned_update, updated_row, transaction_page_statements,
+    transaction_values, change_transaction, remove_transaction, REPORT_METADATA, report_metadata,
+    bump_data_version
+)
+from rollups import add_transactions
+import datetime
+import logging
+
+logger = logging.getLogger("uvicorn.error")
+
+# AsyncSession counterparts of crud.py. Every call awaits the driver instead of
+# blocking a threadpool worker, so endpoint concurrency is bounded by the pool.
+
+async def _first(db: AsyncSession, statement):
+    result = await db.execute(statement)
+    return result.scalars().first()
+
+async def _page(db: AsyncSession, keyset: Keyset, base, params: PageParams, scope) -> Page:
+    result = await db.execute(keyset.statement(base, params, scope))
+    return keyset.page(result.scalars().all(), params, scope)
+
+async def _update_owned(db: AsyncSession, model, object_id: int, user_id: int, values: dict):
+    # Single UPDATE ... WHERE id AND owner, see crud._update_owned
+    table = model.__table__
+    statement = owned_update(model, object_id, user_id, values)
+    if db.get_bind().dialect.update_returning:
+        row = (await db.execute(statement.returning(*table.c))).mappings().first()
+        await db.commit()
+        return dict(row) if row is not None else None
+
+    result = await db.execute(statement)
+    await db.commit()
+    if result.rowcount == 0:
+        return None
+    return updated_row(model, object_id, user_id, values) or dict(
+        (await db.execute(select(table).where(table.c.id == object_id))).mappings().one()
+    )
+
+async def _delete_owned(db: AsyncSession, model, object_id: int, user_id: int) -> bool:
+    result = await db.execute(delete(model).where(model.id == object_id, model.user_id == user_id))
+    await db.commit()
+    return result.rowcount > 0
+
+# Users
+async def get_user(db: AsyncSession, user_id: int):
+    return await _first(db, select(User).where(User.id == user_id))
+
+async def get_users(db: AsyncSession, params: PageParams) -> Page:
+    return await _page(db, USER_KEYSET, select(User), params, None)
+
+async def get_user_by_email(db: AsyncSession, email: str):
+    return await _first(db, select(User).where(User.email == email))
+
+async def get_user_by_username(db: AsyncSession, username: str):
+    return await _first(db, select(User).where(User.username == username))
+
+async def create_user(db: AsyncSession, user: UserCreate, hashed_password: str):
+    db_user = User(
+        username=user.username,
+        email=user.email,
+        password=hashed_password,
+        first_name=user.first_name,
+        last_name=user.last_name,
+        phone_number=user.phone_number
+    )
+    db.add(db_user)
+    try:
+        await db.commit()
+    except IntegrityError as e:
+        logger.error(f"Integrity error occurred: {e}")
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="User already exists or invalid data")
+    return db_user
+
+# Budgets
+async def get_budget(db: AsyncSession, budget_id: int):
+    return await _first(db, select(Budget).where(Budget.id == budget_id))
+
+async def get_budgets(db: AsyncSession, user_id: int, params: PageParams) -> Page:
+    return await _page(db, BUDGET_KEYSET, select(Budget).where(Budget.user_id == user_id), params, user_id)
+
+async def create_budget(db: AsyncSession, budget: BudgetCreate, user_id: int):
+    db_budget = Budget(
+        user_id=user_id,
+        budget_category_id=budget.budget_category_id,
+        amount=budget.amount,
+        start_date=budget.start_date,
+        end_date=budget.end_date
+    )
+    await db.execute(bump_data_version(user_id))
+    db.add(db_budget)
+    await db.commit()
+    return db_budget
+
+async def update_budget(db: AsyncSession, budget_id: int, budget: BudgetCreate, user_id: int):
+    await db.execute(bump_data_version(user_id))
+    return await _update_owned(db, Budget, budget_id, user_id, {
+        "budget_category_id": budget.budget_category_id,
+        "amount": budget.amount,
+        "start_date": budget.start_date,
+        "end_date": budget.end_date,
+    })
+
+async def delete_budget(db: AsyncSession, budget_id: int, user_id: int) -> bool:
+    await db.execute(bump_data_version(user_id))
+    return await _delete_owned(db, Budget, budget_id, user_id)
+
+# Goals
+async def get_goal(db: AsyncSession, goal_id: int):
+    return await _first(db, select(Goal).where(Goal.id == goal_id))
+
+async def get_goals(db: AsyncSession, user_id: int, params: PageParams) -> Page:
+    return await _page(db, GOAL_KEYSET, select(Goal).where(Goal.user_id == user_id), params, user_id)
+
+async def create_goal(db: AsyncSession, goal: GoalsCreate, user_id: int):
+    db_goal = Goal(
+        user_id=user_id,
+        name=goal.name,
+        target_amount=goal.target_amount,
+        current_amount=goal.current_amount,
+        deadline=goal.deadline,
+        description=goal.description
+    )
+    await db.execute(bump_data_version(user_id))
+    db.add(db_goal)
+    await db.commit()
+    return db_goal
+
+async def update_goal(db: AsyncSession, goal_id: int, goal: GoalsCreate, user_id: int):
+    await db.execute(bump_data_version(user_id))
+    return await _update_owned(db, Goal, goal_id, user_id, {
+        "name": goal.name,
+        "target_amount": goal.target_amount,
+        "current_amount": goal.current_amount,
+        "deadline": goal.deadline,
+        "description": goal.description,
+    })
+
+async def delete_goal(db: AsyncSession, goal_id: int, user_id: int) -> bool:
+    await db.execute(bump_data_version(user_id))
+    return await _delete_owned(db, Goal, goal_id, user_id)
+
+# Reports
+# Payloads are loaded eagerly, lazy loads are not available to async sessions
+async def get_report(db: AsyncSession, report_id: int):
+    return await _first(db, select(Report).options(joinedload(Report.payload)).where(Report.id == report_id))
+
+async def get_reports(db: AsyncSession, user_id: int, params: PageParams) -> Page:
+    base = select(Report).options(selectinload(Report.payload)).where(Report.user_id == user_id)
+    return await _page(db, REPORT_KEYSET, base, params, user_id)
+
+async def get_reports_metadata(db: AsyncSession, user_id: int, params: PageParams) -> Page:
+    base = select(Report).options(REPORT_METADATA).where(Report.user_id == user_id)
+    page = await _page(db, REPORT_KEYSET, base, params, user_id)
+    page.items = [report_metadata(report) for report in page.items]
+    return page
+
+# Reports are only created by the report workers (jobs.py), through
+# crud.create_report, which also stores the data_version they were built from
+async def delete_report(db: AsyncSession, report_id: int, user_id: int) -> bool:
+    return await _delete_owned(db, Report, report_id, user_id)
+
+# Transactions
+async def get_transaction(db: AsyncSession, transaction_id: int):
+    return (await _first(db, select(Transaction).where(Transaction.id == transaction_id))
+            or await db.get(TransactionArchive, transaction_id))
+
+async def get_transactions(db: AsyncSession, user_id: int, params: PageParams) -> Page:
+    # Hot and archived rows, see crud.get_transactions
+    hot, cold, offset = transaction_page_statements(user_id, params)
+    runs = [(await db.execute(hot)).scalars().all(), (await db.execute(cold)).scalars().all()]
+    return TRANSACTION_KEYSET.merge(runs, params, user_id, offset)
+
+# The rollup bookkeeping is shared with crud.py and runs on the session's sync side
+async def create_transaction(db: AsyncSession, transaction: TransactionCreate, user_id: int):
+    values = transaction_values(transaction, user_id)
+    await db.execute(bump_data_version(user_id))
+    await db.run_sync(lambda session: add_transactions(session.connection(), [values]))
+    db_transaction = Transaction(**values)
+    db.add(db_transaction)
+    await db.commit()
+    return db_transaction
+
+async def update_transaction(db: AsyncSession, transaction_id: int, transaction: TransactionCreate, user_id: int):
+    values = transaction_values(transaction, user_id)
+    del values["user_id"]
+    row = await db.run_sync(change_transaction, transaction_id, user_id, values)
+    await db.commit()
+    return row
+
+async def delete_transaction(db: AsyncSession, transaction_id: int, user_id: int) -> bool:
+    deleted = await db.run_sync(remove_transaction, transaction_id, user_id)
+    await db.commit()
+    return deleted
+
+# Notifications
+async def get_notification(db: AsyncSession, notification_id: int):
+    return await _first(db, select(Notification).where(Notification.id == notification_id))
+
+async def get_notifications(db: AsyncSession, user_id: int, params: PageParams, is_read: bool = None) -> Page:
+    base = select(Notification).where(Notification.user_id == user_id)
+    if is_read is not None:
+        base = base.where(Notification.is_read == is_read)
+    return await _page(db, NOTIFICATION_KEYSET, base, params, (user_id, is_read))
+
+async def create_notification(db: AsyncSession, notification: NotificationCreate):
+    db_notification = Notification(
+        user_id=notification.user_id,
+        message=notification.message,
+        notification_type_id=notification.notification_type_id,
+        is_read=notification.isRead or False,
+        created_at=notification.created_at or datetime.datetime.utcnow()
+    )
+    db.add(db_notification)
+    await db.commit()
+    return db_notification
@@ -1,18 +1,381 @@
+import itertools
+import logging
 import os
+import threading
+import time
+from contextvars import ContextVar
 from fastapi import FastAPI, HTTPException, Depends
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, text, make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.exc import SQLAlchemyError, TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool, StaticPool
+
+import metrics
+import query_counter
+from slow_query_log import slow_query_log
+from config import (
+    DATABASE_URL, ASYNC_DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE, DB_POOL_PRE_PING, DB_STATEMENT_TIMEOUT_MS, DB_ECHO,
+    DATABASE_REPLICA_URLS, DB_REPLICA_MAX_LAG, DB_REPLICA_CHECK_INTERVAL, DB_READ_YOUR_WRITES_WINDOW
+)
+
+logger = logging.getLogger(__name__)
+
+# Running totals for one engine's pool, read together with the live pool state
+class PoolStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.wait_ms_total = 0.0
+        self.wait_ms_max = 0.0
+
+    def record_wait(self, wait_ms: float):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_ms_total += wait_ms
+            if wait_ms > self.wait_ms_max:
+                self.wait_ms_max = wait_ms
+
+    def incr(self, name: str):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+                "wait_ms_avg": self.wait_ms_total / self.checkouts if self.checkouts else 0.0,
+                "wait_ms_max": self.wait_ms_max,
+            }
+
+# Measures how long callers wait to get a connection from the pool
+class _InstrumentedPoolMixin:
+    def __init__(self, *args, stats: PoolStats = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = stats or PoolStats()
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            connection = super().connect()
+        except PoolTimeoutError:
+            self.stats.incr("timeouts")
+            raise
+        self.stats.record_wait((time.perf_counter() - started) * 1000)
+        return connection
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    pass
+
+class InstrumentedAsyncQueuePool(_InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+def _install_statement_timeout(engine, timeout_ms: int):
+    @event.listens_for(engine, "connect")
+    def set_statement_timeout(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            if engine.dialect.name == "mysql":
+                cursor.execute(f"SET SESSION max_execution_time = {int(timeout_ms)}")
+            elif engine.dialect.name == "postgresql":
+                cursor.execute(f"SET statement_timeout = {int(timeout_ms)}")
+        finally:
+            cursor.close()
+
+def _install_pool_events(engine, stats: PoolStats):
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        stats.incr("connects")
+
+    @event.listens_for(engine, "invalidate")
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        stats.incr("invalidations")
+
+def is_sqlite_memory(url) -> bool:
+    url = make_url(url)
+    return url.get_backend_name() == "sqlite" and (
+        url.database in (None, "", ":memory:") or url.query.get("mode") == "memory"
+    )
+
+def _install_sqlite_pragmas(engine, memory: bool):
+    # WAL lets readers run alongside the single writer; NORMAL sync is safe with WAL
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            if not memory:
+                cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.execute(f"PRAGMA busy_timeout={int(DB_POOL_TIMEOUT * 1000)}")
+        finally:
+            cursor.close()
+
+def _engine_options(url, overrides: dict, poolclass) -> dict:
+    options = {
+        "echo": DB_ECHO,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "poolclass": poolclass,
+    }
+    if make_url(url).get_backend_name() == "sqlite":
+        # Connections are handed between FastAPI's worker threads
+        options["connect_args"] = {"check_same_thread": False}
+        if is_sqlite_memory(url):
+            # An in-memory database disappears with its last connection, so the
+            # whole process shares a single one
+            options["poolclass"] = StaticPool
+            for name in ("pool_size", "max_overflow", "pool_timeout"):
+                del options[name]
+    options.update(overrides)
+    return options
+
+# Single place where engines are built. Every setting comes from config.py
+# (and therefore the environment); keyword arguments override per engine.
+def create_db_engine(url: str = DATABASE_URL, **overrides):
+    statement_timeout_ms = overrides.pop("statement_timeout_ms", DB_STATEMENT_TIMEOUT_MS)
+    engine = create_engine(url, **_engine_options(url, overrides, InstrumentedQueuePool))
+    stats = getattr(engine.pool, "stats", None) or PoolStats()
+    _install_pool_events(engine, stats)
+    query_counter.install(engine)
+    slow_query_log.install(engine)
+    if statement_timeout_ms:
+        _install_statement_timeout(engine, statement_timeout_ms)
+    if engine.dialect.name == "sqlite":
+        _install_sqlite_pragmas(engine, is_sqlite_memory(url))
+    return engine
+
+def create_async_db_engine(url: str = ASYNC_DATABASE_URL, **overrides):
+    statement_timeout_ms = overrides.pop("statement_timeout_ms", DB_STATEMENT_TIMEOUT_MS)
+    engine = create_async_engine(url, **_engine_options(url, overrides, InstrumentedAsyncQueuePool))
+    # Pool and connection events live on the underlying sync engine
+    stats = getattr(engine.pool, "stats", None) or PoolStats()
+    _install_pool_events(engine.sync_engine, stats)
+    query_counter.install(engine.sync_engine)
+    slow_query_log.install(engine.sync_engine)
+    if statement_timeout_ms:
+        _install_statement_timeout(engine.sync_engine, statement_timeout_ms)
+    if engine.dialect.name == "sqlite":
+        _install_sqlite_pragmas(engine.sync_engine, is_sqlite_memory(url))
+    return engine
+
+def pool_status(engine) -> dict:
+    pool = engine.pool
+    status = {"pid": os.getpid(), "pool_class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update({
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": pool.overflow(),
+            "max_overflow": pool._max_overflow,
+            "timeout": pool.timeout(),
+        })
+    stats = getattr(pool, "stats", None)
+    if stats is not None:
+        status.update(stats.as_dict())
+    return status
+
+def replica_lag(connection) -> float:
+    # Seconds the replica is behind its source; 0 for databases without replication status
+    if connection.dialect.name != "mysql":
+        connection.execute(text("SELECT 1"))
+        return 0.0
+    for statement, column in (("SHOW REPLICA STATUS", "Seconds_Behind_Source"),
+                              ("SHOW SLAVE STATUS", "Seconds_Behind_Master")):
+        try:
+            row = connection.execute(text(statement)).mappings().first()
+        except SQLAlchemyError:
+            continue
+        if row is None:
+            return 0.0  # not configured as a replica
+        lag = row.get(column)
+        if lag is None:
+            raise RuntimeError("replication is not running")
+        return float(lag)
+    raise RuntimeError("could not read replication status")
+
+class Replica:
+    def __init__(self, name: str, engine):
+        self.name = name
+        self.engine = engine
+        # Unused until the first probe has passed
+        self.healthy = False
+        self.lag = None
+        self.error = "not checked yet"
+        self.next_check_at = 0.0
+
+# Read replicas with periodic lag/health checks. A replica that is too far
+# behind, or whose connections fail, is skipped until a later check passes;
+# with no usable replica every read goes to the primary. The checks run on a
+# background thread, so a replica that is down costs requests nothing: pick()
+# only reads the state the last check left.
+class ReplicaSet:
+    def __init__(self, engines, max_lag: float = DB_REPLICA_MAX_LAG, check_interval: float = DB_REPLICA_CHECK_INTERVAL):
+        self.replicas = [Replica(f"replica{i}", engine) for i, engine in enumerate(engines)]
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._round_robin = itertools.count()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._prober = None
+        for replica in self.replicas:
+            self._watch_errors(replica)
+
+    def _watch_errors(self, replica: Replica):
+        @event.listens_for(replica.engine, "handle_error")
+        def on_error(context):
+            if context.is_disconnect or context.connection is None:
+                self.mark_unhealthy(replica, context.original_exception)
+
+    def mark_unhealthy(self, replica: Replica, error):
+        with self._lock:
+            replica.healthy = False
+            replica.error = str(error)
+            replica.next_check_at = time.monotonic() + self.check_interval
+        logger.warning(f"Read replica {replica.name} marked unhealthy: {error}")
+
+    def _check(self, replica: Replica):
+        try:
+            with replica.engine.connect() as connection:
+                lag = replica_lag(connection)
+            healthy, error = lag <= self.max_lag, None if lag <= self.max_lag else f"lag {lag}s"
+        except Exception as e:
+            lag, healthy, error = None, False, str(e)
+        with self._lock:
+            replica.lag, replica.healthy, replica.error = lag, healthy, error
+            replica.next_check_at = time.monotonic() + self.check_interval
+        metrics.incr("db.replica.checks")
+
+    def probe(self):
+        # Checks every replica that is due; returns seconds until the next one is
+        now = time.monotonic()
+        for replica in self.replicas:
+            if replica.next_check_at <= now:
+                self._check(replica)
+        with self._lock:
+            next_check_at = min(replica.next_check_at for replica in self.replicas)
+        return max(0.0, next_check_at - time.monotonic())
+
+    def _probe_forever(self):
+        wait = 0.0
+        while not self._stopped.wait(wait):
+            try:
+                wait = self.probe()
+            except Exception as e:
+                logger.error(f"Read replica probe failed: {e}")
+                wait = self.check_interval
+
+    def start(self):
+        # Starts the probe thread, once
+        with self._lock:
+            if self._prober is not None or not self.replicas:
+                return
+            self._prober = threading.Thread(target=self._probe_forever, name="replica-probe", daemon=True)
+        self._prober.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._prober is not None:
+            self._prober.join()
+
+    def pick(self):
+        # Engine of a healthy replica, or None to use the primary
+        self.start()
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+        return healthy[next(self._round_robin) % len(healthy)].engine
+
+    def status(self) -> list:
+        return [
+            {"name": r.name, "healthy": r.healthy, "lag": r.lag, "error": r.error, **pool_status(r.engine)}
+            for r in self.replicas
+        ]
+
+# Read-your-writes: after a user's own commit on the primary, their reads stay
+# on the primary for DB_READ_YOUR_WRITES_WINDOW seconds so replica lag can
+# never hide a change they just made. The tracker below only knows this worker
+# process; the next request may land on another one, so the request that
+# wrote also hands the client a marker (auth.read_primary_marker, set as a
+# cookie and a response header by main.py) that any worker honours.
+_request_writes: ContextVar = ContextVar("request_writes", default=None)
+
+def track_request_writes() -> tuple:
+    # {user_id: wall-clock time the stickiness ends} for the current request
+    writes = {}
+    return writes, _request_writes.set(writes)
+
+def untrack_request_writes(token):
+    _request_writes.reset(token)
+
+class WriteTracker:
+    def __init__(self, window: float = DB_READ_YOUR_WRITES_WINDOW):
+        self.window = window
+        self._sticky_until = {}
+        self._lock = threading.Lock()
+
+    def mark(self, user_id: int):
+        writes = _request_writes.get()
+        if writes is not None:
+            writes[user_id] = time.time() + self.window
+        with self._lock:
+            self._sticky_until[user_id] = time.monotonic() + self.window
+            if len(self._sticky_until) > 100000:
+                now = time.monotonic()
+                self._sticky_until = {k: v for k, v in self._sticky_until.items() if v > now}
+
+    def is_sticky(self, user_id: int) -> bool:
+        with self._lock:
+            until = self._sticky_until.get(user_id)
+        return until is not None and until > time.monotonic()
 
 # Load the database URL from environment variable or use a default
-SQLALCHEMY_DATABASE_URL = "mysql+pymysql://root@localhost:3306/personal_finance_db"
+SQLALCHEMY_DATABASE_URL = DATABASE_URL
 
 # Create the SQLAlchemy engine
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+engine = create_db_engine(SQLALCHEMY_DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Async engine for the AsyncSession data-access path (crud_async.py). Its
+# sessions wrap SessionLocal's class, so session events registered on
+# SessionLocal (remember_user_write) fire for them too.
+async_engine = create_async_db_engine(ASYNC_DATABASE_URL)
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False,
+                                       sync_session_class=SessionLocal.class_)
+
+# Read replicas, primary only when none are configured
+replica_set = ReplicaSet([create_db_engine(url) for url in DATABASE_REPLICA_URLS])
+write_tracker = WriteTracker()
+
+@event.listens_for(SessionLocal, "after_commit")
+def remember_user_write(session):
+    # get_current_user stores the caller's id on the request's primary session,
+    # sync or async (AsyncSession.info is its sync session's)
+    user_id = session.info.get("user_id")
+    if user_id is not None:
+        write_tracker.mark(user_id)
+
+metrics.register_collector("db_pool", lambda: pool_status(engine))
+metrics.register_collector("db_pool_async", lambda: pool_status(async_engine))
+metrics.register_collector("db_replicas", replica_set.status)
+
 # Dependency to get the database session
 def get_db():
     db = SessionLocal()
@@ -26,5 +389,51 @@ def get_db():
     finally:
         db.close()
 
+def read_bind(user_id: int = None, sticky: bool = False):
+    # Engine for a read-only session: a healthy replica unless the user wrote
+    # recently, here or (sticky, from the client's marker) on another worker
+    if sticky or (user_id is not None and write_tracker.is_sticky(user_id)):
+        metrics.incr("db.route.primary_sticky")
+        return engine
+    bind = replica_set.pick() if replica_set.replicas else None
+    if bind is None:
+        metrics.incr("db.route.primary_fallback" if replica_set.replicas else "db.route.primary")
+        return engine
+    metrics.incr("db.route.replica")
+    return bind
+
+def open_read_session(user_id: int = None, sticky: bool = False):
+    db = SessionLocal(bind=read_bind(user_id, sticky))
+    db.info["read_only"] = True
+    return db
+
+def read_session(user_id: int = None, sticky: bool = False):
+    # Session for read-only endpoints, see read_bind
+    db = open_read_session(user_id, sticky)
+    try:
+        yield db
+    except SQLAlchemyError as e:
+        db.rollback()
+        print(f"Database error occurred: {str(e)}")
+        raise HTTPException(status_code=500, detail="Database error occurred")
+    finally:
+        db.close()
+
+# Dependency for read-only endpoints that are not tied to a user
+def get_read_db():
+    yield from read_session()
+
+# Dependency to get an async database session. Always the primary: the /async
+# endpoints, reads included, are not routed to replicas (there are no async
+# replica engines), so they need no read-your-writes handling either.
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        try:
+            yield db
+        except SQLAlchemyError as e:
+            await db.rollback()
+            print(f"Database error occurred: {str(e)}")
+            raise HTTPException(status_code=500, detail="Database error occurred")
+
 # Initialize the FastAPI app
-app = FastAPI()
\ No newline at end of file
+app = FastAPI()
@@ -0,0 +1,126 @@
+# Check that the per-user hot queries are served by the composite indexes and,
+# on MySQL, that date-bounded transaction queries only touch the partitions of
+# their months (partitioning.py). Runs EXPLAIN against DATABASE_URL (MySQL or
+# SQLite) and exits non-zero when a query does not use its expected index or
+# reads partitions it should have pruned.
+#   DATABASE_URL=sqlite:///check.db python explain_hot_queries.py
+import sys
+
+from datetime import date, timedelta
+
+from sqlalchemy import select, text
+
+from crud import (BUDGET_KEYSET, GOAL_KEYSET, REPORT_KEYSET, TRANSACTION_KEYSET, ARCHIVED_TRANSACTION_KEYSET,
+                  NOTIFICATION_KEYSET)
+from database import engine
+from exporters import export_statements
+from models import Base, Budget, Goal, Notification, Report, Transaction, TransactionArchive
+from pagination import PageParams
+from partitioning import add_months, partition_name
+
+USER_ID = 1
+
+def keyset_page(keyset, base, cursor_row=None):
+    # The statement a list endpoint issues for the first page, or for the page after cursor_row
+    cursor = keyset.encode(cursor_row) if cursor_row is not None else None
+    return keyset.statement(base, PageParams(limit=10, cursor=cursor), USER_ID)
+
+# name -> (statement, expected index)
+HOT_QUERIES = {
+    "get_transactions": (
+        keyset_page(TRANSACTION_KEYSET, select(Transaction).where(Transaction.user_id == USER_ID)),
+        "ix_transactions_user_date_id",
+    ),
+    "get_transactions_deep_page": (
+        keyset_page(
+            TRANSACTION_KEYSET,
+            select(Transaction).where(Transaction.user_id == USER_ID),
+            Transaction(id=500000, date=date(2020, 1, 1)),
+        ),
+        "ix_transactions_user_date_id",
+    ),
+    "get_transactions_archived": (
+        keyset_page(ARCHIVED_TRANSACTION_KEYSET, select(TransactionArchive).where(TransactionArchive.user_id == USER_ID)),
+        "ix_transactions_archive_user_date_id",
+    ),
+    "fetch_transactions_data": (
+        select(Transaction).where(Transaction.user_id == USER_ID),
+        "ix_transactions_user_date_id",
+    ),
+    "export_archived": (export_statements(USER_ID)[0], "ix_transactions_archive_user_date_id"),
+    "export": (export_statements(USER_ID)[1], "ix_transactions_user_date_id"),
+    "get_budgets": (
+        keyset_page(BUDGET_KEYSET, select(Budget).where(Budget.user_id == USER_ID)),
+        "ix_budgets_user_start_date",
+    ),
+    "get_goals": (
+        keyset_page(GOAL_KEYSET, select(Goal).where(Goal.user_id == USER_ID)),
+        "ix_goals_user_deadline",
+    ),
+    "get_reports": (
+        keyset_page(REPORT_KEYSET, select(Report).where(Report.user_id == USER_ID)),
+        "ix_reports_user_generated",
+    ),
+    "unread_notifications": (
+        keyset_page(
+            NOTIFICATION_KEYSET,
+            select(Notification).where(Notification.user_id == USER_ID, Notification.is_read == False),
+        ),
+        "ix_notifications_user_read_created",
+    ),
+}
+
+# name -> (date-bounded statement, the only partitions it may read)
+MONTH = date.today().replace(day=1)
+PRUNED_QUERIES = {
+    "export_one_month": (
+        export_statements(USER_ID, MONTH, add_months(MONTH, 1) - timedelta(days=1))[1],
+        {partition_name(MONTH)},
+    ),
+    "export_two_months": (
+        export_statements(USER_ID, add_months(MONTH, -1), add_months(MONTH, 1) - timedelta(days=1))[1],
+        {partition_name(add_months(MONTH, -1)), partition_name(MONTH)},
+    ),
+    "import_duplicate_window": (
+        select(Transaction.date, Transaction.amount, Transaction.transaction_category_id, Transaction.description)
+        .where(Transaction.user_id == USER_ID, Transaction.date.between(MONTH, MONTH + timedelta(days=9))),
+        {partition_name(MONTH)},
+    ),
+}
+
+def explain(connection, statement) -> str:
+    sql = str(statement.compile(engine, compile_kwargs={"literal_binds": True}))
+    if engine.dialect.name == "sqlite":
+        rows = connection.execute(text(f"EXPLAIN QUERY PLAN {sql}")).fetchall()
+        return " | ".join(row[-1] for row in rows)
+    rows = connection.execute(text(f"EXPLAIN {sql}")).mappings().fetchall()
+    return " | ".join(f"table={row['table']} partitions={row['partitions']} key={row['key']} rows={row['rows']}"
+                      for row in rows)
+
+def explain_partitions(connection, statement) -> set:
+    sql = str(statement.compile(engine, compile_kwargs={"literal_binds": True}))
+    rows = connection.execute(text(f"EXPLAIN {sql}")).mappings().fetchall()
+    return {name for row in rows if row["table"] == "transactions" for name in (row["partitions"] or "").split(",")}
+
+def main() -> int:
+    Base.metadata.create_all(bind=engine)
+    failures = 0
+    with engine.connect() as connection:
+        if engine.dialect.name == "sqlite":
+            connection.execute(text("ANALYZE"))
+        for name, (statement, index) in HOT_QUERIES.items():
+            plan = explain(connection, statement)
+            ok = index in plan
+            failures += not ok
+            print(f"{'ok  ' if ok else 'FAIL'} {name:24s} expects {index}\n       {plan}")
+        if engine.dialect.name == "mysql":
+            for name, (statement, expected) in PRUNED_QUERIES.items():
+                partitions = explain_partitions(connection, statement)
+                ok = partitions == expected
+                failures += not ok
+                print(f"{'ok  ' if ok else 'FAIL'} {name:24s} expects partitions {sorted(expected)}\n"
+                      f"       reads {sorted(partitions)}")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
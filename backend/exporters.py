@@ -0,0 +1,120 @@
+import csv
+import io
+import json
+import logging
+from datetime import date
+from typing import Iterator, List, Optional
+
+from sqlalchemy import select, text
+
+import metrics
+from config import EXPORT_FETCH_SIZE, EXPORT_STATEMENT_TIMEOUT_MS
+from database import open_read_session
+from models import Transaction, TransactionArchive, TransactionCategory
+
+logger = logging.getLogger(__name__)
+
+# Transaction export. Rows are streamed from a server-side cursor (MySQL
+# SSCursor, PostgreSQL named cursor) EXPORT_FETCH_SIZE at a time and written
+# out as they arrive, so memory stays flat however many rows the user has.
+# The archive is read first, then the hot table, each in its own (user_id,
+# date, id) index order so neither needs a sort; rows are in date order within
+# each table, and a hot row dated before the archive cutoff (added after the
+# last archive run) comes after the archived ones.
+
+EXPORT_COLUMNS = ("id", "date", "amount", "category", "transaction_category_id", "description")
+
+# Rows written per chunk handed to the response
+_ROWS_PER_CHUNK = 500
+
+def export_statements(user_id: int, start_date: Optional[date] = None, end_date: Optional[date] = None,
+                      category_ids: Optional[List[int]] = None) -> list:
+    # Plain columns rather than ORM objects: nothing to track in the identity
+    # map. One statement per table, archive first, each ordered like its
+    # (user_id, date, id) index; category names are joined in Python.
+    def rows(model):
+        statement = select(
+            model.id, model.date, model.amount, model.transaction_category_id, model.description,
+        ).where(model.user_id == user_id)
+        if start_date is not None:
+            statement = statement.where(model.date >= start_date)
+        if end_date is not None:
+            statement = statement.where(model.date <= end_date)
+        if category_ids:
+            statement = statement.where(model.transaction_category_id.in_(category_ids))
+        # Exports may legitimately outlive the normal statement timeout
+        return (statement.order_by(model.date, model.id)
+                .prefix_with(f"/*+ MAX_EXECUTION_TIME({EXPORT_STATEMENT_TIMEOUT_MS}) */", dialect="mysql"))
+
+    return [rows(TransactionArchive), rows(Transaction)]
+
+def _stream_rows(user_id: int, statements: list, read_primary: bool = False) -> Iterator:
+    # (row, category name) pairs. The session is opened here, inside the
+    # generator, because the response body is produced after the endpoint (and
+    # its dependencies) have returned.
+    db = open_read_session(user_id, read_primary)
+    rows = 0
+    try:
+        if db.get_bind().dialect.name == "postgresql":
+            db.execute(text(f"SET LOCAL statement_timeout = {int(EXPORT_STATEMENT_TIMEOUT_MS)}"))
+        categories = dict(db.execute(select(TransactionCategory.id, TransactionCategory.name)).all())
+        for statement in statements:
+            result = db.execute(statement.execution_options(stream_results=True, yield_per=EXPORT_FETCH_SIZE))
+            for row in result:
+                rows += 1
+                yield row, categories.get(row.transaction_category_id)
+    finally:
+        db.close()
+        metrics.incr("exports.rows", rows)
+        logger.info(f"Exported {rows} transactions for user {user_id}")
+
+def _chunks(lines: Iterator[str]) -> Iterator[str]:
+    buffer = []
+    for line in lines:
+        buffer.append(line)
+        if len(buffer) >= _ROWS_PER_CHUNK:
+            yield "".join(buffer)
+            buffer.clear()
+    if buffer:
+        yield "".join(buffer)
+
+def export_csv(user_id: int, statements: list, read_primary: bool = False) -> Iterator[str]:
+    metrics.incr("exports.csv")
+    out = io.StringIO()
+    writer = csv.writer(out)
+
+    def line(values) -> str:
+        writer.writerow(values)
+        value = out.getvalue()
+        out.seek(0)
+        out.truncate()
+        return value
+
+    def lines():
+        yield line(EXPORT_COLUMNS)
+        for row, category in _stream_rows(user_id, statements, read_primary):
+            yield line((row.id, row.date.isoformat(), row.amount, category or "",
+                        row.transaction_category_id, row.description or ""))
+
+    return _chunks(lines())
+
+def export_ndjson(user_id: int, statements: list, read_primary: bool = False) -> Iterator[str]:
+    metrics.incr("exports.ndjson")
+
+    def lines():
+        for row, category in _stream_rows(user_id, statements, read_primary):
+            yield json.dumps({
+                "id": row.id,
+                "date": row.date.isoformat(),
+                "amount": str(row.amount),
+                "category": category,
+                "transaction_category_id": row.transaction_category_id,
+                "description": row.description,
+            }) + "\n"
+
+    return _chunks(lines())
+
+EXPORTERS = {
+    "csv": (export_csv, "text/csv"),
+    "ndjson": (export_ndjson, "application/x-ndjson"),
+}
@@ -0,0 +1,459 @@
+import codecs
+import csv
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from typing import Iterable, Iterator, Optional
+
+from sqlalchemy import insert, select
+
+import metrics
+import query_counter
+from archive import hot_and_cold
+from config import IMPORT_BATCH_SIZE, IMPORT_WORKERS, IMPORT_JOB_RETENTION
+from crud import bump_data_version
+from database import SessionLocal
+from models import Transaction, TransactionCategory
+from rollups import add_transactions
+
+logger = logging.getLogger(__name__)
+
+# Bank statement import: CSV, OFX and QIF files are parsed as a stream of
+# rows, mapped to a TransactionCategory, de-duplicated against the user's
+# existing transactions and inserted in batches of IMPORT_BATCH_SIZE. The
+# file is read _READ_SIZE bytes at a time, never a line at a time: OFX from
+# many banks is a single line.
+_READ_SIZE = 64 * 1024
+
+class ImportRowError(ValueError):
+    pass
+
+@dataclass
+class ParsedRow:
+    line: int
+    date: date
+    amount: Decimal
+    description: str
+    category: Optional[str] = None
+
+# Day-first before month-first: the app's banks are UK banks
+DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%d/%m/%y", "%d-%m-%Y", "%m/%d/%Y", "%d %b %Y", "%d %B %Y", "%Y%m%d")
+
+def parse_date(value: str, date_format: str = None) -> date:
+    value = value.strip()
+    if date_format:
+        try:
+            return datetime.strptime(value, date_format).date()
+        except ValueError:
+            raise ImportRowError(f"Date {value!r} does not match {date_format!r}")
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    raise ImportRowError(f"Unrecognised date {value!r}")
+
+def parse_amount(value: str) -> Decimal:
+    cleaned = value.strip().replace(",", "").replace("£", "").replace("$", "").replace("€", "")
+    negative = cleaned.startswith("(") and cleaned.endswith(")")
+    try:
+        amount = Decimal(cleaned.strip("()"))
+    except InvalidOperation:
+        raise ImportRowError(f"Unrecognised amount {value!r}")
+    return -amount if negative else amount
+
+# CSV
+_CSV_COLUMNS = {
+    "date": ("date", "transaction date", "posted date", "posting date", "booking date", "value date"),
+    "amount": ("amount", "value", "transaction amount", "amount (gbp)"),
+    "debit": ("debit", "debit amount", "paid out", "money out", "withdrawal"),
+    "credit": ("credit", "credit amount", "paid in", "money in", "deposit"),
+    "description": ("description", "transaction description", "details", "payee", "name", "memo", "reference"),
+    "category": ("category", "transaction category"),
+}
+
+def _csv_field(row: dict, columns: dict, key: str) -> str:
+    column = columns.get(key)
+    return (row.get(column) or "").strip() if column else ""
+
+_LINE_END = re.compile(r"\r\n|\r|\n")
+
+def _lines(chunks: Iterable[str]) -> Iterator[str]:
+    # Text chunks regrouped into lines, line endings kept. A "\r" ending a
+    # chunk waits for the next one, which may start with its "\n".
+    partial = ""
+    for chunk in chunks:
+        text, start = partial + chunk, 0
+        for end in _LINE_END.finditer(text):
+            if end.end() == len(text) and end.group() == "\r":
+                break
+            yield text[start:end.end()]
+            start = end.end()
+        partial = text[start:]
+    if partial:
+        yield partial
+
+def parse_csv(chunks: Iterable[str], date_format: str = None) -> Iterator:
+    reader = csv.DictReader(_lines(chunks))
+    headers = {name.strip().lower(): name for name in reader.fieldnames or ()}
+    columns = {}
+    for key, aliases in _CSV_COLUMNS.items():
+        for alias in aliases:
+            if alias in headers:
+                columns[key] = headers[alias]
+                break
+    if "date" not in columns or not ({"amount", "debit", "credit"} & set(columns)):
+        raise ImportRowError("CSV needs a date column and an amount (or debit/credit) column")
+
+    for row in reader:
+        line = reader.line_num
+        try:
+            if "amount" in columns:
+                amount = parse_amount(_csv_field(row, columns, "amount"))
+            else:
+                debit = _csv_field(row, columns, "debit")
+                credit = _csv_field(row, columns, "credit")
+                amount = parse_amount(credit) if credit else -parse_amount(debit or "0")
+            yield ParsedRow(
+                line=line,
+                date=parse_date(_csv_field(row, columns, "date"), date_format),
+                amount=amount,
+                description=_csv_field(row, columns, "description"),
+                category=_csv_field(row, columns, "category") or None,
+            )
+        except ImportRowError as e:
+            yield line, str(e)
+
+# QIF: one field per line, records end with "^"
+def _qif_date(value: str, date_format: str = None) -> date:
+    # Quicken writes 2-digit years after an apostrophe, e.g. 1/31'24
+    return parse_date(re.sub(r"'\s*(\d{2})$", r"/20\1", value.strip()).replace(" ", ""), date_format)
+
+def parse_qif(chunks: Iterable[str], date_format: str = None) -> Iterator:
+    record, start = {}, None
+    for line_number, line in enumerate(_lines(chunks), 1):
+        line = line.rstrip("\r\n")
+        if not line or line.startswith("!"):
+            continue
+        if start is None:
+            start = line_number
+        code, value = line[0], line[1:].strip()
+        if code != "^":
+            record.setdefault(code, value)
+            continue
+        try:
+            if "D" not in record or ("T" not in record and "U" not in record):
+                raise ImportRowError("QIF record without a date or amount")
+            yield ParsedRow(
+                line=start,
+                date=_qif_date(record["D"], date_format),
+                amount=parse_amount(record.get("T") or record["U"]),
+                description=" ".join(filter(None, (record.get("P"), record.get("M")))),
+                category=record.get("L", "").split(":")[0] or None,
+            )
+        except ImportRowError as e:
+            yield start, str(e)
+        record, start = {}, None
+
+# OFX: SGML (v1) or XML (v2). Tokenised from the chunks, split on tags, so a
+# statement on a single line is held no more than a chunk at a time.
+_OFX_TOKEN = re.compile(r"<(/?)([A-Za-z0-9.]+)>([^<]*)")
+
+def parse_ofx(chunks: Iterable[str], date_format: str = None) -> Iterator:
+    # Everything up to the last "<" of the buffer is whole tags; the rest waits
+    # for the next chunk. line_number counts the newlines already tokenised.
+    buffer, line_number, record = "", 1, None
+    for chunk in chunks:
+        buffer += chunk
+        last = buffer.rfind("<")
+        if last <= 0:
+            continue
+        complete, buffer = buffer[:last], buffer[last:]
+        position = 0
+        for token in _OFX_TOKEN.finditer(complete):
+            line_number += complete.count("\n", position, token.start())
+            position = token.start()
+            closing, tag, value = token.groups()
+            tag = tag.upper()
+            if tag == "STMTTRN":
+                if not closing:
+                    record = {"line": line_number}
+                elif record is not None:
+                    yield _ofx_row(record, date_format)
+                    record = None
+            elif record is not None and not closing and value.strip():
+                record[tag] = value.strip()
+        line_number += complete.count("\n", position)
+    for closing, tag, value in _OFX_TOKEN.findall(buffer):
+        if tag.upper() == "STMTTRN" and closing and record is not None:
+            yield _ofx_row(record, date_format)
+            record = None
+
+def _ofx_row(record: dict, date_format: str = None):
+    try:
+        if "DTPOSTED" not in record or "TRNAMT" not in record:
+            raise ImportRowError("OFX transaction without DTPOSTED or TRNAMT")
+        return ParsedRow(
+            line=record["line"],
+            date=parse_date(record["DTPOSTED"][:8], date_format or "%Y%m%d"),
+            amount=parse_amount(record["TRNAMT"]),
+            description=" ".join(filter(None, (record.get("NAME"), record.get("MEMO")))),
+        )
+    except ImportRowError as e:
+        return record["line"], str(e)
+
+PARSERS = {"csv": parse_csv, "qif": parse_qif, "ofx": parse_ofx, "qfx": parse_ofx}
+
+def detect_format(filename: str) -> Optional[str]:
+    extension = os.path.splitext(filename or "")[1].lower().lstrip(".")
+    return extension if extension in PARSERS else None
+
+# Category mapping: the file's own category when it names one of ours,
+# otherwise keywords in the description, otherwise the fallback category
+CATEGORY_KEYWORDS = {
+    "salary": ("salary", "payroll", "wages"),
+    "groceries": ("tesco", "sainsbury", "asda", "aldi", "lidl", "morrisons", "waitrose", "co-op", "supermarket"),
+    "eating out": ("restaurant", "cafe", "coffee", "pret", "nando", "mcdonald", "deliveroo", "just eat", "uber eats"),
+    "transport": ("tfl", "trainline", "uber", "shell", "bp", "esso", "parking", "bus", "rail"),
+    "bills": ("electric", "energy", "gas", "water", "broadband", "mobile", "council tax", "insurance"),
+    "rent": ("rent", "mortgage", "letting"),
+    "shopping": ("amazon", "argos", "ebay", "primark", "john lewis", "ikea"),
+    "entertainment": ("netflix", "spotify", "cinema", "disney", "steam", "playstation"),
+    "health": ("boots", "pharmacy", "gym", "dentist", "optician"),
+    "travel": ("airline", "hotel", "airbnb", "easyjet", "ryanair", "booking.com"),
+    "savings": ("savings", "isa", "transfer to"),
+}
+
+class CategoryMapper:
+    def __init__(self, categories, default_category_id: int = None):
+        self.by_name = {category.name.strip().lower(): category.id for category in categories}
+        # Whole words only, so "tfl" doesn't match "netflix"
+        self.rules = [
+            (re.compile(r"\b(?:" + "|".join(re.escape(keyword) for keyword in keywords) + r")\b"), self.by_name[name])
+            for name, keywords in CATEGORY_KEYWORDS.items() if name in self.by_name
+        ]
+        self.income_id = self.by_name.get("salary") or self.by_name.get("income")
+        # Nothing in the database checks the id on MySQL (0004 drops the
+        # foreign keys); POST
+        # /transactions/import rejects unknown ones before queueing the job
+        if default_category_id is not None and default_category_id not in self.by_name.values():
+            raise ImportRowError(f"Unknown transaction category {default_category_id}")
+        self.default_id = default_category_id or self.by_name.get("other")
+
+    def category_for(self, row: ParsedRow) -> Optional[int]:
+        # The file's own category, then the keyword rules; a credit neither
+        # places is income, anything else the fallback category
+        if row.category and row.category.strip().lower() in self.by_name:
+            return self.by_name[row.category.strip().lower()]
+        description = row.description.lower()
+        for pattern, category_id in self.rules:
+            if pattern.search(description):
+                return category_id
+        if row.amount > 0 and self.income_id:
+            return self.income_id
+        return self.default_id
+
+    def signed(self, amount: Decimal, category_id: int) -> Decimal:
+        # Amounts are stored positive in their category's direction (money in
+        # for income, out for the rest), like the ones entered in the app, and
+        # negative against it: a refund filed under Shopping is stored as a
+        # negative Shopping amount. Turns a statement's signed amount into the
+        # stored one and back.
+        return amount if category_id == self.income_id else -amount
+
+def fingerprint(user_id: int, day: date, amount: Decimal, description: str) -> bytes:
+    # Same user, day, signed amount and (case/space-insensitive) description
+    normalized = " ".join(description.lower().split())
+    key = f"{user_id}|{day.isoformat()}|{Decimal(amount).quantize(Decimal('0.01'))}|{normalized}"
+    return hashlib.sha1(key.encode()).digest()[:16]
+
+# Progress of one import, polled through GET /transactions/import/{job_id}
+class ImportJob:
+    def __init__(self, user_id: int, file_format: str, filename: str, total_bytes: int):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.format = file_format
+        self.filename = filename
+        self.total_bytes = total_bytes
+        self.bytes_read = 0
+        self.status = "queued"
+        self.rows_read = 0
+        self.inserted = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.errors = []
+        self.created_at = time.time()
+        self.finished_at = None
+
+    def error(self, line: int, message: str):
+        self.invalid += 1
+        if len(self.errors) < 50:
+            self.errors.append({"line": line, "error": message})
+
+    def as_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "format": self.format,
+            "filename": self.filename,
+            "progress": round(self.bytes_read / self.total_bytes, 4) if self.total_bytes else 0.0,
+            "bytes_read": self.bytes_read,
+            "total_bytes": self.total_bytes,
+            "rows_read": self.rows_read,
+            "inserted": self.inserted,
+            "duplicates": self.duplicates,
+            "invalid": self.invalid,
+            "errors": list(self.errors),
+            "elapsed": round((self.finished_at or time.time()) - self.created_at, 3),
+        }
+
+class _CountingReader:
+    # Text chunks of a binary file, recording how far into the file we are
+    def __init__(self, file, job: ImportJob, encoding: str = "utf-8-sig", read_size: int = _READ_SIZE):
+        self.file = file
+        self.job = job
+        self.read_size = read_size
+        self.decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+
+    def __iter__(self):
+        while raw := self.file.read(self.read_size):
+            self.job.bytes_read += len(raw)
+            yield self.decoder.decode(raw)
+        yield self.decoder.decode(b"", final=True)
+
+def run_import(job: ImportJob, file, date_format: str = None, default_category_id: int = None,
+               batch_size: int = IMPORT_BATCH_SIZE):
+    db = SessionLocal()
+    # Keeps the user's reads on the primary after the import commits
+    db.info["user_id"] = job.user_id
+    job.status = "running"
+    seen, inserted = Counter(), Counter()
+    try:
+        mapper = CategoryMapper(db.scalars(select(TransactionCategory)).all(), default_category_id)
+        parser = PARSERS[job.format]
+        batch = []
+        for item in parser(_CountingReader(file, job), date_format):
+            if isinstance(item, tuple):
+                job.error(*item)
+                continue
+            job.rows_read += 1
+            category_id = mapper.category_for(item)
+            if category_id is None:
+                job.error(item.line, "No matching transaction category")
+                continue
+            batch.append((item, category_id))
+            if len(batch) >= batch_size:
+                _insert_batch(db, job, mapper, batch, seen, inserted)
+                batch = []
+        if batch:
+            _insert_batch(db, job, mapper, batch, seen, inserted)
+        job.status = "completed"
+    except ImportRowError as e:
+        job.status = "failed"
+        job.error(0, str(e))
+    except Exception as e:
+        logger.error(f"Import {job.id} for user {job.user_id} failed: {e}", exc_info=True)
+        db.rollback()
+        job.status = "failed"
+        job.error(0, "Import failed")
+    finally:
+        db.close()
+        job.finished_at = time.time()
+        metrics.incr(f"imports.{job.status}")
+        metrics.incr("imports.rows_inserted", job.inserted)
+        metrics.observe("imports.seconds", job.finished_at - job.created_at)
+        logger.info(f"Import {job.id} {job.status}: {job.inserted} inserted, {job.duplicates} duplicates, {job.invalid} invalid")
+
+def _insert_batch(db, job: ImportJob, mapper: CategoryMapper, batch: list, seen: Counter, inserted: Counter):
+    # A row is new when this file has more copies of its fingerprint than the
+    # user already had before the import (two identical coffees on one day are
+    # two rows). Existing rows, hot or archived, come from one query over the
+    # batch's date range; rows this import inserted earlier are subtracted from
+    # that count.
+    query_counter.note_batch()
+    user_id = job.user_id
+    first = min(row.date for row, _ in batch)
+    last = max(row.date for row, _ in batch)
+    existing = Counter(
+        fingerprint(user_id, day, mapper.signed(amount, category_id), description or "")
+        for day, amount, category_id, description in db.execute(hot_and_cold(
+            lambda model: select(model.date, model.amount, model.transaction_category_id, model.description)
+            .where(model.user_id == user_id, model.date.between(first, last))
+        ))
+    )
+
+    # Stored amounts take their sign from the category (CategoryMapper.signed);
+    # fingerprints use the statement's signed amount, so a refund and a
+    # purchase of the same amount on the same day are different rows
+    values = []
+    for row, category_id in batch:
+        amount, description = mapper.signed(row.amount, category_id), row.description[:255]
+        key = fingerprint(user_id, row.date, row.amount, description)
+        seen[key] += 1
+        if seen[key] <= existing[key] - inserted[key]:
+            job.duplicates += 1
+            continue
+        inserted[key] += 1
+        values.append({
+            "user_id": user_id,
+            "amount": amount,
+            "transaction_category_id": category_id,
+            "date": row.date,
+            "description": description,
+        })
+    if values:
+        db.execute(bump_data_version(user_id))
+        add_transactions(db.connection(), values)
+        db.execute(insert(Transaction), values)
+        db.commit()
+        job.inserted += len(values)
+
+class ImportManager:
+    # In-process registry and worker pool; job state lives in the worker process
+    def __init__(self, workers: int = IMPORT_WORKERS, retention: int = IMPORT_JOB_RETENTION):
+        self.retention = retention
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="import")
+
+    def submit(self, job: ImportJob, path: str, **options) -> ImportJob:
+        with self._lock:
+            self._jobs[job.id] = job
+            cutoff = time.time() - self.retention
+            for job_id, old in list(self._jobs.items()):
+                if old.finished_at is not None and old.finished_at < cutoff:
+                    del self._jobs[job_id]
+        self._executor.submit(self._run, job, path, options)
+        return job
+
+    def _run(self, job: ImportJob, path: str, options: dict):
+        try:
+            with open(path, "rb") as file, query_counter.counted("JOB", "/transactions/import"):
+                run_import(job, file, **options)
+        finally:
+            os.remove(path)
+
+    def get(self, job_id: str) -> Optional[ImportJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(Counter(job.status for job in self._jobs.values()))
+
+import_manager = ImportManager()
+
+# Category lookup, then per batch: the existing rows, the version bump, the
+# rollup upsert and the INSERT
+query_counter.set_budget("JOB", "/transactions/import", 1, per_batch=4)
+
+metrics.register_collector("imports", import_manager.stats)
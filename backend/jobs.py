@@ -0,0 +1,184 @@
+# Background report generation. POST /reports/jobs/ queues a report and
+# answers at once with a job id; REPORT_WORKERS threads build the reports
+# (reports.py) and GET /reports/jobs/{id} shows how far along each one is.
+# Admission is bounded twice: REPORT_MAX_PENDING queued or running jobs in
+# total and REPORT_MAX_PENDING_PER_USER for any one user, so one user cannot
+# fill the queue. Job state lives in the worker process, like imports.
+#
+# Reports are not rebuilt for nothing. A job first compares the user's
+# data_version (bumped by every transaction, budget and goal write) with the
+# one the latest report of the same type was built from; when they match it
+# reuses that report, cloned onto today's date if it is older, and stores no
+# new payload. Identical requests are coalesced: one that finds a queued job
+# for the same user and type joins it, and one that finds such a job running
+# is queued behind it, by which time the running job's report can be reused.
+import logging
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import date
+from typing import Optional
+
+import metrics
+import query_counter
+from config import REPORT_WORKERS, REPORT_MAX_PENDING, REPORT_MAX_PENDING_PER_USER, REPORT_JOB_RETENTION
+from crud import clone_report, create_report, get_data_version, get_latest_report
+from database import SessionLocal, open_read_session
+from reports import build_report_data
+from schemas import ReportCreate, ReportRead
+
+logger = logging.getLogger(__name__)
+
+class ReportQueueFull(Exception):
+    pass
+
+class ReportJob:
+    def __init__(self, user_id: int, report_type_id: int, read_primary: bool = False):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.report_type_id = report_type_id
+        self.read_primary = read_primary  # the client wrote recently, on any worker
+        self.status = "queued"
+        self.stage = None
+        self.progress = 0.0
+        self.report = None  # ReportRead once completed
+        self.error = None
+        self.reused = False  # an unchanged earlier report was returned
+        self.future = Future()  # resolves when the job has finished
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def active(self) -> bool:
+        return self.finished_at is None
+
+    def advance(self, stage: str, progress: float):
+        self.stage = stage
+        self.progress = round(progress, 4)
+
+    def as_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "report_type_id": self.report_type_id,
+            "stage": self.stage,
+            "progress": self.progress,
+            "report_id": self.report.id if self.report is not None else None,
+            "error": self.error,
+            "reused": self.reused,
+            "queued": round((self.started_at or time.time()) - self.created_at, 3),
+            "elapsed": round((self.finished_at or time.time()) - self.created_at, 3),
+        }
+
+def run_report(job: ReportJob):
+    job.status = "running"
+    job.started_at = time.time()
+    metrics.observe("reports.queued_seconds", job.started_at - job.created_at)
+    try:
+        today = date.today()
+        read_db = open_read_session(job.user_id, job.read_primary)
+        try:
+            # Read before the data, so a write landing while the report is
+            # built leaves it on the older version and the next one rebuilds
+            version = get_data_version(read_db, job.user_id)
+            latest = get_latest_report(read_db, job.user_id, job.report_type_id)
+            job.reused = (latest is not None and latest.data_version is not None
+                          and latest.data_version == version and latest.payload_hash is not None)
+            if job.reused and latest.generated_at == today:
+                job.report = ReportRead.model_validate(latest, from_attributes=True)
+            elif job.reused:
+                data = latest.data
+            else:
+                data = build_report_data(read_db, job.user_id, job.report_type_id, progress=job.advance)
+        finally:
+            read_db.close()
+        if job.report is None:
+            job.advance("saving", 1.0)
+            db = SessionLocal()
+            db.info["user_id"] = job.user_id  # read-your-writes for the report just stored
+            try:
+                if job.reused:
+                    job.report = clone_report(db, latest, data, today)
+                else:
+                    report = ReportCreate(user_id=job.user_id, report_type_id=job.report_type_id,
+                                          generated_at=today, data=data)
+                    job.report = create_report(db=db, report=report, user_id=job.user_id, data_version=version)
+            finally:
+                db.close()
+        if job.reused:
+            metrics.incr("reports.reused")
+        job.status = "completed"
+        job.stage = None
+    except Exception as e:
+        logger.exception(f"Report job {job.id} failed")
+        job.status = "failed"
+        job.error = str(e)
+    finally:
+        job.finished_at = time.time()
+        metrics.incr(f"reports.{job.status}")
+        metrics.observe("reports.seconds", job.finished_at - job.started_at)
+        logger.info(f"Report job {job.id} {job.status} for user {job.user_id} "
+                    f"(type {job.report_type_id}{', reused' if job.reused else ''}, "
+                    f"{job.finished_at - job.started_at:.2f}s)")
+        job.future.set_result(job.status)
+
+class ReportJobQueue:
+    def __init__(self, workers: int = REPORT_WORKERS, max_pending: int = REPORT_MAX_PENDING,
+                 max_pending_per_user: int = REPORT_MAX_PENDING_PER_USER, retention: int = REPORT_JOB_RETENTION):
+        self.max_pending = max_pending
+        self.max_pending_per_user = max_pending_per_user
+        self.retention = retention
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="report")
+
+    def submit(self, user_id: int, report_type_id: int, read_primary: bool = False) -> ReportJob:
+        with self._lock:
+            cutoff = time.time() - self.retention
+            for job_id, old in list(self._jobs.items()):
+                if not old.active and old.finished_at < cutoff:
+                    del self._jobs[job_id]
+            active = [job for job in self._jobs.values() if job.active]
+            same = [job for job in active if job.user_id == user_id and job.report_type_id == report_type_id]
+            queued = next((job for job in same if job.status == "queued"), None)
+            if queued is not None:
+                metrics.incr("reports.coalesced")
+                queued.read_primary = queued.read_primary or read_primary
+                return queued
+            if len(active) >= self.max_pending:
+                metrics.incr("reports.rejected.global")
+                raise ReportQueueFull("Report queue is full, please retry")
+            if sum(job.user_id == user_id for job in active) >= self.max_pending_per_user:
+                metrics.incr("reports.rejected.user")
+                raise ReportQueueFull("Too many reports in progress, please wait for one to finish")
+            job = ReportJob(user_id, report_type_id, read_primary)
+            self._jobs[job.id] = job
+        if same:
+            # Runs once the identical running job is done, and most likely reuses its report
+            same[0].future.add_done_callback(lambda _: self._executor.submit(self._run, job))
+        else:
+            self._executor.submit(self._run, job)
+        return job
+
+    def _run(self, job: ReportJob):
+        with query_counter.counted("JOB", "/reports/jobs/"):
+            run_report(job)
+
+    def get(self, job_id: str) -> Optional[ReportJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(Counter(job.status for job in self._jobs.values()))
+
+report_jobs = ReportJobQueue()
+
+# The comprehensive report, the largest: the data version and latest report,
+# one query per section, then the payload upsert and the report row
+query_counter.set_budget("JOB", "/reports/jobs/", 8)
+
+metrics.register_collector("report_jobs", report_jobs.stats)
@@ -0,0 +1,64 @@
+import threading
+import time
+from collections import defaultdict
+
+# Very small in-process metrics registry, exposed through GET /metrics/
+# (to requests carrying config.METRICS_TOKEN)
+_lock = threading.Lock()
+_counters = defaultdict(int)
+_gauges = {}
+_timings = {}
+_collectors = {}
+
+def incr(name: str, value: int = 1):
+    with _lock:
+        _counters[name] += value
+
+def set_gauge(name: str, value):
+    with _lock:
+        _gauges[name] = value
+
+def observe(name: str, value: float):
+    # Keep count, total and max for a timing or size series
+    with _lock:
+        timing = _timings.setdefault(name, {"count": 0, "total": 0.0, "max": 0.0})
+        timing["count"] += 1
+        timing["total"] += value
+        if value > timing["max"]:
+            timing["max"] = value
+
+class timer:
+    # Context manager observing the elapsed time in milliseconds
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.elapsed_ms = (time.perf_counter() - self.start) * 1000
+        observe(self.name, self.elapsed_ms)
+        return False
+
+def register_collector(name: str, collector):
+    # collector is a callable returning a dict, evaluated on every snapshot
+    with _lock:
+        _collectors[name] = collector
+
+def snapshot() -> dict:
+    with _lock:
+        timings = {
+            name: {**values, "avg": values["total"] / values["count"] if values["count"] else 0.0}
+            for name, values in _timings.items()
+        }
+        result = {
+            "counters": dict(_counters),
+            "gauges": dict(_gauges),
+            "timings": timings,
+        }
+        collectors = dict(_collectors)
+
+    for name, collector in collectors.items():
+        result[name] = collector()
+    return result
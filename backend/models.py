@@ -1,8 +1,11 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Date, DECIMAL, Boolean, JSON, DateTime
+from sqlalchemy import Column, Integer, String, ForeignKey, Date, DECIMAL, Boolean, JSON, DateTime, Index, LargeBinary
+from sqlalchemy.dialects.mysql import LONGBLOB
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
 from datetime import datetime
+import json
+import zlib
 
 Base = declarative_base()
 
@@ -17,10 +20,15 @@ class User(Base):
     first_name = Column(String(50))
     last_name = Column(String(50))
     phone_number = Column(String(15))
+    # Bumped on logout so previously issued tokens stop validating
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
+    # Bumped by every transaction, budget and goal write; a report built at the
+    # current version can be reused instead of rebuilt (jobs.py)
+    data_version = Column(Integer, nullable=False, default=0, server_default="0")
     
     # Preferences fields
     dark_mode = Column(Boolean, default=False)
-    font_size = Column(String, default="Normal")
+    font_size = Column(String(20), default="Normal")
 
     # Relationships with other tables
     budgets = relationship("Budget", back_populates="user")
@@ -40,6 +48,7 @@ class BudgetCategory(Base):
 # Budget table
 class Budget(Base):
     __tablename__ = 'budgets'
+    __table_args__ = (Index('ix_budgets_user_start_date', 'user_id', 'start_date'),)
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey('users.id'))
     budget_category_id = Column(Integer, ForeignKey('budget_categories.id'))
@@ -53,6 +62,7 @@ class Budget(Base):
 # Goal table
 class Goal(Base):
     __tablename__ = 'goals'
+    __table_args__ = (Index('ix_goals_user_deadline', 'user_id', 'deadline'),)
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey('users.id'))
     name = Column(String(100))
@@ -74,14 +84,44 @@ class ReportType(Base):
 # Report table
 class Report(Base):
     __tablename__ = 'reports'
+    __table_args__ = (Index('ix_reports_user_generated', 'user_id', 'generated_at'),)
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey('users.id'))
     report_type_id = Column(Integer, ForeignKey('report_types.id'))
     generated_at = Column(Date, default=func.now)
-    data = Column(JSON)
+    # Reports written before report_payloads keep their JSON inline; the rest
+    # point at a compressed, content-addressed payload (report_store.py)
+    inline_data = Column("data", JSON)
+    payload_hash = Column(String(64), ForeignKey('report_payloads.hash'))
+    payload_size = Column(Integer)  # bytes of JSON before compression
+    summary = Column(JSON)  # headline numbers for listings (reports.summarise)
+    data_version = Column(Integer)  # the user's data_version the report was built from
 
     user = relationship("User", back_populates="reports")
     report_type = relationship("ReportType", back_populates="reports")
+    payload = relationship("ReportPayload")
+
+    @property
+    def data(self):
+        # Decompressed on access; crud loads the payload along with the report
+        if self.payload_hash is None:
+            return self.inline_data
+        return self.payload.decode()
+
+# ReportPayload table, one row per distinct report content
+class ReportPayload(Base):
+    __tablename__ = 'report_payloads'
+    hash = Column(String(64), primary_key=True)  # SHA-256 of the canonical JSON
+    codec = Column(String(8), nullable=False)
+    size = Column(Integer, nullable=False)
+    body = Column(LargeBinary().with_variant(LONGBLOB(), "mysql"), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_used_at = Column(DateTime, default=datetime.utcnow)
+
+    def decode(self) -> dict:
+        if self.codec != "zlib":
+            raise ValueError(f"Unknown report payload codec {self.codec}")
+        return json.loads(zlib.decompress(self.body))
 
 # TransactionCategory table
 class TransactionCategory(Base):
@@ -91,14 +131,18 @@ class TransactionCategory(Base):
     description = Column(String(255))
     transactions = relationship("Transaction", back_populates="category")
 
-# Transaction table
+# Transaction table. On MySQL migration 0004 partitions it by month on date
+# (partitioning.py): the primary key there is (id, date) and, as partitioned
+# InnoDB tables cannot have them, the foreign keys below are not created.
 class Transaction(Base):
     __tablename__ = 'transactions'
+    # Covers the monthly category aggregates (rollups.py) as well as keyset pages
+    __table_args__ = (Index('ix_transactions_user_date_id', 'user_id', 'date', 'id', 'transaction_category_id', 'amount'),)
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey('users.id'))
     amount = Column(DECIMAL(10, 2))
     transaction_category_id = Column(Integer, ForeignKey('transaction_categories.id'))
-    date = Column(Date)
+    date = Column(Date, nullable=False)
     description = Column(String(255))
 
     user = relationship("User", back_populates="transactions")
@@ -115,6 +159,7 @@ class NotificationType(Base):
 # Notification table
 class Notification(Base):
     __tablename__ = 'notifications'
+    __table_args__ = (Index('ix_notifications_user_read_created', 'user_id', 'is_read', 'created_at'),)
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey('users.id'))
     message = Column(String(255))
@@ -123,4 +168,42 @@ class Notification(Base):
     created_at = Column(Date, default=func.now)
 
     user = relationship("User", back_populates="notifications")
-    notification_type = relationship("NotificationType", back_populates="notifications")
\ No newline at end of file
+    notification_type = relationship("NotificationType", back_populates="notifications")
+# RevokedToken table, durable copy of the in-memory revocation store
+class RevokedToken(Base):
+    __tablename__ = 'revoked_tokens'
+    jti = Column(String(36), primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id'), index=True)
+    expires_at = Column(DateTime, index=True)
+    revoked_at = Column(DateTime, default=datetime.utcnow, index=True)
+    # Set on a logout from all devices: every token of user_id with an older
+    # version is revoked, rather than the single token jti
+    token_version = Column(Integer)
+
+# TransactionArchive table, transactions moved out of the hot table by archive.py.
+# Same columns and ids; compressed on MySQL since the rows are rarely read.
+class TransactionArchive(Base):
+    __tablename__ = 'transactions_archive'
+    __table_args__ = (
+        Index('ix_transactions_archive_user_date_id', 'user_id', 'date', 'id'),
+        {'mysql_row_format': 'COMPRESSED'},
+    )
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    user_id = Column(Integer, nullable=False)
+    amount = Column(DECIMAL(10, 2))
+    transaction_category_id = Column(Integer)
+    date = Column(Date, nullable=False)
+    description = Column(String(255))
+    archived_at = Column(DateTime, default=datetime.utcnow)
+
+# TransactionMonthlyRollup table, per user, month and category totals of all
+# transactions, hot and archived, maintained on every write (rollups.py)
+class TransactionMonthlyRollup(Base):
+    __tablename__ = 'transaction_monthly_rollups'
+    user_id = Column(Integer, primary_key=True, autoincrement=False)
+    year_month = Column(String(7), primary_key=True)  # "2024-03"
+    transaction_category_id = Column(Integer, primary_key=True, autoincrement=False)
+    total = Column(DECIMAL(14, 2), nullable=False)
+    count = Column(Integer, nullable=False)
+    min_amount = Column(DECIMAL(10, 2))
+    max_amount = Column(DECIMAL(10, 2))
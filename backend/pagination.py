@@ -0,0 +1,184 @@
+import base64
+import binascii
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, List, Optional
+
+from fastapi import HTTPException, Query, Response
+from sqlalchemy import and_, or_
+
+import metrics
+from config import MAX_PAGE_SIZE, PAGE_BOOKMARK_CACHE_SIZE, PAGE_BOOKMARK_TTL
+
+# Keyset (cursor) pagination on (sort key, id). A page is "the next `size`
+# rows after this cursor", which the composite (user_id, sort key, id)
+# indexes answer with an index range scan, so page 1000 costs the same as
+# page 1 and concurrent inserts never shift rows between pages.
+#
+# Clients that still send ?page=N&size=M (zero-based, as Android getGoals
+# does) or ?skip= are
+# served from remembered page bookmarks: serving page N stores the cursor
+# that starts page N+1, so sequential scrolling stays on the keyset path.
+# Only a jump to a never-visited page falls back to OFFSET.
+
+@dataclass
+class PageParams:
+    skip: int = 0
+    limit: int = 10
+    cursor: Optional[str] = None
+    page: Optional[int] = None
+
+def page_params(default_limit: int = 10):
+    # FastAPI dependency accepting cursor, page/size and the legacy skip/limit
+    def dependency(
+        skip: int = Query(0, ge=0),
+        limit: int = Query(default_limit, ge=1, le=MAX_PAGE_SIZE),
+        cursor: Optional[str] = None,
+        page: Optional[int] = Query(None, ge=0),
+        size: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    ) -> PageParams:
+        return PageParams(skip=skip, limit=size or limit, cursor=cursor, page=page)
+    return dependency
+
+@dataclass
+class Page:
+    items: List[Any]
+    next_cursor: Optional[str] = None
+
+def set_next_cursor(response: Response, page: Page):
+    # Bodies stay plain lists for existing clients; the cursor travels in a header
+    if page.next_cursor:
+        response.headers["X-Next-Cursor"] = page.next_cursor
+
+def _encode_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+def _decode_value(column, value):
+    if value is None:
+        return None
+    python_type = column.type.python_type
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is date:
+        # Date columns may still hand back datetimes on some backends
+        return datetime.fromisoformat(value).date() if "T" in value else date.fromisoformat(value)
+    if python_type is Decimal:
+        return Decimal(value)
+    return python_type(value)
+
+class PageBookmarks:
+    def __init__(self, maxsize: int = PAGE_BOOKMARK_CACHE_SIZE, ttl: int = PAGE_BOOKMARK_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # (keyset, scope, size, page) -> (expires_at, cursor)
+        self._lock = threading.Lock()
+
+    def get(self, key) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, cursor: str):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, cursor)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+page_bookmarks = PageBookmarks()
+
+class Keyset:
+    def __init__(self, name: str, sort_column, id_column, descending: bool = False):
+        self.name = name
+        self.sort_column = sort_column
+        self.id_column = id_column
+        self.descending = descending
+
+    def encode(self, row) -> str:
+        sort_value = getattr(row, self.sort_column.key)
+        payload = {"k": self.name, "v": [_encode_value(sort_value), getattr(row, self.id_column.key)]}
+        return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+    def decode(self, cursor: str):
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            if payload["k"] != self.name:
+                raise ValueError("cursor belongs to another listing")
+            sort_value, last_id = payload["v"]
+            return _decode_value(self.sort_column, sort_value), int(last_id)
+        except (ValueError, KeyError, TypeError, binascii.Error) as e:
+            raise HTTPException(status_code=400, detail=f"Invalid cursor: {e}")
+
+    def _after(self, cursor: str):
+        sort_value, last_id = self.decode(cursor)
+        if self.sort_column is self.id_column:
+            return self.id_column < last_id if self.descending else self.id_column > last_id
+        if self.descending:
+            return or_(self.sort_column < sort_value, and_(self.sort_column == sort_value, self.id_column < last_id))
+        return or_(self.sort_column > sort_value, and_(self.sort_column == sort_value, self.id_column > last_id))
+
+    def _resolve_cursor(self, params: PageParams, scope) -> Optional[str]:
+        if params.cursor:
+            return params.cursor
+        if params.page:
+            return page_bookmarks.get((self.name, scope, params.limit, params.page))
+        return None
+
+    def statement(self, base, params: PageParams, scope):
+        # Apply ordering, the cursor predicate (or the OFFSET fallback) and limit + 1
+        if self.sort_column is self.id_column:
+            order = [self.id_column.desc() if self.descending else self.id_column.asc()]
+        elif self.descending:
+            order = [self.sort_column.desc(), self.id_column.desc()]
+        else:
+            order = [self.sort_column.asc(), self.id_column.asc()]
+        statement = base.order_by(*order)
+
+        cursor = self._resolve_cursor(params, scope)
+        if cursor:
+            metrics.incr(f"pagination.{self.name}.keyset")
+            statement = statement.where(self._after(cursor))
+        else:
+            offset = params.page * params.limit if params.page else params.skip
+            if offset:
+                metrics.incr(f"pagination.{self.name}.offset_fallback")
+                statement = statement.offset(offset)
+        return statement.limit(params.limit + 1)
+
+    def branch(self, params: PageParams, scope):
+        # For a listing merged from several tables (hot and archived transactions):
+        # the params each table is read with, and how many merged rows to skip
+        cursor = self._resolve_cursor(params, scope)
+        offset = 0 if cursor else (params.page * params.limit if params.page else params.skip)
+        if offset:
+            metrics.incr(f"pagination.{self.name}.offset_fallback")
+        return PageParams(limit=offset + params.limit, cursor=cursor), offset
+
+    def merge(self, runs, params: PageParams, scope, offset: int = 0) -> Page:
+        # Each run is one table's rows in listing order; the page is cut from their merge
+        rows = sorted(
+            (row for run in runs for row in run),
+            key=lambda row: (getattr(row, self.sort_column.key), getattr(row, self.id_column.key)),
+            reverse=self.descending,
+        )
+        return self.page(rows[offset:], params, scope)
+
+    def page(self, rows, params: PageParams, scope) -> Page:
+        items = list(rows[:params.limit])
+        next_cursor = self.encode(items[-1]) if len(rows) > params.limit else None
+        if next_cursor and params.page is not None:
+            page_bookmarks.put((self.name, scope, params.limit, params.page + 1), next_cursor)
+        return Page(items=items, next_cursor=next_cursor)
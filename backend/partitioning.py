@@ -0,0 +1,140 @@
+# Monthly RANGE partitioning of transactions on date (MySQL only; SQLite
+# profiles keep the plain table). Migration 0004 converts the table, after
+# which a partition has to exist for every month before rows for it arrive:
+#   python partitioning.py status            partitions, rows, months of headroom
+#   python partitioning.py ensure [--dry-run] [--months-ahead N]
+# Run `ensure` from cron (daily is plenty). Rows past the last monthly
+# partition land in pmax, so a missed run costs pruning, never inserts.
+import argparse
+import logging
+import sys
+from datetime import date
+from typing import List, Optional, Tuple
+
+from sqlalchemy import text
+
+from config import PARTITION_MONTHS_AHEAD, PARTITION_MIN_HEADROOM
+
+logger = logging.getLogger(__name__)
+
+TABLE = "transactions"
+CATCH_ALL = "pmax"
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+def add_months(day: date, months: int) -> date:
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+def months_between(start: date, end: date) -> int:
+    return (end.year - start.year) * 12 + end.month - start.month
+
+def partition_name(month: date) -> str:
+    return f"p{month:%Y%m}"
+
+def plan_months(last_bound: Optional[date], first: date, until: date) -> List[date]:
+    # Months (as their first day) still needing a partition so that every month
+    # up to and including until's is covered. last_bound is the exclusive upper
+    # bound of the newest monthly partition, None when there is none yet.
+    month = last_bound if last_bound is not None else month_start(first)
+    months = []
+    while month <= month_start(until):
+        months.append(month)
+        month = add_months(month, 1)
+    return months
+
+def _partition_list(months: List[date]) -> str:
+    # The first partition also takes everything older than its month
+    partitions = [
+        f"PARTITION {partition_name(month)} VALUES LESS THAN ('{add_months(month, 1).isoformat()}')"
+        for month in months
+    ]
+    partitions.append(f"PARTITION {CATCH_ALL} VALUES LESS THAN (MAXVALUE)")
+    return ",\n    ".join(partitions)
+
+def partition_by_ddl(months: List[date]) -> str:
+    return f"ALTER TABLE {TABLE} PARTITION BY RANGE COLUMNS(`date`) (\n    {_partition_list(months)}\n)"
+
+def reorganize_ddl(months: List[date]) -> str:
+    # Splits the new months off pmax; cheap while pmax is empty
+    return f"ALTER TABLE {TABLE} REORGANIZE PARTITION {CATCH_ALL} INTO (\n    {_partition_list(months)}\n)"
+
+def parse_bound(description: Optional[str]) -> Optional[date]:
+    # information_schema renders RANGE COLUMNS bounds as quoted literals
+    if description is None or description == "MAXVALUE":
+        return None
+    return date.fromisoformat(description.strip("'"))
+
+def existing_partitions(connection) -> List[Tuple[str, Optional[date], int]]:
+    # (name, exclusive upper bound or None for pmax, approximate rows), oldest first
+    rows = connection.execute(text(
+        "SELECT PARTITION_NAME, PARTITION_DESCRIPTION, TABLE_ROWS FROM information_schema.PARTITIONS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND PARTITION_NAME IS NOT NULL "
+        "ORDER BY PARTITION_ORDINAL_POSITION"
+    ), {"table": TABLE}).fetchall()
+    return [(name, parse_bound(description), table_rows or 0) for name, description, table_rows in rows]
+
+def last_bound(partitions) -> Optional[date]:
+    bounds = [bound for _, bound, _ in partitions if bound is not None]
+    return max(bounds) if bounds else None
+
+def headroom(partitions, today: date) -> int:
+    # Whole months after the current one that already have a partition
+    bound = last_bound(partitions)
+    if bound is None:
+        return -1
+    return months_between(month_start(today), bound) - 1
+
+def initial_months(connection, months_ahead: int = PARTITION_MONTHS_AHEAD, today: date = None) -> List[date]:
+    # Partitions for the migration: the oldest month with data through months_ahead from today
+    today = today or date.today()
+    oldest = connection.execute(text(f"SELECT MIN(`date`) FROM {TABLE}")).scalar()
+    return plan_months(None, min(oldest or today, today), add_months(today, months_ahead))
+
+def ensure_partitions(connection, months_ahead: int = PARTITION_MONTHS_AHEAD, today: date = None,
+                      dry_run: bool = False) -> List[date]:
+    # Adds the monthly partitions missing up to months_ahead from today and returns their months
+    if connection.dialect.name != "mysql":
+        return []
+    partitions = existing_partitions(connection)
+    if not partitions:
+        raise RuntimeError(f"{TABLE} is not partitioned, run `alembic upgrade head` first")
+    today = today or date.today()
+    months = plan_months(last_bound(partitions), today, add_months(today, months_ahead))
+    if months and not dry_run:
+        connection.execute(text(reorganize_ddl(months)))
+        logger.info(f"Added partitions {partition_name(months[0])}..{partition_name(months[-1])} to {TABLE}")
+    return months
+
+def main() -> int:
+    from database import engine
+
+    parser = argparse.ArgumentParser(description=f"Manage the monthly partitions of {TABLE}")
+    parser.add_argument("command", choices=["status", "ensure"])
+    parser.add_argument("--months-ahead", type=int, default=PARTITION_MONTHS_AHEAD)
+    parser.add_argument("--dry-run", action="store_true", help="print the DDL instead of running it")
+    args = parser.parse_args()
+
+    if engine.dialect.name != "mysql":
+        print(f"{engine.dialect.name} databases are not partitioned")
+        return 0
+    with engine.begin() as connection:
+        if args.command == "ensure":
+            months = ensure_partitions(connection, args.months_ahead, dry_run=args.dry_run)
+            if months and args.dry_run:
+                print(reorganize_ddl(months))
+            elif months:
+                print(f"added {len(months)} partitions, {partition_name(months[0])}..{partition_name(months[-1])}")
+            else:
+                print("nothing to do")
+        partitions = existing_partitions(connection)
+        for name, bound, rows in partitions:
+            print(f"  {name:8s} < {bound or 'MAXVALUE'}  ~{rows} rows")
+        months_left = headroom(partitions, date.today())
+        print(f"{months_left} months of headroom (minimum {PARTITION_MIN_HEADROOM})")
+    return 0 if months_left >= PARTITION_MIN_HEADROOM else 1
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
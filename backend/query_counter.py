@@ -0,0 +1,131 @@
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+import metrics
+from config import SQL_QUERY_BUDGET, SQL_REPEAT_THRESHOLD, SQL_BUDGET_STRICT
+
+logger = logging.getLogger(__name__)
+
+# Statements issued while handling one request. The middleware puts a fresh
+# instance in the context; engine events add to it from whichever thread or
+# greenlet runs the query (copies of the context share the same object).
+class RequestQueries:
+    def __init__(self, scope: dict = None):
+        self.scope = scope or {}
+        self.count = 0
+        self.db_ms = 0.0
+        self.shapes = Counter()
+        self.batches = 0  # see note_batch
+
+    def record(self, statement: str, elapsed_ms: float):
+        self.count += 1
+        self.db_ms += elapsed_ms
+        self.shapes[statement_shape(statement)] += 1
+
+    @property
+    def route(self) -> str:
+        # Route path template once routing has happened, the raw path before
+        route = self.scope.get("route")
+        path = route.path if route is not None else self.scope.get("path", "")
+        return f"{self.scope.get('method', '')} {path}".strip()
+
+    def repeated(self, threshold: int = SQL_REPEAT_THRESHOLD) -> list:
+        # Same statement shape run threshold times or more: usually a query in a loop (N+1)
+        return [(shape, count) for shape, count in self.shapes.most_common() if count >= threshold]
+
+_current: ContextVar = ContextVar("request_queries", default=None)
+
+# Per-route statement budgets and repeat thresholds, keyed by (method, route path template)
+_budgets = {}
+_repeat_thresholds = {}
+_per_batch = {}
+
+_IN_LIST = re.compile(r"\bIN\s*\((?:[^()]|\([^()]*\))*\)", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+def statement_shape(statement: str) -> str:
+    # Parameters are already bound separately; collapse IN lists and whitespace
+    # so the same query with a different number of values counts as one shape
+    return _WHITESPACE.sub(" ", _IN_LIST.sub("IN (...)", statement)).strip()
+
+def set_budget(method: str, path: str, max_queries: int, repeat_threshold: int = None, per_batch: int = 0):
+    # repeat_threshold raises the N+1 limit for routes that loop on purpose (batched inserts).
+    # Work whose size is only known as it runs (imports) gets per_batch more
+    # statements, and one more repeat of each, for every note_batch() call.
+    _budgets[(method.upper(), path)] = max_queries
+    if repeat_threshold is not None:
+        _repeat_thresholds[(method.upper(), path)] = repeat_threshold
+    _per_batch[(method.upper(), path)] = per_batch
+
+def budget_for(method: str, path: str, batches: int = 0) -> int:
+    return _budgets.get((method.upper(), path), SQL_QUERY_BUDGET) + _per_batch.get((method.upper(), path), 0) * batches
+
+def repeat_threshold_for(method: str, path: str, batches: int = 0) -> int:
+    threshold = _repeat_thresholds.get((method.upper(), path), SQL_REPEAT_THRESHOLD)
+    return threshold + batches if _per_batch.get((method.upper(), path)) else threshold
+
+def start(scope: dict = None) -> tuple:
+    queries = RequestQueries(scope)
+    return queries, _current.set(queries)
+
+def stop(token):
+    _current.reset(token)
+
+def current():
+    return _current.get()
+
+def note_batch():
+    # Called once per batch by batched work, see set_budget's per_batch
+    queries = _current.get()
+    if queries is not None:
+        queries.batches += 1
+
+@contextmanager
+def counted(method: str, path: str):
+    # Counts background work (report and import jobs) like a request, under a
+    # route of its own: worker threads do not inherit the request's context
+    queries, token = start({"method": method, "path": path})
+    try:
+        yield queries
+    finally:
+        stop(token)
+        report(queries, method, path)
+
+def install(engine):
+    # Attach the counters to a sync engine (for async engines pass engine.sync_engine)
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info["query_started"] = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        queries = _current.get()
+        if queries is not None:
+            queries.record(statement, (time.perf_counter() - conn.info["query_started"]) * 1000)
+
+def violations(queries: RequestQueries, method: str, path: str) -> list:
+    problems = []
+    budget = budget_for(method, path, queries.batches)
+    if queries.count > budget:
+        problems.append(f"{queries.count} statements, budget {budget}")
+    for shape, count in queries.repeated(repeat_threshold_for(method, path, queries.batches)):
+        problems.append(f"repeated {count}x: {shape[:200]}")
+    return problems
+
+def report(queries: RequestQueries, method: str, path: str) -> list:
+    # Publishes the request's numbers and returns any budget or N+1 violations
+    route = f"{method} {path}"
+    metrics.observe(f"sql.queries.{route}", queries.count)
+    metrics.observe(f"sql.time_ms.{route}", queries.db_ms)
+    problems = violations(queries, method, path)
+    if problems:
+        metrics.incr(f"sql.violations.{route}")
+        log = logger.error if SQL_BUDGET_STRICT else logger.warning
+        log(f"Query budget violated by {route}: {'; '.join(problems)}")
+    return problems
@@ -0,0 +1,128 @@
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Optional, Tuple
+
+import metrics
+from config import (
+    LOGIN_RATE_LIMIT_BACKEND, LOGIN_RATE_LIMIT_SQLITE_PATH,
+    LOGIN_RATE_LIMIT_PER_USER, LOGIN_RATE_LIMIT_PER_IP
+)
+
+# Sliding-window log limiter. A backend records attempt timestamps per key and
+# answers whether one more attempt fits in the window.
+#   hit(key, limit, window) -> (allowed, retry_after_seconds)
+
+class MemoryBackend:
+    # Per-process state, enough for a single uvicorn worker
+    blocking = False
+
+    def __init__(self, sweep_every: int = 1000):
+        self._attempts = {}
+        self._lock = threading.Lock()
+        self._calls = 0
+        self._sweep_every = sweep_every
+
+    def hit(self, key: str, limit: int, window: float) -> Tuple[bool, float]:
+        now = time.time()
+        with self._lock:
+            self._calls += 1
+            if self._calls % self._sweep_every == 0:
+                self._sweep(now, window)
+
+            attempts = self._attempts.setdefault(key, deque())
+            while attempts and attempts[0] <= now - window:
+                attempts.popleft()
+            if len(attempts) >= limit:
+                return False, attempts[0] + window - now
+            attempts.append(now)
+            return True, 0.0
+
+    def _sweep(self, now: float, window: float):
+        # Forget keys that have been quiet for a whole window
+        stale = [key for key, attempts in self._attempts.items() if not attempts or attempts[-1] <= now - window]
+        for key in stale:
+            del self._attempts[key]
+
+    def clear(self):
+        with self._lock:
+            self._attempts.clear()
+
+class SQLiteBackend:
+    # Local stand-in for a shared store (e.g. Redis): every worker process on
+    # the host opens the same file, so limits hold across workers.
+    blocking = True
+
+    def __init__(self, path: str = LOGIN_RATE_LIMIT_SQLITE_PATH):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS login_attempts (key TEXT NOT NULL, ts REAL NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_login_attempts_key_ts ON login_attempts (key, ts)")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def hit(self, key: str, limit: int, window: float) -> Tuple[bool, float]:
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM login_attempts WHERE key = ? AND ts <= ?", (key, now - window))
+            count, oldest = conn.execute(
+                "SELECT COUNT(*), MIN(ts) FROM login_attempts WHERE key = ?", (key,)
+            ).fetchone()
+            if count >= limit:
+                conn.execute("COMMIT")
+                return False, oldest + window - now
+            conn.execute("INSERT INTO login_attempts (key, ts) VALUES (?, ?)", (key, now))
+            conn.execute("COMMIT")
+            return True, 0.0
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def clear(self):
+        self._connect().execute("DELETE FROM login_attempts")
+
+def parse_limit(value: str) -> Tuple[int, float]:
+    # "5/60" -> 5 attempts per 60 seconds
+    attempts, seconds = value.split("/")
+    return int(attempts), float(seconds)
+
+class LoginRateLimiter:
+    def __init__(self, backend, per_user: str = LOGIN_RATE_LIMIT_PER_USER, per_ip: str = LOGIN_RATE_LIMIT_PER_IP):
+        self.backend = backend
+        self.per_user = parse_limit(per_user)
+        self.per_ip = parse_limit(per_ip)
+
+    def check(self, username: str, client_ip: Optional[str]) -> Optional[float]:
+        # Returns None when the attempt is admitted, otherwise seconds to wait
+        if client_ip:
+            allowed, retry_after = self.backend.hit(f"ip:{client_ip}", *self.per_ip)
+            if not allowed:
+                metrics.incr("login.rate_limit.rejected_ip")
+                return retry_after
+
+        allowed, retry_after = self.backend.hit(f"user:{username.lower()}", *self.per_user)
+        if not allowed:
+            metrics.incr("login.rate_limit.rejected_user")
+            return retry_after
+
+        metrics.incr("login.rate_limit.allowed")
+        return None
+
+def create_backend(name: str = LOGIN_RATE_LIMIT_BACKEND):
+    if name == "sqlite":
+        return SQLiteBackend()
+    if name == "memory":
+        return MemoryBackend()
+    raise ValueError(f"Unknown rate limit backend: {name}")
+
+login_limiter = LoginRateLimiter(create_backend())
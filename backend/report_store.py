@@ -0,0 +1,139 @@
+# Report payloads, stored out of the reports table and once per distinct
+# content. A payload is serialised canonically (sorted keys, no spaces),
+# addressed by the SHA-256 of that JSON and kept zlib-compressed in
+# report_payloads; reports point at it by hash, so regenerating an
+# unchanged report stores nothing new. Payloads are only decompressed when
+# a report's data is read (models.Report.data).
+#   python report_store.py migrate   # moves reports' inline JSON into the store
+#   python report_store.py gc        # drops payloads no report points at
+import argparse
+import hashlib
+import json
+import logging
+import sys
+import time
+import zlib
+from datetime import datetime, timedelta
+from typing import Tuple
+
+from sqlalchemy import delete, exists, func, select, update
+
+import metrics
+from config import REPORT_PAYLOAD_ZLIB_LEVEL, REPORT_PAYLOAD_GC_GRACE, REPORT_PAYLOAD_MIGRATE_BATCH
+from models import Report, ReportPayload
+from reports import summarise
+
+logger = logging.getLogger(__name__)
+
+CODEC = "zlib"
+
+def encode(data) -> Tuple[str, bytes, int]:
+    # (hash, compressed body, JSON size in bytes)
+    raw = json.dumps(data, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(raw).hexdigest(), zlib.compress(raw, REPORT_PAYLOAD_ZLIB_LEVEL), len(raw)
+
+def store_payload(connection, data) -> Tuple[str, int]:
+    # Stores data unless an identical payload is already there, and returns
+    # its (hash, size). A stored payload is only marked as used again, which
+    # keeps gc from dropping it before the report pointing at it commits.
+    digest, body, size = encode(data)
+    now = datetime.utcnow()
+    table = ReportPayload.__table__
+    values = dict(hash=digest, codec=CODEC, size=size, body=body, created_at=now, last_used_at=now)
+    dialect = connection.dialect.name
+    if dialect == "mysql":
+        from sqlalchemy.dialects.mysql import insert as mysql_insert
+        statement = mysql_insert(table).values(values)
+        statement = statement.on_duplicate_key_update(last_used_at=statement.inserted.last_used_at)
+    else:
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        statement = dialect_insert(table).values(values)
+        statement = statement.on_conflict_do_update(index_elements=[table.c.hash],
+                                                    set_={"last_used_at": statement.excluded.last_used_at})
+    connection.execute(statement)
+    metrics.observe("reports.payload_bytes", size)
+    metrics.observe("reports.payload_stored_bytes", len(body))
+    return digest, size
+
+def accepts_deflate(accept_encoding: str) -> bool:
+    # Whether the stored zlib body can be sent as is (HTTP "deflate" is zlib)
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        if coding.strip() == "deflate":
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+def iter_decompressed(body: bytes, chunk_size: int = 64 * 1024):
+    # The JSON of a stored payload, a chunk at a time
+    decompressor = zlib.decompressobj()
+    for start in range(0, len(body), chunk_size):
+        chunk = decompressor.decompress(body[start:start + chunk_size])
+        if chunk:
+            yield chunk
+    tail = decompressor.flush()
+    if tail:
+        yield tail
+
+def migrate_inline(bind, batch: int = REPORT_PAYLOAD_MIGRATE_BATCH) -> int:
+    # Reports written before the store keep their JSON in reports.data; this
+    # moves it out, one batch of reports per database transaction
+    moved, last_id = 0, 0
+    while True:
+        with bind.begin() as connection:
+            rows = connection.execute(
+                select(Report.id, Report.inline_data.label("inline_data"))
+                .where(Report.id > last_id, Report.payload_hash.is_(None), Report.inline_data.is_not(None))
+                .order_by(Report.id).limit(batch)
+            ).all()
+            for report_id, data in rows:
+                digest, size = store_payload(connection, data)
+                connection.execute(update(Report).where(Report.id == report_id).values(
+                    payload_hash=digest, payload_size=size, inline_data=None,
+                    summary=summarise(data) if isinstance(data, dict) else None,
+                ))
+        if not rows:
+            return moved
+        moved += len(rows)
+        last_id = rows[-1][0]
+        logger.info(f"Moved {moved} report payloads")
+
+def collect_garbage(bind, grace: int = REPORT_PAYLOAD_GC_GRACE) -> int:
+    # Payloads of deleted reports. One that was used within the grace period
+    # may belong to a report that is being written, so it stays.
+    cutoff = datetime.utcnow() - timedelta(seconds=grace)
+    with bind.begin() as connection:
+        dropped = connection.execute(
+            delete(ReportPayload).where(
+                ReportPayload.last_used_at < cutoff,
+                ~exists().where(Report.payload_hash == ReportPayload.hash),
+            )
+        ).rowcount
+    metrics.incr("reports.payloads_collected", dropped)
+    return dropped
+
+def main() -> int:
+    from database import engine
+
+    parser = argparse.ArgumentParser(description="Maintain the compressed report payload store")
+    parser.add_argument("command", choices=["migrate", "gc", "stats"])
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.command == "migrate":
+        print(f"moved {migrate_inline(engine)} inline report payloads into the store")
+    elif args.command == "gc":
+        print(f"dropped {collect_garbage(engine)} unreferenced payloads")
+    with engine.connect() as connection:
+        payloads, size = connection.execute(select(func.count(), func.coalesce(func.sum(ReportPayload.size), 0))).one()
+        stored = connection.execute(select(func.coalesce(func.sum(func.length(ReportPayload.body)), 0))).scalar()
+        reports = connection.execute(select(func.count()).select_from(Report).where(Report.payload_hash.is_not(None))).scalar()
+    print(f"{reports} reports share {payloads} payloads, {size} bytes of JSON stored as {stored} "
+          f"({time.perf_counter() - started:.1f}s)")
+    return 0
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
@@ -0,0 +1,172 @@
+# Report content. Goals and budgets are listed as they are (a user has a
+# handful of each); everything about transactions comes from the monthly
+# rollup (rollups.monthly_totals), so Python only ever sees months ×
+# categories rows and the stored report stays a few kilobytes. The
+# rows themselves are no longer embedded: GET /reports/{id}/appendix pages
+# through the transactions the report covered. That is a live view, not a
+# snapshot: the newest id at generation time only keeps out transactions
+# added later, while rows edited since show their current values and
+# deleted rows are gone.
+from collections import defaultdict
+from datetime import date
+from typing import Callable, Optional
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import func, select
+
+from archive import hot_and_cold
+from models import Budget, Goal
+from rollups import monthly_totals
+
+GOALS_REPORT = 1
+BUDGETS_REPORT = 2
+TRANSACTIONS_REPORT = 3
+COMPREHENSIVE_REPORT = 4
+MONTHLY_BREAKDOWN_REPORT = 5
+CATEGORY_STATISTICS_REPORT = 6
+
+def fetch_goals_data(db, user_id: int) -> list:
+    rows = db.execute(
+        select(Goal.id, Goal.name, Goal.target_amount, Goal.current_amount, Goal.deadline, Goal.description)
+        .where(Goal.user_id == user_id)
+    ).mappings()
+    return [dict(row) for row in rows]
+
+def fetch_budgets_data(db, user_id: int) -> list:
+    rows = db.execute(
+        select(Budget.id, Budget.budget_category_id.label("category_id"), Budget.amount, Budget.start_date, Budget.end_date)
+        .where(Budget.user_id == user_id)
+    ).mappings()
+    return [dict(row) for row in rows]
+
+def _stats(total, count: int, min_amount, max_amount) -> dict:
+    return {
+        "total": total,
+        "count": count,
+        "average": round(total / count, 2) if count else None,
+        "min": min_amount,
+        "max": max_amount,
+    }
+
+def _merge(groups: dict, key, row: dict):
+    # Adds one month × category row onto a coarser group
+    group = groups.get(key)
+    if group is None:
+        groups[key] = dict(total=row["total"], count=row["count"], min=row["min_amount"], max=row["max_amount"])
+        return
+    group["total"] += row["total"]
+    group["count"] += row["count"]
+    group["min"] = min(group["min"], row["min_amount"])
+    group["max"] = max(group["max"], row["max_amount"])
+
+def _appendix(db, rows: int) -> dict:
+    # The newest transaction id at generation time bounds the appendix; the
+    # table-wide MAX(id) is a single index lookup, unlike the user's own
+    max_ids = [max_id for max_id in db.scalars(hot_and_cold(lambda model: select(func.max(model.id)))) if max_id]
+    return {"rows": rows, "max_id": max(max_ids, default=0)}
+
+def transactions_section(db, user_id: int) -> dict:
+    rows = monthly_totals(db, user_id)
+    overall, by_category, by_month = {}, {}, {}
+    for row in rows:
+        _merge(overall, None, row)
+        _merge(by_category, row["transaction_category_id"], row)
+        _merge(by_month, row["year_month"], row)
+    summary = overall.get(None, dict(total=0, count=0, min=None, max=None))
+    return {
+        "summary": {
+            **_stats(summary["total"], summary["count"], summary["min"], summary["max"]),
+            "first_month": rows[0]["year_month"] if rows else None,
+            "last_month": max(by_month) if by_month else None,
+        },
+        "by_category": [
+            {"category_id": category_id, **_stats(g["total"], g["count"], g["min"], g["max"])}
+            for category_id, g in sorted(by_category.items())
+        ],
+        "by_month": [{"year_month": month, "total": g["total"], "count": g["count"]} for month, g in sorted(by_month.items())],
+    }
+
+def monthly_breakdown(db, user_id: int) -> list:
+    months = defaultdict(list)
+    for row in monthly_totals(db, user_id):
+        months[row["year_month"]].append({
+            "category_id": row["transaction_category_id"],
+            **_stats(row["total"], row["count"], row["min_amount"], row["max_amount"]),
+        })
+    return [
+        {
+            "year_month": month,
+            "total": sum(category["total"] for category in categories),
+            "count": sum(category["count"] for category in categories),
+            "categories": categories,
+        }
+        for month, categories in months.items()
+    ]
+
+def category_statistics(db, user_id: int) -> list:
+    categories = {}
+    months_active = defaultdict(list)
+    for row in monthly_totals(db, user_id):
+        _merge(categories, row["transaction_category_id"], row)
+        months_active[row["transaction_category_id"]].append(row["year_month"])
+    grand_total = sum(group["total"] for group in categories.values())
+    return [
+        {
+            "category_id": category_id,
+            **_stats(group["total"], group["count"], group["min"], group["max"]),
+            "share": round(group["total"] / grand_total, 4) if grand_total else None,
+            "months_active": len(months_active[category_id]),
+            "first_month": min(months_active[category_id]),
+            "last_month": max(months_active[category_id]),
+        }
+        for category_id, group in sorted(categories.items())
+    ]
+
+# Sections of each report type, built in order
+REPORT_SECTIONS = {
+    GOALS_REPORT: ["goals"],
+    BUDGETS_REPORT: ["budgets"],
+    TRANSACTIONS_REPORT: ["transactions", "appendix"],
+    COMPREHENSIVE_REPORT: ["goals", "budgets", "transactions", "appendix"],
+    MONTHLY_BREAKDOWN_REPORT: ["months"],
+    CATEGORY_STATISTICS_REPORT: ["categories"],
+}
+
+# section -> builder(db, user_id, sections built so far)
+_SECTION_BUILDERS = {
+    "goals": lambda db, user_id, data: fetch_goals_data(db, user_id),
+    "budgets": lambda db, user_id, data: fetch_budgets_data(db, user_id),
+    "transactions": lambda db, user_id, data: transactions_section(db, user_id),
+    "appendix": lambda db, user_id, data: _appendix(db, data["transactions"]["summary"]["count"]),
+    "months": lambda db, user_id, data: monthly_breakdown(db, user_id),
+    "categories": lambda db, user_id, data: category_statistics(db, user_id),
+}
+
+def summarise(data: dict) -> dict:
+    # The few numbers a report listing shows, stored beside the payload
+    summary = {}
+    for section, content in data.items():
+        if section == "transactions" and isinstance(content, dict) and "summary" in content:
+            summary["transactions"] = {key: content["summary"].get(key)
+                                       for key in ("total", "count", "first_month", "last_month")}
+        elif section == "appendix" and isinstance(content, dict):
+            # The bound is all GET /reports/{id}/appendix needs from the payload
+            summary["appendix_rows"] = content.get("rows")
+            summary["appendix_max_id"] = content.get("max_id")
+        elif isinstance(content, list):
+            summary[section] = len(content)
+    return summary
+
+def build_report_data(db, user_id: int, report_type_id: int, progress: Callable = None) -> Optional[dict]:
+    # The report's data column, or None for an unknown type. progress(section,
+    # fraction done) is called before each section.
+    sections = REPORT_SECTIONS.get(report_type_id)
+    if sections is None:
+        return None
+    data = {}
+    for done, section in enumerate(sections):
+        if progress is not None:
+            progress(section, done / len(sections))
+        data[section] = _SECTION_BUILDERS[section](db, user_id, data)
+    # Decimals and dates to JSON types, once for the whole (small) document
+    return jsonable_encoder(data)
@@ -0,0 +1,170 @@
+import hashlib
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+from sqlalchemy.types import DateTime
+
+import metrics
+from auth_cache import principal_cache
+from config import (REFRESH_TOKEN_EXPIRE_DAYS, REVOCATION_BLOOM_CAPACITY, REVOCATION_BLOOM_ERROR_RATE,
+                    REVOCATION_SYNC_INTERVAL, REVOCATION_SYNC_OVERLAP)
+from models import RevokedToken
+
+class utc_now(FunctionElement):
+    # The database's UTC clock. revoked_at is stamped with it rather than the
+    # writing worker's clock, so one worker's skew cannot hide a revocation.
+    type = DateTime()
+    inherit_cache = True
+
+@compiles(utc_now)
+def _utc_now_sqlite(element, compiler, **kw):
+    return "CURRENT_TIMESTAMP"
+
+@compiles(utc_now, "mysql")
+def _utc_now_mysql(element, compiler, **kw):
+    return "UTC_TIMESTAMP(6)"
+
+@compiles(utc_now, "postgresql")
+def _utc_now_postgresql(element, compiler, **kw):
+    return "(now() AT TIME ZONE 'utc')"
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float):
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: str):
+        # Double hashing over one blake2b digest
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key: str):
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+# Revoked token ids live in memory so get_current_user can check them without
+# a query. The bloom filter answers the common "not revoked" case; the dict
+# confirms positives and remembers when each entry can be forgotten (the
+# token's own exp). Rows in revoked_tokens make revocations durable and are
+# pulled every REVOCATION_SYNC_INTERVAL seconds so other workers see them.
+# A pull reads rows stamped since the previous one, by the database clock,
+# plus REVOCATION_SYNC_OVERLAP seconds before it: a revocation whose
+# transaction commits after a pull has already passed its stamp is read by
+# the next one. A logout from all devices is a row too, carrying the user's
+# new token version, which a pull hands to the principal cache.
+class RevocationStore:
+    def __init__(
+        self,
+        capacity: int = REVOCATION_BLOOM_CAPACITY,
+        error_rate: float = REVOCATION_BLOOM_ERROR_RATE,
+        sync_interval: int = REVOCATION_SYNC_INTERVAL,
+        sync_overlap: int = REVOCATION_SYNC_OVERLAP,
+    ):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.sync_interval = sync_interval
+        self.sync_overlap = sync_overlap
+        self._revoked = {}  # jti -> exp as unix timestamp
+        self._bloom = BloomFilter(capacity, error_rate)
+        self._lock = threading.Lock()
+        self._synced_until: Optional[datetime] = None
+        self._next_sync_at = 0.0
+
+    def is_revoked(self, jti: Optional[str]) -> bool:
+        if not jti or jti not in self._bloom:
+            return False
+        with self._lock:
+            exp = self._revoked.get(jti)
+        if exp is None:
+            metrics.incr("auth.revocation.bloom_false_positive")
+            return False
+        if exp <= time.time():
+            return False
+        metrics.incr("auth.revocation.rejected")
+        return True
+
+    def add(self, jti: str, exp: float):
+        with self._lock:
+            self._revoked[jti] = exp
+            self._bloom.add(jti)
+            if len(self._revoked) > self.capacity:
+                self._purge_expired()
+
+    def _purge_expired(self):
+        # Bloom filters cannot forget, so rebuild one from the live entries
+        now = time.time()
+        self._revoked = {jti: exp for jti, exp in self._revoked.items() if exp > now}
+        self._bloom = BloomFilter(max(self.capacity, len(self._revoked) * 2), self.error_rate)
+        for jti in self._revoked:
+            self._bloom.add(jti)
+
+    def revoke(self, db, jti: str, user_id: int, exp: float):
+        db.query(RevokedToken).filter(RevokedToken.expires_at <= datetime.utcnow()).delete(synchronize_session=False)
+        if db.get(RevokedToken, jti) is None:
+            db.add(RevokedToken(
+                jti=jti,
+                user_id=user_id,
+                expires_at=datetime.utcfromtimestamp(exp),
+                revoked_at=utc_now(),
+            ))
+        db.commit()
+        self.add(jti, exp)
+
+    def revoke_versions_below(self, db, user_id: int, token_version: int):
+        # Call in the transaction that bumps users.token_version. The row lasts
+        # as long as the longest lived token issued before the bump.
+        db.add(RevokedToken(
+            jti=f"ver-{user_id}-{token_version}",
+            user_id=user_id,
+            expires_at=datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+            revoked_at=utc_now(),
+            token_version=token_version,
+        ))
+
+    def sync_due(self) -> bool:
+        return time.monotonic() >= self._next_sync_at
+
+    def sync(self, db):
+        # Pick up revocations written by other workers since the last pull
+        pulled_at = db.execute(select(utc_now())).scalar()
+        query = db.query(RevokedToken).filter(RevokedToken.expires_at > datetime.utcnow())
+        if self._synced_until is not None:
+            query = query.filter(RevokedToken.revoked_at >= self._synced_until - timedelta(seconds=self.sync_overlap))
+        for row in query.all():
+            if row.token_version is not None:
+                principal_cache.note_version(row.user_id, row.token_version)
+            else:
+                self.add(row.jti, (row.expires_at - datetime(1970, 1, 1)).total_seconds())
+        self._synced_until = pulled_at
+        self._next_sync_at = time.monotonic() + self.sync_interval
+        metrics.incr("auth.revocation.syncs")
+
+    def clear(self):
+        with self._lock:
+            self._revoked.clear()
+            self._bloom = BloomFilter(self.capacity, self.error_rate)
+            self._synced_until = None
+            self._next_sync_at = 0.0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._revoked),
+                "bloom_bits": self._bloom.size,
+                "bloom_hashes": self._bloom.hashes,
+            }
+
+revocation_store = RevocationStore()
+metrics.register_collector("auth_revocation", revocation_store.stats)
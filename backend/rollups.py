@@ -0,0 +1,291 @@
+# Per user, month and category transaction totals. Every write to the
+# transactions table (crud.py, crud_async.py, bulk inserts, imports and
+# seed_data.py) updates the rollup in the same database transaction, so
+# summaries and reports read months × categories rows instead of the
+# transactions themselves. Archiving (archive.py) moves rows without touching
+# their totals: the rollup covers hot and archived transactions alike.
+#   python rollups.py verify [--user ID]   # exits 1 when a user's rollup has drifted
+#   python rollups.py rebuild [--user ID]  # recomputes the drifted users from their rows
+import argparse
+import logging
+import sys
+import time
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+from typing import Iterable, List, Optional
+
+from sqlalchemy import and_, case, delete, func, insert, select, update
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+from sqlalchemy.types import String
+
+import metrics
+from archive import hot_and_cold
+from config import ROLLUP_USER_BATCH
+from models import TransactionMonthlyRollup, User
+from partitioning import add_months
+
+logger = logging.getLogger(__name__)
+
+# Rollup rows keep transactions without a category under this id
+UNCATEGORISED = 0
+
+# Rows per upsert statement, well under SQLite's bound parameter limit
+_UPSERT_CHUNK = 500
+
+ROLLUP_COLUMNS = ("user_id", "year_month", "transaction_category_id", "total", "count", "min_amount", "max_amount")
+
+class year_month(FunctionElement):
+    # "YYYY-MM" of a date column
+    type = String()
+    inherit_cache = True
+
+# post_process_text doubles the percent signs for format-style drivers (pymysql)
+_YEAR_MONTH_FORMAT = "'%Y-%m'"
+
+@compiles(year_month)
+def _year_month_sqlite(element, compiler, **kw):
+    return f"strftime({compiler.post_process_text(_YEAR_MONTH_FORMAT)}, {compiler.process(element.clauses, **kw)})"
+
+@compiles(year_month, "mysql")
+def _year_month_mysql(element, compiler, **kw):
+    return f"DATE_FORMAT({compiler.process(element.clauses, **kw)}, {compiler.post_process_text(_YEAR_MONTH_FORMAT)})"
+
+@compiles(year_month, "postgresql")
+def _year_month_postgresql(element, compiler, **kw):
+    return f"to_char({compiler.process(element.clauses, **kw)}, 'YYYY-MM')"
+
+def month_key(day: date) -> str:
+    return f"{day.year:04d}-{day.month:02d}"
+
+def month_bounds(start_month: Optional[str], end_month: Optional[str]):
+    # "YYYY-MM" bounds (both inclusive) as a date range [first, after)
+    first = date(int(start_month[:4]), int(start_month[5:7]), 1) if start_month else None
+    after = add_months(date(int(end_month[:4]), int(end_month[5:7]), 1), 1) if end_month else None
+    return first, after
+
+def aggregate(model, *criteria):
+    # Rollup-shaped rows computed from a transactions-like table (or a subquery's columns)
+    month = year_month(model.date)
+    category = func.coalesce(model.transaction_category_id, UNCATEGORISED)
+    return (
+        select(
+            model.user_id,
+            month.label("year_month"),
+            category.label("transaction_category_id"),
+            func.sum(model.amount).label("total"),
+            func.count().label("count"),
+            func.min(model.amount).label("min_amount"),
+            func.max(model.amount).label("max_amount"),
+        )
+        .where(*criteria)
+        .group_by(model.user_id, month, category)
+    )
+
+def source_totals(first_user: Optional[int] = None, last_user: Optional[int] = None):
+    # The rollup rows as the transactions themselves, hot and archived, add up
+    def rows(model):
+        statement = select(model.user_id, model.amount, model.transaction_category_id, model.date)
+        if first_user is not None:
+            statement = statement.where(model.user_id.between(first_user, last_user))
+        return statement
+    return aggregate(hot_and_cold(rows).subquery().c)
+
+def upsert_rollups(connection, rows: List[dict]):
+    # Adds rows onto the rollup table: totals and counts are summed, min and max widened
+    if not rows:
+        return
+    table = TransactionMonthlyRollup.__table__
+    dialect = connection.dialect.name
+    for start in range(0, len(rows), _UPSERT_CHUNK):
+        chunk = rows[start:start + _UPSERT_CHUNK]
+        if dialect == "mysql":
+            from sqlalchemy.dialects.mysql import insert as mysql_insert
+            statement = mysql_insert(table).values(chunk)
+            new = statement.inserted
+            statement = statement.on_duplicate_key_update(
+                total=table.c.total + new.total,
+                count=table.c.count + new.count,
+                min_amount=func.least(table.c.min_amount, new.min_amount),
+                max_amount=func.greatest(table.c.max_amount, new.max_amount),
+            )
+        else:
+            if dialect == "postgresql":
+                from sqlalchemy.dialects.postgresql import insert as dialect_insert
+                least, greatest = func.least, func.greatest
+            else:
+                from sqlalchemy.dialects.sqlite import insert as dialect_insert
+                least, greatest = func.min, func.max  # SQLite's multi-argument min/max
+            statement = dialect_insert(table).values(chunk)
+            new = statement.excluded
+            statement = statement.on_conflict_do_update(
+                index_elements=[table.c.user_id, table.c.year_month, table.c.transaction_category_id],
+                set_={
+                    "total": table.c.total + new.total,
+                    "count": table.c.count + new.count,
+                    "min_amount": least(table.c.min_amount, new.min_amount),
+                    "max_amount": greatest(table.c.max_amount, new.max_amount),
+                },
+            )
+        connection.execute(statement)
+
+def rollup_key(row: dict) -> tuple:
+    # (user_id, year_month, category) of a transaction dict
+    category = row["transaction_category_id"]
+    return row["user_id"], month_key(row["date"]), UNCATEGORISED if category is None else category
+
+def _deltas(rows: Iterable[dict]) -> List[dict]:
+    # Transactions (dicts with user_id, amount, transaction_category_id and date)
+    # summed per rollup key
+    groups = {}
+    for row in rows:
+        key = rollup_key(row)
+        amount = Decimal(str(row["amount"]))
+        group = groups.get(key)
+        if group is None:
+            groups[key] = dict(zip(ROLLUP_COLUMNS, key), total=amount, count=1, min_amount=amount, max_amount=amount)
+            continue
+        group["total"] += amount
+        group["count"] += 1
+        group["min_amount"] = min(group["min_amount"], amount)
+        group["max_amount"] = max(group["max_amount"], amount)
+    return list(groups.values())
+
+def add_transactions(connection, rows: Iterable[dict]):
+    # Call in the transaction that inserts the rows
+    upsert_rollups(connection, _deltas(rows))
+
+def _key_extreme(extreme, key: dict):
+    # MIN or MAX amount of one rollup key, read from its transactions
+    first, after = month_bounds(key["year_month"], key["year_month"])
+
+    def amounts(model):
+        return select(model.amount).where(
+            model.user_id == key["user_id"], model.date >= first, model.date < after,
+            func.coalesce(model.transaction_category_id, UNCATEGORISED) == key["transaction_category_id"],
+        )
+    return select(extreme(hot_and_cold(amounts).subquery().c.amount)).scalar_subquery()
+
+def remove_transactions(connection, rows: Iterable[dict], refilled: Iterable[tuple] = ()):
+    # Call in the transaction that deletes the rows, after the DELETE. Totals
+    # and counts are decremented in place; min and max cannot be narrowed from
+    # the removed amounts alone, so a key whose extreme was removed reads the
+    # month's remaining amounts again. A key left at count 0 is deleted: never
+    # for the refilled keys (rollup_key), which the caller has just added to,
+    # and with RETURNING only when the count did reach 0.
+    table = TransactionMonthlyRollup.__table__
+    refilled = set(refilled)
+    returning = connection.dialect.update_returning
+    for delta in _deltas(rows):
+        key = and_(
+            table.c.user_id == delta["user_id"],
+            table.c.year_month == delta["year_month"],
+            table.c.transaction_category_id == delta["transaction_category_id"],
+        )
+        statement = update(table).where(key).values(
+            total=table.c.total - delta["total"],
+            count=table.c.count - delta["count"],
+            min_amount=case((table.c.min_amount >= delta["min_amount"], _key_extreme(func.min, delta)),
+                            else_=table.c.min_amount),
+            max_amount=case((table.c.max_amount <= delta["max_amount"], _key_extreme(func.max, delta)),
+                            else_=table.c.max_amount),
+        )
+        if tuple(delta[column] for column in ROLLUP_COLUMNS[:3]) in refilled:
+            connection.execute(statement)
+        elif returning:
+            remaining = connection.execute(statement.returning(table.c.count)).scalar()
+            if remaining is not None and remaining <= 0:
+                connection.execute(delete(table).where(key))
+        else:
+            connection.execute(statement)
+            connection.execute(delete(table).where(key, table.c.count <= 0))
+
+def monthly_totals_statement(user_id: int, start_month: Optional[str] = None, end_month: Optional[str] = None):
+    # A primary key range scan of the user's rollup rows
+    rollup = TransactionMonthlyRollup
+    statement = (
+        select(rollup.year_month, rollup.transaction_category_id, rollup.total, rollup.count,
+               rollup.min_amount, rollup.max_amount)
+        .where(rollup.user_id == user_id)
+        .order_by(rollup.year_month, rollup.transaction_category_id)
+    )
+    if start_month:
+        statement = statement.where(rollup.year_month >= start_month)
+    if end_month:
+        statement = statement.where(rollup.year_month <= end_month)
+    return statement
+
+def monthly_totals(db, user_id: int, start_month: Optional[str] = None, end_month: Optional[str] = None) -> List[dict]:
+    return [dict(row) for row in db.execute(monthly_totals_statement(user_id, start_month, end_month)).mappings()]
+
+def _cents(value) -> Optional[Decimal]:
+    # SQLite keeps DECIMAL as REAL, so sums are compared to the cent
+    return None if value is None else Decimal(str(value)).quantize(Decimal("0.01"))
+
+def _by_user(connection, statement) -> dict:
+    users = defaultdict(dict)
+    for row in connection.execute(statement).mappings():
+        users[row["user_id"]][(row["year_month"], row["transaction_category_id"])] = (
+            _cents(row["total"]), int(row["count"]), _cents(row["min_amount"]), _cents(row["max_amount"]))
+    return users
+
+def drifted_users(connection, first_user: int, last_user: int) -> List[int]:
+    # Users whose rollup rows differ from their transactions
+    table = TransactionMonthlyRollup.__table__
+    expected = _by_user(connection, source_totals(first_user, last_user))
+    actual = _by_user(connection, select(table).where(table.c.user_id.between(first_user, last_user)))
+    return sorted(user_id for user_id in set(expected) | set(actual) if expected.get(user_id) != actual.get(user_id))
+
+def rebuild_users(connection, user_ids: List[int]):
+    table = TransactionMonthlyRollup.__table__
+    for user_id in user_ids:
+        connection.execute(delete(table).where(table.c.user_id == user_id))
+        connection.execute(insert(table).from_select(list(ROLLUP_COLUMNS), source_totals(user_id, user_id)))
+
+def check_rollups(bind, repair: bool = False, user_id: Optional[int] = None, user_batch: int = ROLLUP_USER_BATCH) -> List[int]:
+    # Compares (and with repair, rebuilds) the rollup batch by batch, one
+    # database transaction per batch of users
+    started = time.perf_counter()
+    if user_id is not None:
+        batches = [(user_id, user_id)]
+    else:
+        with bind.connect() as connection:
+            max_user = connection.execute(select(func.max(User.id))).scalar() or 0
+        batches = [(first, first + user_batch - 1) for first in range(0, max_user + 1, user_batch)]
+
+    drifted = []
+    for first_user, last_user in batches:
+        with bind.begin() as connection:
+            users = drifted_users(connection, first_user, last_user)
+            if users and repair:
+                rebuild_users(connection, users)
+        drifted += users
+    metrics.incr("rollups.drifted_users", len(drifted))
+    logger.info(f"Rollup check{' and repair' if repair else ''}: {len(drifted)} users drifted "
+                f"({time.perf_counter() - started:.1f}s)")
+    return drifted
+
+def main() -> int:
+    from database import engine
+
+    parser = argparse.ArgumentParser(description="Verify or rebuild the monthly transaction rollups")
+    parser.add_argument("command", choices=["verify", "rebuild"])
+    parser.add_argument("--user", type=int, help="only this user")
+    parser.add_argument("--batch-users", type=int, default=ROLLUP_USER_BATCH)
+    args = parser.parse_args()
+
+    drifted = check_rollups(engine, repair=args.command == "rebuild", user_id=args.user, user_batch=args.batch_users)
+    if not drifted:
+        print("rollups match the transactions")
+        return 0
+    shown = ", ".join(str(user_id) for user_id in drifted[:20]) + (" ..." if len(drifted) > 20 else "")
+    if args.command == "rebuild":
+        print(f"rebuilt the rollups of {len(drifted)} users: {shown}")
+        return 0
+    print(f"{len(drifted)} users' rollups differ from their transactions: {shown}")
+    return 1
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
@@ -0,0 +1,267 @@
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import crud_async
+from auth import get_current_user_async
+from auth_cache import Principal
+from database import get_async_db
+from pagination import PageParams, page_params, set_next_cursor
+from schemas import (
+    UserCreate, UserRead,
+    BudgetCreate, BudgetRead,
+    GoalsCreate, GoalsRead,
+    ReportRead, ReportMetadata,
+    TransactionCreate, TransactionRead,
+    NotificationCreate, NotificationRead,
+)
+from utils import hash_password_async
+
+# Async versions of the main endpoints, served under /async. They run on the
+# event loop with AsyncSession, so concurrency is bounded by the database pool
+# rather than by Starlette's threadpool. Reads here always use the primary;
+# replica routing (database.read_bind) is for the sync endpoints only.
+router = APIRouter(prefix="/async")
+
+def _notification_read(db_notification) -> NotificationRead:
+    return NotificationRead(
+        id=db_notification.id,
+        user_id=db_notification.user_id,
+        message=db_notification.message,
+        isRead=db_notification.is_read,
+        created_at=db_notification.created_at,
+        notification_type_id=db_notification.notification_type_id,
+    )
+
+# User endpoints
+@router.post("/users/", response_model=UserRead)
+async def create_new_user(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    if await crud_async.get_user_by_email(db, user.email):
+        raise HTTPException(status_code=400, detail="Email already registered")
+    hashed_password = await hash_password_async(user.password)
+    return await crud_async.create_user(db, user, hashed_password)
+
+@router.get("/users/", response_model=List[UserRead])
+async def read_users(response: Response, params: PageParams = Depends(page_params(250)), db: AsyncSession = Depends(get_async_db)):
+    page = await crud_async.get_users(db, params)
+    set_next_cursor(response, page)
+    return page.items
+
+@router.get("/user/{user_id}", response_model=UserRead)
+async def read_user(user_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_user = await crud_async.get_user(db, user_id)
+    if db_user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return db_user
+
+# Budget endpoints
+@router.post("/budgets/", response_model=BudgetRead)
+async def create_new_budget(
+    budget: BudgetCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user_async)
+):
+    return await crud_async.create_budget(db, budget, user_id=current_user.id)
+
+@router.get("/budgets/", response_model=List[BudgetRead])
+async def read_budgets(
+    response: Response,
+    params: PageParams = Depends(page_params()),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user_async)
+):
+    page = await crud_async.get_budgets(db, user_id=current_user.id, params=params)
+    set_next_cursor(response, page)
+    return page.items
+
+@router.get("/budgets/{budget_id}", response_model=BudgetRead)
+async def read_budget(budget_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_budget = await crud_async.get_budget(db, budget_id)
+    if db_budget is None:
+        raise HTTPException(status_code=404, detail="budget not found")
+    return db_budget
+
+@router.put("/budgets/{budget_id}", response_model=BudgetRead)
+async def update_budget(
+    budget_id: int,
+    budget: BudgetCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user_async)
+):
+    db_budget = await crud_async.update_budget(db, budget_id, budget, user_id=current_user.id)
+    if db_budget is None:
+        raise HTTPException(status_code=404, detail="Budget not found")
+    return db_budget
+
+@router.delete("/budgets/{budget_id}")
+async def delete_budget(
+    budget_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user_async)
+):
+    if not await crud_async.delete_budget(db, budget_id, user_id=current_user.id):
+        raise HTTPException(status_code=404, detail="Budget not found")
+    return {"detail": "Budget deleted successfully"}
+
+# Goals endpoints
+@router.post("/goals/", response_model=GoalsRead)
+async def create_new_goal(
+    goal: GoalsCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user_async)
+):
+    return await crud_async.create_goal(db, goal, user_id=current_user.id)
+
+@router.get("/goals/", response_model=List[GoalsRead])
+async def read_goals(
+    response: Response,
+    params: PageParams = Depends(page_params()),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user_async)
+):
+    page = await crud_async.get_goals(db, user_id=current_user.id, params=params)
+    set_next_cursor(response, page)
+    return page.items
+
+@router.get("/goal/{goal_id}", response_model=GoalsRead)
+async def read_goal(goal_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_goal = await crud_async.get_goal(db, goal_id)
+    if db_goal is None:
+        raise HTTPException(status_code=404, detail="Goal not found")
+    return db_goal
+
+@router.put("/goals/{goal_id}", response_model=GoalsRead)
+async def update_goal(
+    goal_id: int,
+    goal: GoalsCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user_async)
+):
+    db_goal = await crud_async.update_goal(db, goal_id, goal, user_id=current_user.id)
+    if db_goal is None:
+        raise HTTPException(status_code=404, detail="Goal not found")
+    return db_goal
+
+@router.delete("/goals/{goal_id}")
+async def delete_goal(
+    goal_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user_async)
+):
+    if not await crud_async.delete_goal(db, goal_id, user_id=current_user.id):
+        raise HTTPException(status_code=404, detail="Goal not found")
+    return {"detail": "Goal deleted successfully"}
+
+# Report endpoints
+@router.get("/reports/", response_model=List[ReportRead])
+async def read_reports(
+    response: Response,
+    params: PageParams = Depends(page_params()),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user_async)
+):
+    page = await crud_async.get_reports(db, user_id=current_user.id, params=params)
+    set_next_cursor(response, page)
+    return page.items
+
+@router.get("/reports/metadata", response_model=List[ReportMetadata])
+async def read_reports_metadata(
+    response: Response,
+    params: PageParams = Depends(page_params()),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user_async)
+):
+    page = await crud_async.get_reports_metadata(db, user_id=current_user.id, params=params)
+    set_next_cursor(response, page)
+    return page.items
+
+@router.get("/report/{report_id}", response_model=ReportRead)
+async def read_report(report_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_report = await crud_async.get_report(db, report_id)
+    if db_report is None:
+        raise HTTPException(status_code=404, detail="Report not found")
+    return db_report
+
+@router.delete("/reports/{report_id}")
+async def delete_report(
+    report_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user_async)
+):
+    if not await crud_async.delete_report(db, report_id, user_id=current_user.id):
+        raise HTTPException(status_code=404, detail="Report not found")
+    return {"Detail": "Report deleted successfully"}
+
+# Transaction endpoints
+@router.post("/transactions/", response_model=TransactionRead)
+async def create_new_transaction(
+    transaction: TransactionCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user_async)
+):
+    return await crud_async.create_transaction(db, transaction, user_id=current_user.id)
+
+@router.get("/transactions/", response_model=List[TransactionRead])
+async def read_transactions(
+    response: Response,
+    params: PageParams = Depends(page_params()),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user_async)
+):
+    page = await crud_async.get_transactions(db, user_id=current_user.id, params=params)
+    set_next_cursor(response, page)
+    return page.items
+
+@router.get("/transaction/{transaction_id}", response_model=TransactionRead)
+async def read_transaction(transaction_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_transaction = await crud_async.get_transaction(db, transaction_id)
+    if db_transaction is None:
+        raise HTTPException(status_code=404, detail="Transaction not found")
+    return db_transaction
+
+@router.put("/transactions/{transaction_id}", response_model=TransactionRead)
+async def update_transaction(
+    transaction_id: int,
+    transaction: TransactionCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user_async)
+):
+    db_transaction = await crud_async.update_transaction(db, transaction_id, transaction, user_id=current_user.id)
+    if db_transaction is None:
+        raise HTTPException(status_code=404, detail="Transaction not found")
+    return db_transaction
+
+@router.delete("/transaction/{transaction_id}")
+async def delete_transaction(
+    transaction_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user_async)
+):
+    if not await crud_async.delete_transaction(db, transaction_id, user_id=current_user.id):
+        raise HTTPException(status_code=404, detail="Transaction not found")
+    return {"detail": "Transaction deleted successfully"}
+
+# Notification endpoints
+@router.post("/notifications/", response_model=NotificationRead)
+async def create_new_notification(notification: NotificationCreate, db: AsyncSession = Depends(get_async_db)):
+    return _notification_read(await crud_async.create_notification(db, notification))
+
+@router.get("/notifications/", response_model=List[NotificationRead])
+async def read_notifications(
+    response: Response,
+    is_read: Optional[bool] = None,
+    params: PageParams = Depends(page_params()),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user_async)
+):
+    page = await crud_async.get_notifications(db, user_id=current_user.id, params=params, is_read=is_read)
+    set_next_cursor(response, page)
+    return [_notification_read(n) for n in page.items]
+
+@router.get("/notification/{notification_id}", response_model=NotificationRead)
+async def read_notification(notification_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_notification = await crud_async.get_notification(db, notification_id)
+    if db_notification is None:
+        raise HTTPException(status_code=404, detail="Notification not found")
+    return _notification_read(db_notification)
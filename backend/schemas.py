@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr, Field
 from datetime import datetime, date
-from typing import Optional
+from typing import List, Optional
 
 # User schemas
 class UserResponse(BaseModel):
@@ -44,10 +44,17 @@ class LoginRequest(BaseModel):
 class TokenResponse(BaseModel):
     id: int
     access_token: str
+    refresh_token: Optional[str] = None
     token_type: str = "bearer"
     username: str
     email: str
 
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
+
+class LogoutRequest(BaseModel):
+    refresh_token: Optional[str] = None
+
 # Username recovery schemas
 class UsernameRecoveryRequest(BaseModel):
     email: str
@@ -89,7 +96,7 @@ class GoalsRead(BaseModel):
     target_amount: float
     current_amount: float
     deadline: date
-    description: str
+    description: Optional[str] = None
     user_id: int
 
 # Report schemas
@@ -106,6 +113,19 @@ class ReportRead(BaseModel):
     data: dict
     generated_at: date
     
+# GET /reports/metadata, a report without its data
+class ReportMetadata(BaseModel):
+    id: int
+    user_id: int
+    report_type_id: int
+    generated_at: date
+    size: Optional[int] = None  # bytes of the JSON payload
+    summary: Optional[dict] = None  # headline numbers (reports.summarise)
+
+# POST /reports/jobs/
+class ReportJobCreate(BaseModel):
+    report_type_id: int
+
 class ReportTypeRead(BaseModel):
     id: int
     name: str
@@ -127,6 +147,28 @@ class TransactionRead(BaseModel):
     description: str
     transaction_category_id: int
     
+# Per-row outcome of POST /transactions/bulk
+class TransactionBulkRowResult(BaseModel):
+    index: int
+    status: str  # "created", "invalid" or "failed"
+    id: Optional[int] = None
+    error: Optional[str] = None
+
+class TransactionBulkResult(BaseModel):
+    created: int
+    invalid: int
+    failed: int
+    results: List[TransactionBulkRowResult]
+
+# One row of GET /transactions/summary
+class MonthlyCategoryTotal(BaseModel):
+    year_month: str  # "2024-03"
+    transaction_category_id: int
+    total: float
+    count: int
+    min_amount: Optional[float] = None
+    max_amount: Optional[float] = None
+
 class TransactionCategoryRead(BaseModel):
     id: int
     name: str
@@ -0,0 +1,221 @@
+# Deterministic dataset generator for local benchmarking. The same arguments
+# always produce the same rows, so numbers can be compared across machines.
+#   DB_PROFILE=sqlite python seed_data.py --users 100 --transactions 20000
+#   DATABASE_URL=mysql+pymysql://... python seed_data.py --users 1000 --transactions 5000
+# --transactions is per user. Every seeded user logs in with password "password".
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import insert, func, select
+
+from database import engine, SessionLocal
+from models import (
+    Base, User, BudgetCategory, Budget, Goal, ReportType, TransactionCategory,
+    Transaction, NotificationType, Notification
+)
+from rollups import add_transactions
+from utils import hash_password
+
+# (name, description, typical amount range, share of transactions)
+TRANSACTION_CATEGORIES = [
+    ("Salary", "Monthly pay and other income", (1500, 4500), 2),
+    ("Groceries", "Supermarkets and food shops", (5, 120), 22),
+    ("Eating Out", "Restaurants, cafes and takeaways", (4, 60), 14),
+    ("Transport", "Fuel, fares and parking", (2, 80), 12),
+    ("Bills", "Energy, water, phone and internet", (20, 180), 6),
+    ("Rent", "Rent or mortgage payments", (600, 1600), 1),
+    ("Shopping", "Clothes, electronics and household items", (8, 300), 12),
+    ("Entertainment", "Subscriptions, cinema and events", (5, 90), 9),
+    ("Health", "Pharmacy, dentist and fitness", (5, 150), 5),
+    ("Travel", "Flights, hotels and holidays", (40, 900), 2),
+    ("Gifts", "Presents and donations", (5, 150), 4),
+    ("Savings", "Transfers to savings accounts", (25, 500), 3),
+    ("Other", "Anything else", (1, 200), 8),
+]
+
+BUDGET_CATEGORIES = [
+    ("Groceries", "Food and household essentials"),
+    ("Eating Out", "Restaurants and takeaways"),
+    ("Transport", "Getting around"),
+    ("Bills", "Utilities and subscriptions"),
+    ("Shopping", "Non-essential purchases"),
+    ("Entertainment", "Going out and hobbies"),
+]
+
+# Ids 1-4 are the types handled by POST /reports/
+REPORT_TYPES = [
+    ("Goals Report", "Progress towards savings goals"),
+    ("Budgets Report", "Budgets and their periods"),
+    ("Transactions Report", "Transaction totals by category and month"),
+    ("Comprehensive Report", "Goals, budgets and transactions together"),
+    ("Monthly Breakdown", "Spending per month and category"),
+    ("Category Statistics", "Totals, counts and ranges per category"),
+]
+
+NOTIFICATION_TYPES = [
+    ("Budget Alert", "A budget is close to or over its limit"),
+    ("Goal Progress", "Progress towards a savings goal"),
+    ("Reminder", "Upcoming bills and deadlines"),
+    ("System", "Account and security messages"),
+]
+
+GOAL_NAMES = ["Emergency Fund", "Holiday", "New Car", "House Deposit", "Wedding", "New Laptop", "Pay Off Card"]
+
+MERCHANTS = {
+    "Salary": ["Employer Ltd", "Freelance invoice", "Bonus"],
+    "Groceries": ["Tesco", "Sainsbury's", "Aldi", "Lidl", "Co-op"],
+    "Eating Out": ["Pret", "Nando's", "Local cafe", "Deliveroo", "Pizza place"],
+    "Transport": ["Shell", "BP", "Trainline", "Bus pass", "Parking"],
+    "Bills": ["Electricity", "Gas", "Water", "Broadband", "Mobile"],
+    "Rent": ["Landlord", "Mortgage"],
+    "Shopping": ["Amazon", "Argos", "Primark", "John Lewis", "IKEA"],
+    "Entertainment": ["Netflix", "Spotify", "Cinema", "Concert", "Steam"],
+    "Health": ["Boots", "Gym", "Dentist", "Optician"],
+    "Travel": ["Airline", "Hotel", "Airbnb", "Car hire"],
+    "Gifts": ["Birthday present", "Charity", "Wedding gift"],
+    "Savings": ["Savings transfer", "ISA"],
+    "Other": ["Cash withdrawal", "Miscellaneous", "Post office"],
+}
+
+def _ensure_lookup(db, model, rows) -> list:
+    # Lookup tables are created once and reused by later runs, which only add
+    # the ids (list position + 1) still missing, e.g. rows appended above since
+    existing = {row.id for row in db.scalars(select(model))}
+    missing = [model(id=id, name=name, description=description)
+               for id, (name, description) in enumerate(rows, start=1) if id not in existing]
+    if not missing:
+        return db.scalars(select(model).order_by(model.id)).all()
+    db.add_all(missing)
+    db.commit()
+    return db.scalars(select(model).order_by(model.id)).all()
+
+def _amount(rng: random.Random, low: float, high: float) -> Decimal:
+    # Skewed towards the low end, like real spending
+    value = low + (high - low) * rng.random() ** 2
+    return Decimal(f"{value:.2f}")
+
+def _flush(db, model, rows: list, stats: dict):
+    if rows:
+        if model is Transaction:
+            add_transactions(db.connection(), rows)
+        db.execute(insert(model), rows)
+        stats[model.__tablename__] = stats.get(model.__tablename__, 0) + len(rows)
+        rows.clear()
+
+def seed(users: int, transactions: int, seed_value: int = 42, end: date = date(2024, 12, 31),
+         days: int = 730, batch_size: int = 10000) -> dict:
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    stats = {}
+    try:
+        transaction_categories = _ensure_lookup(db, TransactionCategory, [row[:2] for row in TRANSACTION_CATEGORIES])
+        budget_categories = _ensure_lookup(db, BudgetCategory, BUDGET_CATEGORIES)
+        _ensure_lookup(db, ReportType, REPORT_TYPES)
+        notification_types = _ensure_lookup(db, NotificationType, NOTIFICATION_TYPES)
+
+        category_ids = [category.id for category in transaction_categories]
+        weights = [row[3] for row in TRANSACTION_CATEGORIES]
+        ranges = {category.id: row[2] for category, row in zip(transaction_categories, TRANSACTION_CATEGORIES)}
+        names = {category.id: row[0] for category, row in zip(transaction_categories, TRANSACTION_CATEGORIES)}
+        start = end - timedelta(days=days - 1)
+
+        # bcrypt is deliberately slow; every seeded user shares one hash
+        password = hash_password("password")
+        offset = db.scalar(select(func.count()).select_from(User))
+
+        transaction_rows, budget_rows, goal_rows, notification_rows = [], [], [], []
+        for n in range(users):
+            # One generator per user keeps each user's rows independent of batch size
+            rng = random.Random(f"{seed_value}:{n}")
+            number = offset + n + 1
+            user = User(
+                username=f"user{number:06d}", email=f"user{number:06d}@example.com", password=password,
+                first_name=rng.choice(["Alex", "Sam", "Jordan", "Taylor", "Chris", "Morgan", "Jamie"]),
+                last_name=rng.choice(["Smith", "Jones", "Taylor", "Brown", "Williams", "Wilson", "Evans"]),
+                phone_number=f"07{rng.randrange(10 ** 9):09d}",
+            )
+            db.add(user)
+            db.flush()
+            stats["users"] = stats.get("users", 0) + 1
+
+            for i in range(transactions):
+                category_id = rng.choices(category_ids, weights)[0]
+                transaction_rows.append({
+                    "user_id": user.id,
+                    "amount": _amount(rng, *ranges[category_id]),
+                    "transaction_category_id": category_id,
+                    "date": start + timedelta(days=rng.randrange(days)),
+                    "description": rng.choice(MERCHANTS[names[category_id]]),
+                })
+                if len(transaction_rows) >= batch_size:
+                    _flush(db, Transaction, transaction_rows, stats)
+                    db.commit()
+
+            # A monthly budget for a few categories over the whole period
+            month = date(start.year, start.month, 1)
+            chosen = rng.sample(budget_categories, rng.randint(2, len(budget_categories)))
+            while month <= end:
+                next_month = (month + timedelta(days=32)).replace(day=1)
+                for category in chosen:
+                    budget_rows.append({
+                        "user_id": user.id,
+                        "budget_category_id": category.id,
+                        "amount": Decimal(rng.randrange(50, 800, 25)),
+                        "start_date": month,
+                        "end_date": next_month - timedelta(days=1),
+                    })
+                month = next_month
+
+            for name in rng.sample(GOAL_NAMES, rng.randint(1, 4)):
+                target = Decimal(rng.randrange(500, 20000, 100))
+                goal_rows.append({
+                    "user_id": user.id,
+                    "name": name,
+                    "target_amount": target,
+                    "current_amount": (target * Decimal(rng.random())).quantize(Decimal("0.01")),
+                    "deadline": end + timedelta(days=rng.randrange(30, 1000)),
+                    "description": f"Saving for {name.lower()}",
+                })
+
+            for i in range(rng.randint(5, 40)):
+                notification_type = rng.choice(notification_types)
+                notification_rows.append({
+                    "user_id": user.id,
+                    "message": f"{notification_type.name}: {notification_type.description}",
+                    "notification_type_id": notification_type.id,
+                    "is_read": rng.random() < 0.7,
+                    "created_at": start + timedelta(days=rng.randrange(days)),
+                })
+
+        _flush(db, Transaction, transaction_rows, stats)
+        _flush(db, Budget, budget_rows, stats)
+        _flush(db, Goal, goal_rows, stats)
+        _flush(db, Notification, notification_rows, stats)
+        db.commit()
+    finally:
+        db.close()
+    return stats
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Seed the database with a deterministic benchmark dataset")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--transactions", type=int, default=1000, help="transactions per user")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--end-date", type=date.fromisoformat, default=date(2024, 12, 31))
+    parser.add_argument("--days", type=int, default=730, help="length of the transaction history")
+    parser.add_argument("--batch-size", type=int, default=10000)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    counts = seed(args.users, args.transactions, args.seed, args.end_date, args.days, args.batch_size)
+    elapsed = time.perf_counter() - started
+    print(f"Seeded {engine.url.render_as_string(hide_password=True)} in {elapsed:.1f}s")
+    for table, count in counts.items():
+        print(f"  {table}: {count}")
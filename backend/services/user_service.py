@@ -3,7 +3,7 @@ from fastapi import HTTPException
 from models import User
 from schemas import UserCreate
 from crud import create_user
-from utils import hash_password
+from utils import hash_password_async
 
 
 # Function to create a new user
@@ -14,7 +14,7 @@ async def create_new_user(db: Session, user: UserCreate):
         raise HTTPException(status_code=400, detail="Email already registered")
 
     # Hash the user's password
-    hashed_password = hash_password(user.password)
+    hashed_password = await hash_password_async(user.password)
     
     # Create the user with the hashed password
     db_user = create_user(db=db, user=user.copy(update={"password": hashed_password}))
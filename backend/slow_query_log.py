@@ -0,0 +1,165 @@
+import hashlib
+import logging
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import event
+
+import metrics
+import query_counter
+from config import SLOW_QUERY_MS, SLOW_QUERY_EXPLAIN, SLOW_QUERY_EXPLAIN_INTERVAL, SLOW_QUERY_MAX_FINGERPRINTS
+
+logger = logging.getLogger(__name__)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+
+def fingerprint(statement: str) -> tuple:
+    # Statement with IN lists and inline literals folded, plus a short digest of it
+    normalized = query_counter.statement_shape(statement)
+    normalized = _NUMBER_LITERAL.sub("?", _STRING_LITERAL.sub("?", normalized))
+    return hashlib.sha1(normalized.encode()).hexdigest()[:12], normalized
+
+def _redact_value(value) -> str:
+    if value is None:
+        return "NULL"
+    if isinstance(value, (str, bytes)):
+        return f"<{type(value).__name__}:{len(value)}>"
+    return f"<{type(value).__name__}>"
+
+def redact(parameters, executemany: bool = False):
+    # Parameter types and sizes only, never the values (emails, amounts, hashes)
+    if executemany:
+        return f"<{len(parameters)} parameter sets>"
+    if isinstance(parameters, dict):
+        return {key: _redact_value(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [_redact_value(value) for value in parameters]
+    return _redact_value(parameters)
+
+def _explain_sql(dialect_name: str, statement: str):
+    if dialect_name == "sqlite":
+        return f"EXPLAIN QUERY PLAN {statement}"
+    if dialect_name in ("mysql", "postgresql"):
+        return f"EXPLAIN {statement}"
+    return None
+
+class SlowQueryLog:
+    # Statements slower than threshold_ms, aggregated by fingerprint. The plan of
+    # each fingerprint is captured off the request path by a single background
+    # worker and refreshed at most every explain_interval seconds.
+    def __init__(self, threshold_ms: float = SLOW_QUERY_MS, explain: bool = SLOW_QUERY_EXPLAIN,
+                 explain_interval: float = SLOW_QUERY_EXPLAIN_INTERVAL,
+                 max_fingerprints: int = SLOW_QUERY_MAX_FINGERPRINTS):
+        self.threshold_ms = threshold_ms
+        self.explain = explain
+        self.explain_interval = explain_interval
+        self.max_fingerprints = max_fingerprints
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._explainer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="explain")
+
+    def install(self, engine):
+        @event.listens_for(engine, "before_cursor_execute")
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            conn.info["slow_query_started"] = time.perf_counter()
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            elapsed_ms = (time.perf_counter() - conn.info["slow_query_started"]) * 1000
+            if self.threshold_ms and elapsed_ms >= self.threshold_ms:
+                self.record(engine, statement, parameters, executemany, elapsed_ms)
+
+    def record(self, engine, statement: str, parameters, executemany: bool, elapsed_ms: float):
+        key, normalized = fingerprint(statement)
+        queries = query_counter.current()
+        route = queries.route if queries is not None else "background"
+        params = redact(parameters, executemany)
+        metrics.incr("db.slow_queries")
+        logger.warning(f"Slow query {elapsed_ms:.1f}ms [{key}] {route} params={params}: {normalized}")
+
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = {
+                    "fingerprint": key, "statement": normalized, "count": 0, "total_ms": 0.0, "max_ms": 0.0,
+                    "routes": Counter(), "last_params": None, "last_seen": None,
+                    "plan": None, "plan_error": None, "plan_at": 0.0, "plan_pending": False,
+                }
+                self._entries[key] = entry
+                while len(self._entries) > self.max_fingerprints:
+                    self._entries.popitem(last=False)
+            self._entries.move_to_end(key)
+            entry["count"] += 1
+            entry["total_ms"] += elapsed_ms
+            entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+            entry["routes"][route] += 1
+            entry["last_params"] = params
+            entry["last_seen"] = now
+            wants_plan = (
+                self.explain and not executemany and not entry["plan_pending"]
+                and now - entry["plan_at"] >= self.explain_interval
+            )
+            if wants_plan:
+                entry["plan_pending"] = True
+
+        if wants_plan:
+            self._explainer.submit(self._capture_plan, engine, key, statement, parameters)
+
+    def _capture_plan(self, engine, key: str, statement: str, parameters):
+        plan, error = None, None
+        sql = _explain_sql(engine.dialect.name, statement)
+        if not statement.lstrip().upper().startswith("SELECT"):
+            error = "plans are only captured for SELECT statements"
+        elif sql is None:
+            error = f"EXPLAIN not supported for {engine.dialect.name}"
+        elif engine.dialect.is_async:
+            # Async drivers need the event loop; the same statements are usually
+            # also issued through the sync engine, which captures their plan
+            error = "plans are not captured for async engines"
+        else:
+            try:
+                connection = engine.raw_connection()
+                try:
+                    cursor = connection.cursor()
+                    cursor.execute(sql, parameters)
+                    columns = [column[0] for column in cursor.description or ()]
+                    plan = [dict(zip(columns, row)) for row in cursor.fetchall()]
+                    cursor.close()
+                finally:
+                    connection.close()
+            except Exception as e:
+                error = str(e)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.update(plan=plan, plan_error=error, plan_at=time.time(), plan_pending=False)
+        if plan is not None:
+            logger.info(f"Captured plan for slow query [{key}]: {plan}")
+
+    def report(self, limit: int = 20, include_plans: bool = True) -> list:
+        # Worst fingerprints first by total time spent
+        with self._lock:
+            entries = sorted(self._entries.values(), key=lambda entry: entry["total_ms"], reverse=True)[:limit]
+            result = []
+            for entry in entries:
+                item = {key: value for key, value in entry.items() if key not in ("plan_pending", "routes")}
+                item["avg_ms"] = entry["total_ms"] / entry["count"]
+                item["routes"] = dict(entry["routes"])
+                if not include_plans:
+                    item.pop("plan")
+                result.append(item)
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+slow_query_log = SlowQueryLog()
+
+metrics.register_collector("slow_queries", lambda: slow_query_log.report(limit=10, include_plans=False))
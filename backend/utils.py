@@ -1,15 +1,99 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 from passlib.context import CryptContext
 
+import metrics
+from config import HASH_POOL_WORKERS, HASH_POOL_MAX_QUEUE
+
 # Initialize the password hashing context with bcrypt
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+class HashingPoolSaturated(Exception):
+    pass
+
+# bcrypt releases the GIL while hashing, so a small thread pool gives real
+# parallelism without blocking the event loop. The pool is bounded twice: by
+# the number of worker threads and by how many calls may wait for one.
+class HashingExecutor:
+    def __init__(self, max_workers: int = HASH_POOL_WORKERS, max_queue: int = HASH_POOL_MAX_QUEUE):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="password-hash")
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+
+    def submit(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            metrics.incr("hashing.rejected")
+            raise HashingPoolSaturated("Password hashing pool is saturated")
+
+        enqueued_at = time.perf_counter()
+        with self._lock:
+            self._queued += 1
+            metrics.set_gauge("hashing.queue_depth", self._queued)
+
+        def run():
+            started_at = time.perf_counter()
+            with self._lock:
+                self._queued -= 1
+                self._running += 1
+                metrics.set_gauge("hashing.queue_depth", self._queued)
+                metrics.set_gauge("hashing.running", self._running)
+            metrics.observe("hashing.wait_ms", (started_at - enqueued_at) * 1000)
+            try:
+                return fn(*args)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    metrics.set_gauge("hashing.running", self._running)
+                metrics.observe("hashing.run_ms", (time.perf_counter() - started_at) * 1000)
+                self._slots.release()
+
+        try:
+            return self._executor.submit(run)
+        except Exception:
+            with self._lock:
+                self._queued -= 1
+            self._slots.release()
+            raise
+
+    def run_sync(self, fn, *args):
+        return self.submit(fn, *args).result()
+
+    async def run(self, fn, *args):
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "queued": self._queued,
+                "running": self._running,
+            }
+
+hashing_executor = HashingExecutor()
+metrics.register_collector("hashing_pool", hashing_executor.stats)
+
 # Hash the plain password
 def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+    return hashing_executor.run_sync(pwd_context.hash, password)
 
 def verify_password(plain_password: str, hashed_password: str):
-    return pwd_context.verify(plain_password, hashed_password)
+    return hashing_executor.run_sync(pwd_context.verify, plain_password, hashed_password)
+
+# Async variants for use inside `async def` endpoints, never block the event loop
+async def hash_password_async(password: str) -> str:
+    return await hashing_executor.run(pwd_context.hash, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str):
+    return await hashing_executor.run(pwd_context.verify, plain_password, hashed_password)
 
 def rehash_password(users):
     if not users.password.startswith("$2b$"):
-        users.password = hash_password(users.password)
\ No newline at end of file
+        users.password = hash_password(users.password)